@@ -0,0 +1,12 @@
+#-------------------------------------------------------------
+# Name: benchmarks
+#
+# Benchmarks of the CF checker on synthetic CF files.
+#
+#   ncwriter.py  writes netCDF files in the classic formats
+#   generate.py  the synthetic files and the suites of them
+#   measure.py   times one check of one file
+#   run.py       times a checker on a suite and compares results
+#
+# See run.py for how to run them.
+#-------------------------------------------------------------
@@ -0,0 +1,242 @@
+#-------------------------------------------------------------
+# Name: generate.py
+#
+# The synthetic CF files of the benchmarks.
+#
+# A Case gives the size of a file along each axis the cost of a
+# check depends on:
+#
+#   variables     number of data variables (10 to 50000)
+#   attributes    attributes of each data variable, at least the
+#                 standard_name, units and long_name it always has
+#   coordLength   length of the time coordinate (up to 10**8), or
+#                 the total number of observations of a DSG file
+#   bounds        fraction of the coordinates with bounds
+#   cellMethods   fraction of the data variables with cell_methods
+#   formulaTerms  fraction of the data variables on a vertical
+#                 coordinate of their own with formula_terms
+#   stations      if not 0, the file is a discrete sampling
+#                 geometry: time series at this many stations in
+#                 a contiguous ragged array, whose data variables
+#                 are on the observations (bounds and formulaTerms
+#                 do not apply)
+#
+# The data variables are left as holes in the file (see
+# ncwriter.py), as the checker never reads them; the coordinates
+# and bounds, which it does read, are written in full.
+#
+# A suite is a list of Cases, each varying one axis from BASE.
+#-------------------------------------------------------------
+
+import os
+import numpy
+
+from benchmarks.ncwriter import Writer, OFFSET64, DATA64
+
+# Length of the latitude, longitude and vertical dimensions
+NLAT = 2
+NLON = 2
+NLEV = 3
+
+# Standard names and units given to the data variables in turn
+QUANTITIES = [('air_temperature', 'K'),
+              ('air_pressure', 'Pa'),
+              ('eastward_wind', 'm s-1'),
+              ('northward_wind', 'm s-1'),
+              ('specific_humidity', '1'),
+              ('precipitation_flux', 'kg m-2 s-1')]
+
+# The axes of a Case, and their defaults
+BASE = (('variables', 10),
+        ('attributes', 4),
+        ('coordLength', 100),
+        ('bounds', 1.0),
+        ('cellMethods', 0.5),
+        ('formulaTerms', 0.0),
+        ('stations', 0))
+
+
+class Case:
+    """A synthetic file.  Axes not given take their values from BASE."""
+    def __init__(self, name, **axes):
+        self.name = name
+        self.axes = dict(BASE)
+        for (axis, value) in axes.items():
+            if not self.axes.has_key(axis):
+                raise ValueError("Unknown benchmark axis: %s" % axis)
+            self.axes[axis] = value
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['axes'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __repr__(self):
+        return "<Case %s>" % self.name
+
+    def fileName(self):
+        """The name of the file of the case, which changes with its axes"""
+        return "cf-" + "-".join(["%s%s" % (axis, self.axes[axis]) for (axis, default) in BASE]) + ".nc"
+
+    def count(self, fraction, n):
+        """The number of n items a fraction of them makes"""
+        return int(round(fraction * n))
+
+
+def _sweep(axis, values):
+    return [Case("%s=%s" % (axis, value), **{axis: value}) for value in values]
+
+# The suites, by name
+SUITES = {
+    'quick': ([Case('base')] +
+              _sweep('variables', [100, 1000]) +
+              _sweep('coordLength', [10**5]) +
+              _sweep('formulaTerms', [0.5]) +
+              _sweep('stations', [100])),
+    'full': ([Case('base')] +
+             _sweep('variables', [100, 1000, 10000, 50000]) +
+             _sweep('attributes', [16, 64]) +
+             _sweep('coordLength', [10**4, 10**6, 10**8]) +
+             _sweep('bounds', [0.0]) +
+             _sweep('cellMethods', [0.0, 1.0]) +
+             _sweep('formulaTerms', [0.5, 1.0]) +
+             _sweep('stations', [100, 10000])),
+}
+
+
+#-----------------------------------
+def generate(case, path):
+#-----------------------------------
+    """Write the file of case to path and return its size.  The file is in
+    the 64-bit offset format, or CDF-5 if a variable is too large for it."""
+    if case.stations:
+        writer = _dsgFile(case)
+    else:
+        writer = _gridFile(case)
+    if writer.needsData64():
+        writer.format = DATA64
+    writer.addAttribute('Conventions', 'CF-1.6')
+    writer.addAttribute('title', 'Synthetic file for benchmarking the CF checker')
+    writer.addAttribute('source', case.fileName())
+    return writer.write(path)
+
+
+#-----------------------------------
+def ensure(case, directory):
+#-----------------------------------
+    """The path of the file of case in directory, written if it is not there"""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, case.fileName())
+    if not os.path.exists(path):
+        partial = path + '.part'
+        generate(case, partial)
+        os.rename(partial, path)
+    return path
+
+
+def _dataAttributes(case, i, cellMethods):
+    (standardName, units) = QUANTITIES[i % len(QUANTITIES)]
+    attributes = [('standard_name', standardName),
+                  ('units', units),
+                  ('long_name', 'Quantity %d' % i)]
+    for j in range(case.attributes - len(attributes)):
+        attributes.append(('comment_%d' % j, 'Attribute %d of variable %d' % (j, i)))
+    if i < case.count(case.cellMethods, case.variables):
+        attributes.append(('cell_methods', cellMethods))
+    return attributes
+
+
+def _gridFile(case):
+    writer = Writer(OFFSET64)
+    writer.addDimension('time', case.coordLength)
+    writer.addDimension('lat', NLAT)
+    writer.addDimension('lon', NLON)
+    writer.addDimension('nv', 2)
+
+    def arange(start, stop):
+        return numpy.arange(start, stop, dtype='d')
+
+    def cellBounds(start, stop):
+        points = numpy.arange(start, stop, dtype='d')
+        return numpy.column_stack((points - 0.5, points + 0.5))
+
+    coordinates = [('time', [('standard_name', 'time'), ('units', 'days since 2000-01-01'),
+                             ('calendar', 'standard'), ('axis', 'T')], arange),
+                   ('lat', [('standard_name', 'latitude'), ('units', 'degrees_north'), ('axis', 'Y')],
+                    numpy.linspace(-45.0, 45.0, NLAT)),
+                   ('lon', [('standard_name', 'longitude'), ('units', 'degrees_east'), ('axis', 'X')],
+                    numpy.linspace(0.0, 180.0, NLON))]
+    withBounds = case.count(case.bounds, len(coordinates))
+    for i in range(len(coordinates)):
+        (name, attributes, data) = coordinates[i]
+        if i < withBounds:
+            attributes = attributes + [('bounds', name + '_bnds')]
+        writer.addVariable(name, 'd', [name], attributes, data)
+        if i < withBounds:
+            if callable(data):
+                boundsData = cellBounds
+            else:
+                step = data[1] - data[0]
+                boundsData = numpy.column_stack((data - step/2, data + step/2))
+            writer.addVariable(name + '_bnds', 'd', [name, 'nv'], [], boundsData)
+
+    levels = case.count(case.formulaTerms, case.variables)
+    if levels:
+        writer.addVariable('ps', 'f', ['time', 'lat', 'lon'],
+                           [('standard_name', 'surface_air_pressure'), ('units', 'Pa')])
+        writer.addVariable('ptop', 'f', [], [('long_name', 'pressure at the model top'), ('units', 'Pa')],
+                           numpy.array(100.0))
+
+    for i in range(case.variables):
+        dimensions = ['time', 'lat', 'lon']
+        if i < levels:
+            lev = 'lev_%d' % i
+            writer.addDimension(lev, NLEV)
+            writer.addVariable(lev, 'd', [lev],
+                               [('standard_name', 'atmosphere_sigma_coordinate'), ('units', '1'),
+                                ('positive', 'down'), ('axis', 'Z'),
+                                ('formula_terms', 'sigma: %s ps: ps ptop: ptop' % lev)],
+                               numpy.linspace(0.1, 1.0, NLEV))
+            dimensions = ['time', lev, 'lat', 'lon']
+        writer.addVariable('var_%d' % i, 'f', dimensions, _dataAttributes(case, i, 'time: mean'))
+    return writer
+
+
+def _dsgFile(case):
+    writer = Writer(OFFSET64)
+    stations = case.stations
+    observations = max(case.coordLength, stations)
+    writer.addDimension('station', stations)
+    writer.addDimension('obs', observations)
+
+    rowSize = numpy.zeros(stations, 'i') + observations // stations
+    rowSize[-1] = rowSize[-1] + observations % stations
+    starts = numpy.concatenate(([0], numpy.cumsum(rowSize)))
+
+    def times(start, stop):
+        # Each station's times count up from 0
+        index = numpy.arange(start, stop)
+        station = numpy.searchsorted(starts, index, 'right') - 1
+        return (index - starts[station]).astype('d')
+
+    writer.addVariable('station_id', 'i', ['station'],
+                       [('long_name', 'station identifier'), ('cf_role', 'timeseries_id')],
+                       numpy.arange(stations))
+    writer.addVariable('row_size', 'i', ['station'],
+                       [('long_name', 'number of observations for this station'),
+                        ('sample_dimension', 'obs')], rowSize)
+    writer.addVariable('lat', 'd', ['station'],
+                       [('standard_name', 'latitude'), ('units', 'degrees_north')],
+                       numpy.linspace(-80.0, 80.0, stations))
+    writer.addVariable('lon', 'd', ['station'],
+                       [('standard_name', 'longitude'), ('units', 'degrees_east')],
+                       numpy.linspace(0.0, 359.0, stations))
+    writer.addVariable('time', 'd', ['obs'],
+                       [('standard_name', 'time'), ('units', 'days since 2000-01-01')], times)
+    for i in range(case.variables):
+        writer.addVariable('var_%d' % i, 'f', ['obs'],
+                           _dataAttributes(case, i, 'area: mean') + [('coordinates', 'time lat lon station_id')])
+    writer.addAttribute('featureType', 'timeSeries')
+    return writer
@@ -0,0 +1,89 @@
+#-------------------------------------------------------------
+# Name: measure.py
+#
+# Times one check of one file, in a process of its own:
+#
+#   python measure.py TREE FILE UDUNITS STANDARD_NAMES AREA_TYPES [CACHE_DIR]
+#
+# TREE is the directory holding the cfchecker package to time,
+# so that trunk and the tagged releases can each be timed in a
+# fresh interpreter.  Prints a line of JSON with the time taken
+# to import the checker, to check the file end to end and in
+# each of PHASES, the return code and the peak resident size.
+#
+# A phase is timed by wrapping the method of CFChecker it is
+# made of; phases whose method a checker does not have (the
+# releases load the tables inside checker()) are left out.
+#-------------------------------------------------------------
+
+import sys, os, time, traceback, resource
+import json
+
+# Phase -> CFChecker method, timed over all its calls
+PHASES = (('tables', 'setUp'),
+          ('open', 'openFile'),
+          ('coordinates', 'getCoordinateDataVars'),
+          ('variables', 'chkVariable'))
+
+
+def _timed(method, phase, times):
+    def timed(self, *args, **kwargs):
+        start = time.time()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            times[phase] = times[phase] + time.time() - start
+    return timed
+
+
+def timePhases(checkerClass):
+    """Wrap the methods of PHASES in checkerClass; return the dictionary the
+    time spent in them is added to"""
+    times = {}
+    for (phase, name) in PHASES:
+        method = checkerClass.__dict__.get(name)
+        if method is None:
+            continue
+        times[phase] = 0.0
+        setattr(checkerClass, name, _timed(method, phase, times))
+    return times
+
+
+def measure(tree, path, udunits, standardNames, areaTypes, cacheDir=None):
+    sys.path.insert(0, tree)
+    start = time.time()
+    import cfchecker
+    from cfchecker import cfchecks
+    imported = time.time()
+
+    phases = timePhases(cfchecks.CFChecker)
+    kwargs = {'udunitsDat': udunits, 'cfStandardNamesXML': standardNames, 'cfAreaTypesXML': areaTypes}
+    argNames = cfchecks.CFChecker.__init__.im_func.func_code.co_varnames
+    if cacheDir and 'cacheDir' in argNames:
+        kwargs['cacheDir'] = cacheDir
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        begin = time.time()
+        inst = cfchecks.CFChecker(**kwargs)
+        rc = inst.checker(path)
+        seconds = time.time() - begin
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return {'checker': cfchecker.__version__,
+            'import': imported - start,
+            'seconds': seconds,
+            'phases': phases,
+            'rc': rc,
+            'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+if __name__ == '__main__':
+    try:
+        result = measure(*sys.argv[1:])
+    except:
+        result = {'error': "".join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()}
+    sys.stdout.write(json.dumps(result) + "\n")
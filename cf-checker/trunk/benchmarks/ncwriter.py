@@ -0,0 +1,198 @@
+#-------------------------------------------------------------
+# Name: ncwriter.py
+#
+# Writer for netCDF files in the classic, 64-bit offset and
+# CDF-5 formats, for making the benchmark files without the
+# netCDF library.
+#
+# It is kept apart from the checker's reader (netcdf3.py), so
+# that the files a benchmark checks do not depend on the code
+# being measured.  Only fixed size variables are written; there
+# is no record dimension.
+#
+# Variable data may be given as an array, as a function giving
+# the data a slab at a time, or not at all.  Data not given is
+# left as a hole in the file, which reads as zeros and takes no
+# disk space, so very large variables that the checker never
+# reads cost nothing to make.
+#-------------------------------------------------------------
+
+import struct
+import numpy
+
+CLASSIC = 1
+OFFSET64 = 2
+DATA64 = 5
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+# numpy kind and size -> nc_type
+NC_TYPES = {('S', 1): 2,        # NC_CHAR
+            ('i', 1): 1,        # NC_BYTE
+            ('i', 2): 3,        # NC_SHORT
+            ('i', 4): 4,        # NC_INT
+            ('f', 4): 5,        # NC_FLOAT
+            ('f', 8): 6}        # NC_DOUBLE
+
+# Bytes of data written at a time
+CHUNK_BYTES = 8388608
+
+
+def _pad(n):
+    return (n + 3) & ~3
+
+
+def _ncType(dtype):
+    try:
+        return NC_TYPES[(dtype.kind, dtype.itemsize)]
+    except KeyError:
+        raise ValueError("netCDF has no type for %s" % dtype)
+
+
+class _Variable:
+    def __init__(self, name, dtype, dimensions, shape, attributes, data):
+        self.name = name
+        self.dtype = dtype
+        self.dimensions = dimensions
+        self.shape = shape
+        self.attributes = attributes
+        self.data = data
+        size = dtype.itemsize
+        for n in shape:
+            size = size * n
+        self.size = size
+        self.begin = 0
+
+
+class Writer:
+    """A netCDF file to be written by write().  Types are given as numpy
+    types ('S1' for characters); attribute values may be strings, numbers or
+    sequences of numbers, whose type is that of numpy.asarray()."""
+    def __init__(self, format=OFFSET64):
+        self.format = format
+        self.dimensions = []         # (name, length)
+        self.lengths = {}
+        self.attributes = []         # Global attributes, (name, value)
+        self.variables = []
+
+    def addDimension(self, name, length):
+        self.dimensions.append((name, length))
+        self.lengths[name] = length
+
+    def addAttribute(self, name, value):
+        self.attributes.append((name, value))
+
+    def addVariable(self, name, dtype, dimensions, attributes=(), data=None):
+        """Add variable name.  data is None to leave the values as a hole in
+        the file, an array of the shape of the variable, or a function
+        data(start, stop) returning its values from start to stop along the
+        first dimension."""
+        dtype = numpy.dtype(dtype).newbyteorder('>')
+        shape = tuple([self.lengths[dim] for dim in dimensions])
+        self.variables.append(_Variable(name, dtype, tuple(dimensions), shape, list(attributes), data))
+
+    def needsData64(self):
+        """Whether a variable is too large for the other formats"""
+        for var in self.variables:
+            if var.size >= 1 << 32:
+                return 1
+        return 0
+
+    #-----------------------------------
+    # Header
+    #-----------------------------------
+    def _nonNeg(self, n):
+        if self.format == DATA64:
+            return struct.pack('>q', n)
+        return struct.pack('>i', n)
+
+    def _offset(self, n):
+        if self.format == CLASSIC:
+            return struct.pack('>i', n)
+        return struct.pack('>q', n)
+
+    def _vsize(self, size):
+        if self.format == DATA64:
+            return struct.pack('>q', _pad(size))
+        # Unsigned in these formats; readers work it out for larger variables
+        return struct.pack('>I', min(_pad(size), 0xffffffff))
+
+    def _name(self, name):
+        return self._nonNeg(len(name)) + name + '\0' * (_pad(len(name)) - len(name))
+
+    def _list(self, tag, items):
+        if not items:
+            return struct.pack('>i', 0) + self._nonNeg(0)
+        return struct.pack('>i', tag) + self._nonNeg(len(items)) + ''.join(items)
+
+    def _attribute(self, name, value):
+        if isinstance(value, str):
+            values = numpy.array(list(value), 'S1')
+        else:
+            values = numpy.asarray(value)
+            if values.dtype.kind == 'i' and values.dtype.itemsize > 4:
+                values = values.astype('i4')
+            values = values.reshape(-1)
+        data = values.astype(values.dtype.newbyteorder('>')).tostring()
+        return (self._name(name) + struct.pack('>i', _ncType(values.dtype)) +
+                self._nonNeg(len(values)) + data + '\0' * (_pad(len(data)) - len(data)))
+
+    def _attributes(self, attributes):
+        return self._list(NC_ATTRIBUTE, [self._attribute(name, value) for (name, value) in attributes])
+
+    def header(self):
+        """The header, with the begin offsets the variables have now"""
+        index = {}
+        for i in range(len(self.dimensions)):
+            index[self.dimensions[i][0]] = i
+        dims = [self._name(name) + self._nonNeg(length) for (name, length) in self.dimensions]
+        variables = []
+        for var in self.variables:
+            variables.append(self._name(var.name) + self._nonNeg(len(var.dimensions)) +
+                             ''.join([self._nonNeg(index[dim]) for dim in var.dimensions]) +
+                             self._attributes(var.attributes) +
+                             struct.pack('>i', _ncType(var.dtype)) +
+                             self._vsize(var.size) + self._offset(var.begin))
+        return ('CDF' + chr(self.format) + self._nonNeg(0) +
+                self._list(NC_DIMENSION, dims) + self._attributes(self.attributes) +
+                self._list(NC_VARIABLE, variables))
+
+    #-----------------------------------
+    # File
+    #-----------------------------------
+    def write(self, path):
+        """Write the file to path, returning its size"""
+        if self.format != DATA64 and self.needsData64():
+            raise ValueError("A variable is too large for this format; use DATA64")
+        # The offsets do not change the length of the header
+        position = len(self.header())
+        for var in self.variables:
+            var.begin = position
+            position = position + _pad(var.size)
+
+        f = open(path, 'wb')
+        try:
+            f.write(self.header())
+            for var in self.variables:
+                self._writeData(f, var)
+            f.truncate(position)
+        finally:
+            f.close()
+        return position
+
+    def _writeData(self, f, var):
+        if var.data is None:
+            return
+        f.seek(var.begin)
+        if not callable(var.data):
+            f.write(numpy.asarray(var.data, var.dtype).tostring())
+            return
+        rowSize = var.dtype.itemsize
+        for n in var.shape[1:]:
+            rowSize = rowSize * n
+        step = max(1, CHUNK_BYTES // max(rowSize, 1))
+        for start in xrange(0, var.shape[0], step):
+            stop = min(start + step, var.shape[0])
+            f.write(numpy.asarray(var.data(start, stop), var.dtype).tostring())
@@ -0,0 +1,200 @@
+#-------------------------------------------------------------
+# Name: run.py
+#
+# Times the CF checker on a suite of synthetic files (see
+# generate.py) and compares the results of two runs.
+#
+# From the directory holding benchmarks/ (trunk):
+#
+#   python -m benchmarks.run [-s quick|full] [-n REPEAT]
+#       [-t TREE] [-d DATA_DIR] [-u udunits2.xml] [-o RESULTS.json]
+#   python -m benchmarks.run --compare OLD.json NEW.json [--threshold PERCENT]
+#
+# TREE is the directory holding the cfchecker package to time:
+# trunk's src (the default) or, say, ../tags/release-2.0.5/src.
+# Every tree is given the standard name and area type tables
+# shipped in trunk, so they all check against the same tables.
+# The files are written to DATA_DIR (default benchmark-data)
+# the first time they are needed and reused after that.
+#
+# Each file is checked REPEAT times (default 3), each time in a
+# new process (see measure.py), after a first check that is not
+# counted and that compiles the tables where the checker caches
+# them.  The best of the repeats is kept as the case's result.
+#
+# The results are written as JSON: the checker version, tree,
+# Python and host, and for each case its axes, file size, every
+# run and the best one.  --compare prints the change in the best
+# time of each case between two results files.  It exits with 1
+# if a case got slower by more than the threshold (default 10%).
+#-------------------------------------------------------------
+
+import sys, os, time, platform, subprocess
+import json
+from getopt import getopt, GetoptError
+
+from benchmarks.generate import SUITES, ensure
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TRUNK_SRC = os.path.join(os.path.dirname(HERE), 'src')
+DATADIR = os.path.join(TRUNK_SRC, 'cfchecker', 'data')
+STANDARDNAME = os.path.join(DATADIR, 'cf-standard-name-table.xml')
+AREATYPES = os.path.join(DATADIR, 'area-type-table.xml')
+
+USAGE = """usage: python -m benchmarks.run [-s quick|full] [-n REPEAT] [-t TREE] [-d DATA_DIR] [-u udunits2.xml] [-o RESULTS.json]
+       python -m benchmarks.run --compare OLD.json NEW.json [--threshold PERCENT]"""
+
+
+def checkOnce(tree, path, udunits, cacheDir):
+    """Check path with the checker in tree in a new process; return the
+    result printed by measure.py"""
+    command = [sys.executable, os.path.join(HERE, 'measure.py'), tree, path,
+               udunits or '', STANDARDNAME, AREATYPES, cacheDir]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    output = process.communicate()[0]
+    lines = output.strip().splitlines()
+    if not lines:
+        return {'error': "measure.py exited with %d and no result" % process.returncode}
+    return json.loads(lines[-1])
+
+
+#-----------------------------------
+def runSuite(suite, tree, dataDir, udunits, repeat):
+#-----------------------------------
+    """Time the checker in tree on each case of suite; return the results"""
+    cacheDir = os.path.join(dataDir, 'cache')
+    results = {'tree': os.path.abspath(tree),
+               'suite': suite,
+               'repeat': repeat,
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'host': platform.node(),
+               'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'cases': []}
+
+    print "%-24s %10s %10s %10s %10s %10s" % ("case", "seconds", "tables", "open", "coords", "variables")
+    for case in SUITES[suite]:
+        path = ensure(case, dataDir)
+        entry = {'name': case.name, 'axes': case.axes, 'fileSize': os.path.getsize(path), 'runs': []}
+        results['cases'].append(entry)
+
+        warmUp = checkOnce(tree, path, udunits, cacheDir)
+        if warmUp.has_key('error'):
+            entry['error'] = warmUp['error']
+            print "%-24s %s" % (case.name, warmUp['error'])
+            continue
+        results['checker'] = warmUp['checker']
+        for i in range(repeat):
+            entry['runs'].append(checkOnce(tree, path, udunits, cacheDir))
+        runs = [run for run in entry['runs'] if not run.has_key('error')]
+        if not runs:
+            entry['error'] = entry['runs'][0]['error']
+            print "%-24s %s" % (case.name, entry['error'])
+            continue
+        runs.sort(key=lambda run: run['seconds'])
+        best = runs[0]
+        entry['best'] = best
+        phases = [_seconds(best['phases'].get(phase)) for phase in ('tables', 'open', 'coordinates', 'variables')]
+        print "%-24s %10s %10s %10s %10s %10s" % tuple([case.name, _seconds(best['seconds'])] + phases)
+        sys.stdout.flush()
+    return results
+
+
+def _seconds(value):
+    if value is None:
+        return "-"
+    return "%.4f" % value
+
+
+#-----------------------------------
+def compare(old, new, threshold):
+#-----------------------------------
+    """Print the change in the best time of each case from the results old
+    to new; return the number of cases more than threshold percent slower"""
+    print "%-24s %10s %10s %9s" % ("case", "old", "new", "change")
+    oldCases = {}
+    for case in old['cases']:
+        oldCases[case['name']] = case
+    slower = 0
+    for case in new['cases']:
+        before = oldCases.get(case['name'])
+        if before is None or before['axes'] != case['axes']:
+            print "%-24s %10s" % (case['name'], "new case")
+            continue
+        if not before.has_key('best') or not case.has_key('best'):
+            print "%-24s %10s %10s" % (case['name'], _seconds(before.get('best', {}).get('seconds')),
+                                       _seconds(case.get('best', {}).get('seconds')))
+            continue
+        (a, b) = (before['best']['seconds'], case['best']['seconds'])
+        change = (b - a) / a * 100.0
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            slower = slower + 1
+        print "%-24s %10.4f %10.4f %+8.1f%%%s" % (case['name'], a, b, change, flag)
+    return slower
+
+
+def main(argv):
+    suite = 'quick'
+    repeat = 3
+    tree = TRUNK_SRC
+    dataDir = 'benchmark-data'
+    udunits = os.environ.get('UDUNITS')
+    output = None
+    comparing = 0
+    threshold = 10.0
+    try:
+        (opts, args) = getopt(argv[1:], 'd:hn:o:s:t:u:', ['data=', 'help', 'repeat=', 'output=', 'suite=',
+                                                          'tree=', 'udunits=', 'compare', 'threshold='])
+        for (a, v) in opts:
+            if a in ('-h', '--help'):
+                print USAGE
+                return 0
+            elif a in ('-s', '--suite'):
+                suite = v
+                if not SUITES.has_key(suite):
+                    raise GetoptError("unknown suite %s" % suite)
+            elif a in ('-n', '--repeat'):
+                repeat = int(v)
+            elif a in ('-t', '--tree'):
+                tree = v
+            elif a in ('-d', '--data'):
+                dataDir = v
+            elif a in ('-u', '--udunits'):
+                udunits = v
+            elif a in ('-o', '--output'):
+                output = v
+            elif a == '--compare':
+                comparing = 1
+            elif a == '--threshold':
+                threshold = float(v)
+    except (GetoptError, ValueError), e:
+        sys.stderr.write("%s\n%s\n" % (e, USAGE))
+        return 2
+
+    if comparing:
+        if len(args) != 2:
+            sys.stderr.write(USAGE + "\n")
+            return 2
+        (old, new) = [json.load(open(name)) for name in args]
+        if compare(old, new, threshold):
+            return 1
+        return 0
+
+    if args:
+        sys.stderr.write(USAGE + "\n")
+        return 2
+    results = runSuite(suite, tree, dataDir, udunits, repeat)
+    if output:
+        f = open(output, 'w')
+        try:
+            json.dump(results, f, indent=1, sort_keys=True)
+            f.write("\n")
+        finally:
+            f.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -30,6 +30,7 @@ setup(name='cfchecker',
       url='http://cf-pcmdi.llnl.gov/conformance/compliance-checker/',
       package_dir = {'': 'src'},
       packages=find_packages('src'),
+      package_data={'cfchecker': ['data/*.xml']},
       include_package_data=True,
       zip_safe=False,
       install_requires=[
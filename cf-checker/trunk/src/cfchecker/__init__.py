@@ -6,16 +6,30 @@ import os.path as op
 __version__ = '2.0.5'
 
 from cfchecker.cfchecks import getargs, CFChecker
+from cfchecker.batch import checkFiles
 
 def cfchecks_main():
-    """cfchecks_main is based on the main program block in cfchecks.py
+    """cfchecks_main is the cfchecks command; it is also run when cfchecks.py is run as a script
     """
 
-    (badc,coards,uploader,useFileName,standardName,areaTypes,udunitsDat,version,files)=getargs(sys.argv)
-    
-    inst = CFChecker(uploader=uploader, useFileName=useFileName, badc=badc, coards=coards, cfStandardNamesXML=standardName, cfAreaTypesXML=areaTypes, udunitsDat=udunitsDat, version=version)
-    for file in files:
-        rc = inst.checker(file)
-        sys.exit (rc)
+    (badc,coards,uploader,useFileName,standardName,areaTypes,udunitsDat,version,jobs,metadataOnly,backend,threads,reportFormat,maxErrors,resultCache,profileTo,serve,daemon,files)=getargs(sys.argv)
 
+    if serve:
+        from cfchecker.daemon import serve as serveRequests
+        sys.exit(serveRequests(serve, jobs, uploader=uploader, useFileName=useFileName, badc=badc, coards=coards, cfStandardNamesXML=standardName, cfAreaTypesXML=areaTypes, udunitsDat=udunitsDat, version=version, metadataOnly=metadataOnly, backend=backend, threads=threads, maxErrors=maxErrors, resultCache=resultCache))
 
+    if daemon:
+        from cfchecker.daemon import checkFilesRemote
+        rc = checkFilesRemote(daemon, files, jobs=jobs, reportFormat=reportFormat, version=version, uploader=uploader, useFileName=useFileName, badc=badc, coards=coards, metadataOnly=metadataOnly, maxErrors=maxErrors, threads=threads)
+    else:
+        profile = None
+        if profileTo:
+            from cfchecker.profiling import Profile
+            profile = Profile()
+        rc = checkFiles(files, jobs=jobs, uploader=uploader, useFileName=useFileName, badc=badc, coards=coards, cfStandardNamesXML=standardName, cfAreaTypesXML=areaTypes, udunitsDat=udunitsDat, version=version, metadataOnly=metadataOnly, backend=backend, threads=threads, reportFormat=reportFormat, maxErrors=maxErrors, resultCache=resultCache, profile=profile)
+        if profile is not None:
+            if profileTo == '-':
+                profile.printReport(sys.stderr)
+            else:
+                profile.writeJSON(profileTo)
+    sys.exit (rc)
@@ -0,0 +1,181 @@
+#-------------------------------------------------------------
+# Name: backends.py
+#
+# The ways the checker can read a netCDF file.
+#
+#   native  the pure Python reader in netcdf3.py; classic,
+#           64-bit offset and CDF-5 files only
+#   cdms2   CDAT's cdms2 module; any file netCDF can read,
+#           including netCDF-4
+#   auto    native for the formats it can read, cdms2 for the
+#           rest (the default)
+#
+# The checker was written against cdms2, so the native backend
+# presents a file through the small part of the cdms2 API that
+# the checks use (CdmsFile, FileVariable and FileAxis).  cdms2,
+# and netcdf3.py with numpy, are only imported when a file is
+# actually opened with them.
+#-------------------------------------------------------------
+
+AUTO = 'auto'
+NATIVE = 'native'
+CDMS2 = 'cdms2'
+BACKENDS = (AUTO, NATIVE, CDMS2)
+
+
+#-----------------------------------
+# Native backend
+#-----------------------------------
+class NativeVariable:
+    """Stands in for a cdms2 FileVariable"""
+    def __init__(self, ncvar):
+        self._obj_ = ncvar           # As cdms2: the underlying variable, with .dimensions
+        self.id = ncvar.name
+        self.attributes = ncvar.attributes
+        self.shape = ncvar.shape
+        self.dtype = ncvar.dtype
+
+    def __getattr__(self, name):
+        # cdms2 makes the netCDF attributes available as python attributes
+        try:
+            return self.__dict__['attributes'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def typecode(self):
+        return self.dtype.char
+
+    def getAxisIds(self):
+        return list(self._obj_.dimensions)
+
+    def getAxisIndex(self, name):
+        ids = self.getAxisIds()
+        if name in ids:
+            return ids.index(name)
+        return -1
+
+    def getValue(self):
+        return self._obj_.data()
+
+    def __getitem__(self, key):
+        return self._obj_.data()[key]
+
+
+class NativeAxis(NativeVariable):
+    """Stands in for a cdms2 FileAxis: a coordinate variable, or a dimension
+    without one (ncvar None)"""
+    def __init__(self, name, length, ncvar=None):
+        if ncvar is not None:
+            NativeVariable.__init__(self, ncvar)
+        else:
+            self._obj_ = None
+            self.id = name
+            self.attributes = {}
+            self.shape = (length,)
+            self.dtype = None
+
+    def isTime(self):
+        """As cdms2: an axis attribute of T, units of the form 'X since Y' or
+        a name beginning with 'time'"""
+        if self.attributes.get('axis') == 'T':
+            return 1
+        units = self.attributes.get('units', '')
+        if isinstance(units, str) and ' since ' in units.lower():
+            return 1
+        return self.id.strip().lower()[:4] == 'time'
+
+
+class NativeDataset:
+    """Stands in for a cdms2 CdmsFile.
+
+    variables holds the non-coordinate variables and axes one entry per
+    dimension, as cdms2 does; _file_.variables holds every variable."""
+    def __init__(self, path):
+        from cfchecker import netcdf3
+        self._file_ = netcdf3.Dataset(path)
+        self.id = path
+        self.attributes = self._file_.attributes
+        self.dimensions = self._file_.dimensions
+
+        self.variables = {}
+        coordVars = {}
+        for (name, ncvar) in self._file_.variables.items():
+            if ncvar.dimensions == (name,):
+                coordVars[name] = ncvar
+            else:
+                self.variables[name] = NativeVariable(ncvar)
+
+        self.axes = {}
+        for (name, length) in self.dimensions.items():
+            self.axes[name] = NativeAxis(name, length, coordVars.get(name))
+
+    def __getitem__(self, name):
+        if self.variables.has_key(name):
+            return self.variables[name]
+        elif self.axes.has_key(name) and self._file_.variables.has_key(name):
+            return self.axes[name]
+        return None
+
+    def close(self):
+        self._file_.close()
+
+
+class NativeBackend:
+    name = NATIVE
+    threadSafe = 1               # Data are sliced out of a read-only mmap
+
+    def open(self, path):
+        return NativeDataset(path)
+
+    def isAxis(self, obj):
+        return isinstance(obj, NativeAxis)
+
+
+#-----------------------------------
+# cdms2 backend
+#-----------------------------------
+class CdmsBackend:
+    name = CDMS2
+    threadSafe = 0               # The netCDF library is not thread safe
+
+    def __init__(self):
+        import cdms2
+        from cdms2.axis import FileAxis
+        from cdms2.auxcoord import FileAuxAxis1D
+        self.cdms = cdms2
+        self.axisClasses = (FileAxis, FileAuxAxis1D)
+
+    def open(self, path):
+        return self.cdms.open(path, "r")
+
+    def isAxis(self, obj):
+        return isinstance(obj, self.axisClasses)
+
+
+_backends = {}
+
+def getBackend(name, path=None):
+    """Return the backend called name (one of BACKENDS) to read path with.
+
+    auto chooses native for the formats netcdf3.py can read and cdms2
+    otherwise.  Raises ImportError if cdms2 is needed but not installed."""
+    if name is None or name == AUTO:
+        from cfchecker import netcdf3
+        if path is not None and netcdf3.formatVersion(path) is not None:
+            return getBackend(NATIVE)
+        try:
+            return getBackend(CDMS2)
+        except ImportError:
+            raise ImportError("%s is not a classic format netCDF file and cdms2, needed to read other formats, is not installed" % path)
+
+    if not _backends.has_key(name):
+        if name == NATIVE:
+            _backends[name] = NativeBackend()
+        elif name == CDMS2:
+            _backends[name] = CdmsBackend()
+        else:
+            raise ValueError("Unknown backend: %s (choose from %s)" % (name, ", ".join(BACKENDS)))
+    return _backends[name]
@@ -0,0 +1,224 @@
+#-------------------------------------------------------------
+# Name: batch.py
+#
+# Check several netCDF files in one run, optionally spread over
+# a pool of worker processes.  Each worker creates a single
+# CFChecker and loads the udunits system and reference tables
+# once, then checks every file it is handed.
+#
+# The reports are written in the format chosen (see
+# reporters.py); the summary of a batch is only printed with
+# the text report.
+#
+# The checkers of a batch reuse the findings of files with the
+# same header as one they have already checked (see dedup.py).
+#
+# When profiling, each worker records into a Profile of its own
+# (see profiling.py), whose entries are sent back with the report
+# of each file and added to the Profile of the batch.
+#-------------------------------------------------------------
+
+import os, sys, traceback
+from cStringIO import StringIO
+
+from cfchecker.cfchecks import CFChecker
+from cfchecker.reporters import REPORTERS, TEXT
+from cfchecker.profiling import Profile
+
+# Exit status of a run: 0 if no file gave errors or warnings, else
+EXIT_ERRORS = 1              # Some file had errors
+EXIT_WARNINGS = 2            # Some file had warnings, none had errors
+
+
+def runChecker(inst, file):
+    """Run inst.checker(file), returning (rc, errors, warnings, info).
+
+    Unrecoverable problems that would otherwise end the program (checker()
+    calls exit() for a bad filename, cdms raises for an unreadable file) are
+    reported and counted as a single error so that the rest of the batch can
+    carry on.  They are reported on stderr unless the report is text, so as
+    not to break a structured report."""
+    if isinstance(inst.reporter, REPORTERS[TEXT]):
+        out = sys.stdout
+    else:
+        out = sys.stderr
+    try:
+        rc = inst.checker(file)
+    except SystemExit, e:
+        if e.code is None or isinstance(e.code, int):
+            rc = e.code or 0
+        else:
+            print >>out, e.code
+            rc = 1
+    except KeyboardInterrupt:
+        raise
+    except:
+        traceback.print_exc(file=out)
+        rc = 1
+
+    err = inst.err
+    if rc > 0 and not err:
+        err = 1
+    return (rc, err, inst.warn, inst.info)
+
+
+def checkCaptured(inst, file):
+    """Check file, capturing its report; return (rc, errors, warnings, info, report)"""
+    stdout = sys.stdout
+    sys.stdout = report = StringIO()
+    try:
+        result = runChecker(inst, file)
+    finally:
+        sys.stdout = stdout
+    return result + (report.getvalue(),)
+
+
+#-----------------------------------
+# Worker process
+#-----------------------------------
+_inst = None
+
+def _initWorker(kwargs, profiling=0):
+    global _inst
+    if profiling:
+        kwargs = dict(kwargs, profile=Profile())
+    _inst = CFChecker(**kwargs)
+    _inst.setUp()
+
+def _checkInWorker(job):
+    (index, file) = job
+    result = (index,) + checkCaptured(_inst, file)
+    if _inst.profile is not None:
+        result = result + (_inst.profile.take(),)
+    return result
+
+
+def largestFirst(files):
+    """Return (index, file) pairs ordered by decreasing file size"""
+    def size(file):
+        try:
+            return os.path.getsize(file)
+        except OSError:
+            return 0
+    jobs = list(enumerate(files))
+    jobs.sort(key=lambda job: size(job[1]), reverse=True)
+    return jobs
+
+
+#-----------------------------------
+def checkFiles(files, jobs=1, **kwargs):
+#-----------------------------------
+    """Check each of files, printing a report for each one in the order
+    given followed by a summary when there is more than one file.
+
+    jobs is the number of worker processes to use; kwargs are passed on to
+    CFChecker, a profile being filled in by the workers.  Returns the exit
+    status of the run (see summaryCode); the numbers of errors and warnings
+    are only given in the reports and the summary."""
+
+    reporterClass = REPORTERS[kwargs.get('reportFormat', TEXT)]
+    sys.stdout.write(reporterClass.header)
+    try:
+        return _checkFiles(files, jobs, kwargs)
+    finally:
+        sys.stdout.write(reporterClass.footer)
+
+
+def _checkFiles(files, jobs, kwargs):
+    if len(files) == 1:
+        # Single file; report exactly as a plain checker() call would
+        inst = CFChecker(**kwargs)
+        try:
+            rc = inst.checker(files[0])
+            return summaryCode([(rc, inst.err, inst.warn, inst.info)])
+        finally:
+            inst.close()
+
+    results = [None] * len(files)
+    kwargs = dict(kwargs)
+    kwargs.setdefault('dedup', 1)
+
+    if jobs <= 1:
+        inst = CFChecker(**kwargs)
+        try:
+            for i in range(len(files)):
+                results[i] = runChecker(inst, files[i])
+        finally:
+            inst.close()
+    else:
+        from multiprocessing import Pool
+
+        profile = kwargs.get('profile')
+        pool = Pool(min(jobs, len(files)), _initWorker, (dict(kwargs, profile=None), profile is not None))
+        try:
+            # Reports are written in command-line order as soon as all the
+            # files before them have finished.
+            nextReport = 0
+            for result in pool.imap_unordered(_checkInWorker, largestFirst(files)):
+                results[result[0]] = result[1:6]
+                if profile is not None:
+                    profile.add(result[6])
+                while nextReport < len(files) and results[nextReport] is not None:
+                    sys.stdout.write(results[nextReport][4])
+                    sys.stdout.flush()
+                    nextReport = nextReport + 1
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        pool.join()
+
+    if kwargs.get('reportFormat', TEXT) == TEXT:
+        return printSummary(files, results)
+    return summaryCode(results)
+
+
+#-----------------------------------
+def printSummary(files, results):
+#-----------------------------------
+    """Print a summary of results (one (rc, err, warn, info, ...) tuple per
+    file) and return the aggregate return code."""
+    totalErr = 0
+    totalWarn = 0
+    totalInfo = 0
+    withErrors = 0
+    withWarnings = 0
+
+    print ""
+    print "SUMMARY:", len(files), "files checked"
+    print "====================="
+    for i in range(len(files)):
+        (rc, err, warn, info) = results[i][:4]
+        print "%s: ERRORS %d, WARNINGS %d, INFORMATION %d" % (files[i], err, warn, info)
+        totalErr = totalErr + err
+        totalWarn = totalWarn + warn
+        totalInfo = totalInfo + info
+        if err:
+            withErrors = withErrors + 1
+        elif warn:
+            withWarnings = withWarnings + 1
+
+    print ""
+    print "Files with errors:", withErrors
+    print "Files with warnings only:", withWarnings
+    print "Total ERRORS detected:", totalErr
+    print "Total WARNINGS given:", totalWarn
+    print "Total INFORMATION messages:", totalInfo
+
+    return summaryCode(results)
+
+
+#-----------------------------------
+def summaryCode(results):
+#-----------------------------------
+    """The exit status of a run giving results, (rc, errors, warnings, ...)
+    for each file: EXIT_ERRORS if any file had errors, else EXIT_WARNINGS if
+    any had warnings, else 0.  The counts themselves are not used, as an exit
+    status is taken modulo 256."""
+    status = 0
+    for result in results:
+        if result[1]:
+            return EXIT_ERRORS
+        elif result[2]:
+            status = EXIT_WARNINGS
+    return status
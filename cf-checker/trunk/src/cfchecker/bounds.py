@@ -0,0 +1,214 @@
+#-------------------------------------------------------------
+# Name: bounds.py
+#
+# Analysis of boundary variables (CF section 7.1) using NumPy.
+#
+# Coordinates and their bounds are read a block of rows at a
+# time through the supplied reader functions, with the last row
+# of each block carried over to the next, so the memory used is
+# bounded by the chunk size rather than the size of the arrays.
+#-------------------------------------------------------------
+
+import numpy
+
+RTOL = 1.0e-6          # Relative tolerance when comparing shared cell vertices
+
+
+class BoundsReport:
+    """Result of analyse().  Each attribute is None if no problem of that kind
+    was found, otherwise the index of the first offending cell."""
+    def __init__(self):
+        self.outside = None     # Cell whose coordinate value lies outside its bounds
+        self.gap = None         # 1-D: cell followed by a gap before the next cell
+        self.overlap = None     # 1-D: cell overlapped by the next cell
+        self.order = None       # 1-D: cell whose bounds are in the opposite order to the first cell's
+        self.noncontiguous = None  # 2-D: cell not sharing its vertices with a neighbour
+
+
+def _values(data):
+    return numpy.asarray(numpy.ma.getdata(data), dtype='d')
+
+
+def _close(a, b, period=None):
+    # A NaN vertex is taken to match whatever it is compared with
+    diff = numpy.abs(a - b)
+    if period:
+        diff = numpy.minimum(diff % period, period - diff % period)
+    return (diff <= RTOL * numpy.maximum(numpy.maximum(numpy.abs(a), numpy.abs(b)), 1.0)) | numpy.isnan(diff)
+
+
+def _ignoreNaN():
+    """Stop numpy warning on stderr about comparisons with NaN, which would
+    otherwise get into the report; return the settings to restore.  A NaN
+    point or bound is never taken for a problem here (NaN coordinates are
+    reported by the monotonicity check).  numpy keeps these settings for
+    each thread."""
+    return numpy.seterr(invalid='ignore')
+
+
+def _first(mask, offset):
+    """Index of the first true element of mask, with offset added to the first dimension"""
+    index = numpy.unravel_index(mask.argmax(), mask.shape)
+    if len(index) == 1:
+        return offset + int(index[0])
+    return (offset + int(index[0]),) + tuple([int(i) for i in index[1:]])
+
+
+def analyse(readPoints, readBounds, shape, nv, chunkSize, period=None):
+    """Check that the points of a coordinate lie within their cells, and that
+    neighbouring cells are contiguous and consistently ordered.
+
+    readPoints(start, stop) and readBounds(start, stop) return the coordinate
+    and boundary values for rows start:stop of the first dimension.  shape is
+    the shape of the coordinate (0, 1 or 2 dimensions) and nv the number of
+    vertices.  period is the period of the coordinate (360 for longitude),
+    used to cope with cells that straddle the wrap-around point."""
+    report = BoundsReport()
+
+    saved = _ignoreNaN()
+    try:
+        if len(shape) == 0:
+            v = _values(readPoints(None, None)).reshape(1)
+            b = _values(readBounds(None, None)).reshape(1, nv)
+            _containment(v, b, 0, period, report)
+        elif len(shape) == 1:
+            _analyse1D(readPoints, readBounds, shape[0], nv, chunkSize, period, report)
+        elif len(shape) == 2:
+            _analyse2D(readPoints, readBounds, shape, nv, chunkSize, period, report)
+    finally:
+        numpy.seterr(**saved)
+
+    return report
+
+
+def _containment(v, b, offset, period, report):
+    if report.outside is not None:
+        return
+    if period:
+        # Position of the vertices relative to the point, in (-period/2, period/2]
+        rel = (b - v[..., numpy.newaxis] + period/2.0) % period - period/2.0
+        out = (rel.min(axis=-1) > 0) | (rel.max(axis=-1) < 0)
+    else:
+        out = (v < b.min(axis=-1)) | (v > b.max(axis=-1))
+    if out.any():
+        report.outside = _first(out, offset)
+
+
+def _analyse1D(readPoints, readBounds, n, nv, chunkSize, period, report):
+    firstSign = 0
+    prev = None          # (value, low bound, high bound) of the last cell of the previous chunk
+
+    for start in range(0, n, chunkSize):
+        stop = min(start + chunkSize, n)
+        v = _values(readPoints(start, stop)).reshape(-1)
+        b = _values(readBounds(start, stop)).reshape(-1, nv)
+        if period:
+            # Express the bounds on the same side of the wrap-around point as their point
+            b = v[:, numpy.newaxis] + (b - v[:, numpy.newaxis] + period/2.0) % period - period/2.0
+
+        _containment(v, b, start, None, report)
+        if nv != 2:
+            continue
+
+        # Vertex order: every cell should list its bounds in the same order
+        sign = numpy.sign(b[:, 1] - b[:, 0])
+        if firstSign == 0:
+            nonzero = sign.nonzero()[0]
+            if len(nonzero):
+                firstSign = sign[nonzero[0]]
+        if firstSign and report.order is None:
+            bad = sign == -firstSign
+            if bad.any():
+                report.order = _first(bad, start)
+
+        # Contiguity, including the boundary with the previous chunk
+        lo = b.min(axis=-1)
+        hi = b.max(axis=-1)
+        offset = start
+        if prev is not None:
+            v = numpy.concatenate(([prev[0]], v))
+            lo = numpy.concatenate(([prev[1]], lo))
+            hi = numpy.concatenate(([prev[2]], hi))
+            offset = start - 1
+
+        if len(v) > 1:
+            incr = v[1:] >= v[:-1]
+            # Two cells either side of a NaN point have no direction between
+            # them, so are not compared
+            known = incr | (v[1:] < v[:-1])
+            # Where this cell ends and the next one starts, in the direction of the coordinate
+            thisEnd = numpy.where(incr, hi[:-1], lo[:-1])
+            nextStart = numpy.where(incr, lo[1:], hi[1:])
+            shared = _close(thisEnd, nextStart)
+            if report.gap is None:
+                gap = known & ~shared & numpy.where(incr, nextStart > thisEnd, nextStart < thisEnd)
+                if gap.any():
+                    report.gap = _first(gap, offset)
+            if report.overlap is None:
+                overlap = known & ~shared & numpy.where(incr, nextStart < thisEnd, nextStart > thisEnd)
+                if overlap.any():
+                    report.overlap = _first(overlap, offset)
+
+        prev = (v[-1], lo[-1], hi[-1])
+
+
+def _analyse2D(readPoints, readBounds, shape, nv, chunkSize, period, report):
+    (nj, ni) = shape
+    rows = max(1, chunkSize // max(1, ni*nv))
+    prevRow = None       # Bounds of the last row of the previous chunk
+
+    for start in range(0, nj, rows):
+        stop = min(start + rows, nj)
+        v = _values(readPoints(start, stop)).reshape(-1, ni)
+        b = _values(readBounds(start, stop)).reshape(-1, ni, nv)
+
+        _containment(v, b, start, period, report)
+
+        if nv != 4 or report.noncontiguous is not None:
+            prevRow = b[-1:]
+            continue
+
+        # With the vertices in the CF order, cell (j,i) shares vertices 1 and 2
+        # with cell (j,i+1) and vertices 3 and 2 with cell (j+1,i)
+        alongI = ~(_close(b[:, :-1, 1], b[:, 1:, 0], period) & _close(b[:, :-1, 2], b[:, 1:, 3], period))
+        if alongI.any():
+            report.noncontiguous = _first(alongI, start)
+            continue
+
+        offset = start
+        if prevRow is not None:
+            b = numpy.concatenate((prevRow, b))
+            offset = start - 1
+        alongJ = ~(_close(b[:-1, :, 3], b[1:, :, 0], period) & _close(b[:-1, :, 2], b[1:, :, 1], period))
+        if alongJ.any():
+            report.noncontiguous = _first(alongJ, offset)
+
+        prevRow = b[-1:]
+
+
+def firstClockwiseCell(readLonBounds, readLatBounds, shape, nv, chunkSize):
+    """Return the index of the first cell of a 2-D grid whose vertices are not
+    traversed anticlockwise in the longitude-latitude plane, or None."""
+    (nj, ni) = shape
+    rows = max(1, chunkSize // max(1, ni*nv))
+
+    saved = _ignoreNaN()
+    try:
+        for start in range(0, nj, rows):
+            stop = min(start + rows, nj)
+            x = _values(readLonBounds(start, stop)).reshape(-1, ni, nv)
+            y = _values(readLatBounds(start, stop)).reshape(-1, ni, nv)
+
+            # Longitudes relative to the first vertex, so cells crossing the
+            # wrap-around point are not turned inside out
+            x = (x - x[..., :1] + 180.0) % 360.0 - 180.0
+
+            # Twice the signed area of each cell (shoelace formula); negative if clockwise
+            area = (x * numpy.roll(y, -1, axis=-1) - numpy.roll(x, -1, axis=-1) * y).sum(axis=-1)
+            clockwise = area < 0
+            if clockwise.any():
+                return _first(clockwise, start)
+    finally:
+        numpy.seterr(**saved)
+
+    return None
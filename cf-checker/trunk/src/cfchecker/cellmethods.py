@@ -0,0 +1,177 @@
+#-------------------------------------------------------------
+# Name: cellmethods.py
+#
+# Parser for the cell_methods attribute.
+#
+# A cell_methods string is a list of entries, each of the form
+#
+#   name: [name: ...] method [where type1 [over type2]]
+#       [within|over days|years] [(comment)]
+#
+# where a standardized comment is
+#
+#   (interval: value unit [interval: ...] [comment: remainder])
+#
+# parse() splits the string into tokens with one regular
+# expression, compiled here, and returns a CellMethods: the
+# entries of the string and where its syntax is wrong, if it is.
+# The parse of each distinct string is kept, as the files of an
+# archive repeat the same few cell_methods over and over, and is
+# shared by all the checks that look at the attribute.  Checks
+# must not change it.
+#
+# The parser only looks at the syntax.  Whether the names,
+# methods, types and units are valid is left to the checks.
+#-------------------------------------------------------------
+
+import re
+
+# The methods defined by the CF conventions
+METHODS = ('point', 'sum', 'maximum', 'median', 'mid_range', 'minimum', 'mean', 'mode',
+           'standard_deviation', 'variance')
+
+# Number of parsed strings kept
+MAX_PARSED = 1024
+
+# A token: a comment in parentheses, a name followed by a colon or a
+# word.  Anything else (a lone colon or parenthesis) is a syntax error.
+_TOKEN = re.compile(r'\s*(?:(?P<comment>\([^)]*\))|(?P<name>[^\s:()]+)\s*:|(?P<word>[^\s:()]+)|(?P<bad>\S))')
+_METHOD = re.compile(r'[a-z_]+$')
+_INTERVAL = re.compile(r'\s*interval:\s+(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s+(?P<unit>\S+)')
+_REMARK = re.compile(r'\s*comment:\s*(?P<remark>.*)$', re.S)
+
+
+class Entry:
+    """An entry of a cell_methods string.  names are the dimensions or
+    standard names before the method, without their colons; where and over
+    are type1 and type2 of a 'where type1 over type2' clause; climatology is
+    ('within' or 'over', 'days' or 'years'); comment is the text between the
+    parentheses, intervals the (value, unit) of its interval clauses and
+    remark the rest of it."""
+    def __init__(self, names, method):
+        self.names = names
+        self.method = method
+        self.where = None
+        self.over = None
+        self.climatology = None
+        self.comment = None
+        self.intervals = ()
+        self.remark = None
+
+    def setComment(self, comment):
+        self.comment = comment
+        intervals = []
+        position = 0
+        m = _INTERVAL.match(comment)
+        while m:
+            intervals.append((m.group('value'), m.group('unit')))
+            position = m.end()
+            m = _INTERVAL.match(comment, position)
+        self.intervals = tuple(intervals)
+        m = _REMARK.match(comment, position)
+        if m:
+            self.remark = m.group('remark')
+        elif intervals:
+            self.remark = comment[position:].strip() or None
+        else:
+            self.remark = comment
+
+    def __repr__(self):
+        return "<Entry %s %s>" % (" ".join([name + ":" for name in self.names]), self.method)
+
+
+class CellMethods:
+    """The parse of a cell_methods string: its entries, and error, the text
+    from the first token that does not fit the syntax (None if the whole
+    string does).  The entries after a syntax error are those found from
+    the next name on."""
+    def __init__(self, value, entries, error):
+        self.value = value
+        self.entries = entries
+        self.error = error
+
+    def methods(self):
+        """The methods of the entries, in order"""
+        return [entry.method for entry in self.entries]
+
+
+def _tokenize(value):
+    tokens = []              # (kind, text, position)
+    position = 0
+    while 1:
+        m = _TOKEN.match(value, position)
+        if not m:
+            return tokens
+        kind = m.lastgroup
+        text = m.group(kind)
+        if kind == 'comment':
+            text = text[1:-1]
+        tokens.append((kind, text, m.start(kind)))
+        position = m.end()
+
+
+def _word(tokens, i, words=None):
+    # The word token at i, if it is one of words
+    if i < len(tokens) and tokens[i][0] == 'word':
+        if words is None or tokens[i][1] in words:
+            return tokens[i][1]
+    return None
+
+
+def _parse(value):
+    tokens = _tokenize(value)
+    entries = []
+    error = None
+    i = 0
+    while i < len(tokens):
+        start = i
+        names = []
+        while i < len(tokens) and tokens[i][0] == 'name':
+            names.append(tokens[i][1])
+            i = i + 1
+        method = _word(tokens, i)
+        if not names or method is None or not _METHOD.match(method):
+            # Skip to the next entry
+            if error is None:
+                if i == len(tokens):
+                    i = start
+                error = value[tokens[i][2]:]
+            i = max(i, start + 1)
+            while i < len(tokens) and tokens[i][0] != 'name':
+                i = i + 1
+            continue
+
+        entry = Entry(tuple(names), method)
+        i = i + 1
+        if _word(tokens, i, ('where',)) and _word(tokens, i+1):
+            entry.where = tokens[i+1][1]
+            i = i + 2
+            if _word(tokens, i, ('over',)) and _word(tokens, i+1):
+                entry.over = tokens[i+1][1]
+                i = i + 2
+        if _word(tokens, i, ('within', 'over')) and _word(tokens, i+1, ('days', 'years')):
+            entry.climatology = (tokens[i][1], tokens[i+1][1])
+            i = i + 2
+        if i < len(tokens) and tokens[i][0] == 'comment':
+            entry.setComment(tokens[i][1])
+            i = i + 1
+        entries.append(entry)
+
+    if not entries and error is None:
+        error = value
+    return CellMethods(value, entries, error)
+
+
+_parsed = {}                 # cell_methods string -> CellMethods
+
+def parse(value):
+    """The CellMethods of the cell_methods string value"""
+    try:
+        return _parsed[value]
+    except KeyError:
+        pass
+    cellMethods = _parse(value)
+    if len(_parsed) >= MAX_PARSED:
+        _parsed.clear()
+    _parsed[value] = cellMethods
+    return cellMethods
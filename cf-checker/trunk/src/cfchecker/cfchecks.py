@@ -15,53 +15,177 @@
 # CF Checker Version: See __version__
 #
 #-------------------------------------------------------------
-''' cfchecker [-a|--area_types area_types.xml] [-s|--cf_standard_names standard_names.xml] [-u|--udunits udunits.dat] [-v|--version CFVersion] file1 [file2...]
+''' cfchecker [-a|--area_types area_types.xml] [-s|--cf_standard_names standard_names.xml] [-u|--udunits udunits.dat] [-v|--version CFVersion] [-j|--jobs N] [-t|--threads N] [-f|--format text|jsonl|junit] [-m|--metadata-only] [--fail-fast|--max-errors N] [--result-cache FILE] [--profile FILE|-] [--backend auto|native|cdms2] [--daemon SOCKET] file1 [file2...]
+ cfchecker --serve SOCKET|- [options]
 
 Description:
  The cfchecker checks NetCDF files for compliance to the CF standard.
  
 Options:
  -a or --area_types:
-       the location of the CF area types table (xml)
+       the location (path or URL) of the CF area types table (xml).
+       Defaults to the copy shipped with the checker.
        
  -s or --cf_standard_names:
-       the location of the CF standard name table (xml)
+       the location (path or URL) of the CF standard name table (xml).
+       Defaults to the copy shipped with the checker.  Tables fetched from a URL
+       are cached and only downloaded again when they change on the server.
        
  -u or --udunits:
        the location of the udunits.dat file
 
  -h or --help: Prints this help text.
 
+ -j or --jobs:
+       the number of files to check in parallel (default 1).  When more than
+       one file is given a summary is printed after the individual reports.
+
+ -t or --threads:
+       the number of threads to check the variables of each file on (default
+       1).  Worth using for files with many variables; the report is the same
+       as with a single thread.
+
+ -f or --format:
+       how to write the report: text (the default), jsonl (one JSON object
+       per finding and one summarising each file) or junit (JUnit XML, a
+       testsuite per file with a testcase per variable; errors are failures).
+
+ -m or --metadata-only:
+       only run the checks that use the file header (dimensions, variables and
+       attributes); checks that read variable data are skipped and listed in
+       the report.
+
+ --max-errors:
+       stop checking a file once N errors have been reported.  The checks that
+       read variable data are then run after all the checks of the header, so a
+       file with a bad header is rejected without its data being read.
+
+ --fail-fast:
+       the same as --max-errors 1.
+
+ --result-cache:
+       keep the reports of the files checked in the SQLite database FILE.  A
+       file checked again is not re-read if it has not changed (same size,
+       modification time and header) and is checked in the same way (same
+       checker, CF version, standard name table and options); its stored report
+       is given instead.  Each report is stored as soon as the file is checked,
+       so an interrupted run carries on where it stopped.
+
+ --profile:
+       record the wall time, calls, variable data read and (where the
+       tracemalloc module is available) peak memory of each check on each
+       variable.  With - a report sorted by time is printed on standard error
+       at the end; otherwise the records are written to FILE as JSON.
+
+ --serve:
+       run as a daemon: load udunits and the tables once, then check the files
+       asked for by clients connecting to the Unix domain socket SOCKET, or
+       listed on standard input if SOCKET is -.  Requests and replies are
+       lines of JSON (see daemon.py).  At most N files are checked at once,
+       N being given by --jobs; the other options are the defaults of the
+       requests.
+
+ --daemon:
+       have the files checked by the daemon serving on SOCKET, which saves
+       loading udunits and the tables.  The report is as it would otherwise
+       be, but for naming the files by their absolute paths; the tables are
+       those of the daemon.
+
+ --backend:
+       how to read the files: native (the checker's own reader, for the
+       classic, 64-bit offset and CDF-5 netCDF formats), cdms2 (CDAT, needed
+       for netCDF-4 files) or auto (native where it can, otherwise cdms2; the
+       default).
+
  -v or --version: CF version to check against, use auto to auto-detect the file version.
 
 '''
 
 from sys import *
-import cdms2 as cdms, re, string, types, numpy.oldnumeric as Numeric, numpy
-
-from cdms2.axis import FileAxis
-from cdms2.auxcoord import FileAuxAxis1D
+import re, string, types
+import os, sys, threading, hashlib
 
 
 # Version is imported from the package module cfchecker/__init__.py
 from cfchecker import __version__
-
-# Use ctypes to interface to the UDUNITS-2 shared library
-# The udunits2 library needs to be in a standard path o/w export LD_LIBRARY_PATH
-from ctypes import *
-udunits=CDLL("libudunits2.so")
+from cfchecker.tablecache import loadTable
+from cfchecker.backends import getBackend, BACKENDS
+from cfchecker.units import UnitSystem
+from cfchecker.graph import VariableGraph
+from cfchecker.rules import Rule, Registry, AXIS, NON_AXIS, COORDINATE, GRID_MAPPING
+from cfchecker import parallel, cellmethods
+from cfchecker.context import RunContext, StopCheck
+from cfchecker.dedup import DataCheck, HeaderFindings, HeaderMemo
+from cfchecker.findings import ERROR, WARNING, INFO, FileStart, VariableStart, Finding, Text, FileEnd, joinItems
+from cfchecker.reporters import getReporter, FORMATS
+
+# numpy, the file readers, the bounds and result cache modules (and through
+# them sqlite3) are imported by the methods that use them, and udunits is
+# only loaded by setUp(), so that parsing the command line, printing the
+# help or handing the files to a daemon does not pay for loading them.
+
+def arrayType():
+    """The type of NumPy arrays"""
+    import numpy
+    return numpy.ndarray
  
-STANDARDNAME = 'http://cf-pcmdi.llnl.gov/documents/cf-standard-names/standard-name-table/current/cf-standard-name-table.xml'
-AREATYPES = 'http://cf-pcmdi.llnl.gov/documents/cf-standard-names/area-type-table/current/area-type-table.xml'
+# Copies of the standard name and area type tables are shipped with the package.
+# The current tables can still be used by giving their URLs; they are then
+# downloaded once and revalidated against the server on later runs (see httpcache.py).
+DATADIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STANDARDNAME = os.path.join(DATADIR, 'cf-standard-name-table.xml')
+AREATYPES = os.path.join(DATADIR, 'area-type-table.xml')
 
 
 CFVersions=['CF-1.0','CF-1.1','CF-1.2','CF-1.3','CF-1.4','CF-1.5','CF-1.6']
 Versions=[1.0,1.1,1.2,1.3,1.4,1.5,1.6]
 
+# Number of values read at a time by the checks that examine variable data
+CHUNK_SIZE = 1048576
+
+# Attributes naming a boundary variable, with the section defining them.  A
+# chain of references that leads from a boundary variable back to its
+# coordinate is reported against that section.
+BOUNDARY_SECTIONS = {'bounds': "7.1",
+                     'climatology': "7.4"}
+
+# Checks that read variable data, in the order they are listed when skipped
+# in metadata-only mode.  They are all run through CFChecker.dataCheck().
+DATA_CHECKS = [('chkValuesMonotonic', "(5) Coordinate values strictly monotonic"),
+               ('chkBoundsData', "(7.1) Coordinate values within cell bounds; cells contiguous"),
+               ('chkCellVertexData', "(7.1) Cell vertices traversed anticlockwise"),
+               ('chkCompressValues', "(8.2) Compressed index values in range")]
+
+# The checks run on each variable, in the order they are run.  A rule with
+# triggers is only run on variables carrying at least one of those attributes;
+# see rules.py
+VARIABLE_RULES = Registry([
+    Rule('chkDimensions', roles=[NON_AXIS], args=('allCoordVars',)),
+    Rule('chkDescription'),
+    Rule('chkAttribute', args=('allCoordVars',), perAttribute=1),
+    Rule('chkUnits', args=('allCoordVars',)),
+    Rule('chkValidMinMaxRange', triggers=['valid_range']),
+    Rule('chk_FillValue', triggers=['_FillValue', 'missing_value']),
+    Rule('chkAxisAttribute', triggers=['axis']),
+    Rule('chkPositiveAttribute', triggers=['positive']),
+    Rule('chkCellMethods', triggers=['cell_methods']),
+    Rule('chkCellMeasures', triggers=['cell_measures']),
+    Rule('chkFormulaTerms', triggers=['formula_terms'], args=('allCoordVars',)),
+    Rule('chkCompressAttr', triggers=['compress']),
+    Rule('chkPackedData', triggers=['scale_factor', 'add_offset']),
+    # Additional conformance checks from CF-1.3 onwards
+    Rule('chkFlags', triggers=['flag_meanings', 'flag_values', 'flag_masks'], minVersion=1.3),
+    # Additional conformance checks from CF-1.6 onwards
+    Rule('chkCFRole', triggers=['cf_role'], minVersion=1.6),
+    Rule('chkRaggedArray', triggers=['sample_dimension', 'instance_dimension'], minVersion=1.6),
+    Rule('chkMultiDimCoord', roles=[COORDINATE], args=('axes',)),
+    Rule('chkValuesMonotonic', roles=[COORDINATE], readsData=1),
+    Rule('chkGridMappingVar', roles=[GRID_MAPPING]),
+    Rule('chkAxisVariable', roles=[AXIS]),
+    ])
+
 #-----------------------------------------------------------
 from xml.sax import ContentHandler
-from xml.sax import make_parser
-from xml.sax.handler import feature_namespaces
 
 
 def normalize_whitespace(text):
@@ -78,6 +202,8 @@ class ConstructDict(ContentHandler):
         self.inEntryIdContent = 0
         self.inVersionNoContent = 0
         self.inLastModifiedContent = 0
+        self.version_number = ""
+        self.last_modified = ""
         self.dict = {}
         
     def startElement(self, name, attrs):
@@ -158,6 +284,8 @@ class ConstructList(ContentHandler):
     def __init__(self):
         self.inVersionNoContent = 0
         self.inLastModifiedContent = 0
+        self.version_number = ""
+        self.last_modified = ""
         self.list = []
         
     def startElement(self, name, attrs):
@@ -236,8 +364,23 @@ def chkDerivedName(name):
 # Checking class
 #======================
 class CFChecker:
+
+  # Attributes that belong to the file being checked.  They are kept in the
+  # RunContext of the calling thread (see context.py), so that one instance
+  # can check files on several threads at once.
+  RUN_STATE = frozenset(['variable', 'version', 'AttrList', 'f', 'meta', 'graph', 'backend', 'headerOnly',
+                         'coordVars', 'auxCoordVars', 'boundsVars', 'climatologyVars',
+                         'gridMappingVars', 'attachedVars', 'allCoordVars', 'axes',
+                         'err', 'warn', 'info', 'cf_roleCount', 'raggedArrayFlag', 'skippedChecks',
+                         'deferredChecks'])
+
+  # Reference data loaded by setUp() and setUpAreaTypes(), shared by checkers
+  # made by sharing()
+  REFERENCE_DATA = ('unitSystem', 'std_name_dh', 'stdNames', 'area_type_lh', 'areaTypeNames',
+                    'formulas', 'alias', 'attrLists')
     
-  def __init__(self, uploader=None, useFileName="yes", badc=None, coards=None, cfStandardNamesXML=None, cfAreaTypesXML=None, udunitsDat=None, version=Versions[-1]):
+  def __init__(self, uploader=None, useFileName="yes", badc=None, coards=None, cfStandardNamesXML=STANDARDNAME, cfAreaTypesXML=AREATYPES, udunitsDat=None, version=Versions[-1], cacheDir=None, metadataOnly=None, backend=None, threads=1, reportFormat='text', maxErrors=None, resultCache=None, dedup=0, profile=None):
+      self.__dict__['_local'] = threading.local()   # Holds each thread's RunContext
       self.uploader = uploader
       self.useFileName = useFileName
       self.badc = badc
@@ -245,254 +388,662 @@ class CFChecker:
       self.standardNames = cfStandardNamesXML
       self.areaTypes = cfAreaTypesXML
       self.udunits = udunitsDat
-      self.version = version
-      self.err = 0
-      self.warn = 0
-      self.info = 0
-      self.cf_roleCount = 0          # Number of occurences of the cf_role attribute in the file
-      self.raggedArrayFlag = 0       # Flag to indicate if file contains any ragged array representations
+      self.requestedVersion = version  # CF version asked for; 0.0 means auto-detect for each file
+      self.cacheDir = cacheDir       # Location of compiled standard name/area type tables
+      self.metadataOnly = metadataOnly   # Skip all checks that read variable data
+      self.backendName = backend     # How to read files (see backends.py); None means auto
+      self.threads = threads         # Number of threads variables are checked on
+      self.reporter = getReporter(reportFormat)  # Writes the report (see reporters.py)
+      self.maxErrors = maxErrors     # Stop checking a file after this many errors; None for no limit
+      self.resultCache = None        # Reports of files already checked (see resultcache.py)
+      if resultCache:
+          from cfchecker.resultcache import ResultCache
+          self.resultCache = ResultCache(resultCache)
+      self.headerMemo = None         # Findings of the headers met so far (see dedup.py)
+      if dedup:
+          self.headerMemo = HeaderMemo()
+      self.profile = profile         # Records what the checks cost (see profiling.py); None if not profiling
+      self.dataLock = threading.Lock()   # Serialises data reads for backends that are not thread safe
+      self.setUpLock = threading.Lock()  # Held while loading the reference data
+
+      # Reference data shared by every file checked by this instance.  Loaded on
+      # the first call to checker() (or explicitly by setUp()) and released by close().
+      self.unitSystem = None
+      self.std_name_dh = None
+      self.area_type_lh = None
+      self.stdNames = frozenset()    # Hashed indexes of the names in the two tables
+      self.areaTypeNames = frozenset()
+      self.attrLists = {}            # AttrList for each CF version checked so far
+
+  def __getattr__(self, name):
+      # Only called for attributes not in the instance dictionary
+      if name in CFChecker.RUN_STATE:
+          return getattr(self.runContext(), name)
+      raise AttributeError(name)
+
+  def __setattr__(self, name, value):
+      if name in CFChecker.RUN_STATE:
+          setattr(self.runContext(), name, value)
+      else:
+          self.__dict__[name] = value
+
+  #---------------------------
+  def runContext(self):
+  #---------------------------
+    """The RunContext of the calling thread: that of the file it is checking,
+    or last checked."""
+    local = self.__dict__['_local']
+    try:
+        return local.context
+    except AttributeError:
+        local.context = RunContext(self.requestedVersion)
+        return local.context
+
+  #------------------------------------
+  def setRunContext(self, context):
+  #------------------------------------
+    self.__dict__['_local'].context = context
+
+  def __enter__(self):
+      self.setUp()
+      return self
+
+  def __exit__(self, excType, excValue, traceback):
+      self.close()
+
+  #----------------------
+  def setUp(self):
+  #----------------------
+    """Load the udunits system, standard name table and formulas.  This is done
+    once per CFChecker instance and reused for every file checked."""
+    if self.unitSystem:
+        return
+
+    self.setUpLock.acquire()
+    try:
+        if self.unitSystem:
+            # Loaded by another thread in the meantime
+            return
+
+        # Initialize udunits-2 package (see units.py).
+        # if self.udunits=None this will load the UDUNITS2 xml file from the default place
+        try:
+            unitSystem=UnitSystem(self.udunits)
+        except IOError, e:
+            exit(str(e))
 
-  def checker(self, file):
+        # Set up dictionary of standard_names and their assoc. units
+        # (compiled to a memory-mapped index on first use, see tablecache.py)
+        self.std_name_dh = loadTable(self.standardNames, ConstructDict, 'standard-name', self.cacheDir)
+        self.stdNames = frozenset(self.std_name_dh.dict)
 
+        self.setUpFormulas()
+
+        # Set last: other threads take a unit system to mean all is loaded
+        self.unitSystem = unitSystem
+    finally:
+        self.setUpLock.release()
+
+  #----------------------------
+  def setUpAreaTypes(self):
+  #----------------------------
+    """Load the area type table, needed from CF-1.4 onwards"""
+    if self.area_type_lh is not None:
+        return
+
+    self.setUpLock.acquire()
+    try:
+        if self.area_type_lh is None:
+            table = loadTable(self.areaTypes, ConstructList, 'area-type', self.cacheDir)
+            self.areaTypeNames = frozenset(table.list)
+            self.area_type_lh = table
+    finally:
+        self.setUpLock.release()
+
+  #----------------------
+  def close(self):
+  #----------------------
+    """Release the udunits system and the reference tables loaded by setUp()."""
+    if self.unitSystem:
+        self.unitSystem.close()
+        self.unitSystem = None
+
+    for table in (self.std_name_dh, self.area_type_lh):
+        if hasattr(table, 'close'):
+            table.close()
+    self.std_name_dh = None
+    self.area_type_lh = None
+    self.stdNames = frozenset()
+    self.areaTypeNames = frozenset()
+    if self.resultCache is not None:
+        self.resultCache.close()
+
+  #-----------------------------
+  def sharing(self, **kwargs):
+  #-----------------------------
+    """Return a new CFChecker, made with kwargs, that uses the reference data
+    loaded by this one instead of loading its own, e.g. to check files with
+    other options without loading the tables again.  The new checker must
+    not be closed; close this one once neither is needed."""
+    self.setUp()
+    self.setUpAreaTypes()
+    other = CFChecker(**kwargs)
+    for name in CFChecker.REFERENCE_DATA:
+        other.__dict__[name] = self.__dict__[name]
+    return other
+
+  def checker(self, file, headerOnly=0, reporter=None):
+    """Check file, printing a report and returning the number of errors
+    (or minus the number of warnings if there were none).  If headerOnly
+    (or metadataOnly) is set the file is opened for its metadata only and
+    the checks that read variable data are skipped; see openFile().
+
+    The report is written by reporter, or self.reporter if None, in batches
+    as the check goes on and in full by the time checker() returns.
+
+    If maxErrors is set the check stops as soon as that many errors have
+    been reported, and the data checks are put off until all the checks of
+    the header have been run, so a bad file is rejected without reading its
+    data.
+
+    With a resultCache, a file that has not changed since it was last checked
+    the same way is not checked again: its stored report is written instead."""
+
+    # Start a new run on this thread, leaving the counts of the previous one behind
+    if reporter is None:
+        reporter = self.reporter
+    context = RunContext(self.requestedVersion, file, reporter)
+    self.setRunContext(context)
+
+    key = None
+    if self.resultCache is not None:
+        key = self.resultCache.key(file)
+    if key is not None:
+        # The version of the standard name table is part of the settings
+        self.setUp()
+        settings = self.resultSettings(headerOnly)
+        cached = self.resultCache.get(key, settings)
+        if cached is not None:
+            context.err = cached.err
+            context.warn = cached.warn
+            context.info = cached.info
+            context.stopped = cached.records[-1].stopped
+            reporter.write(cached.records)
+            return cached.rc
+        context.kept = []
+
+    self.emit(FileStart(file))
+
+    completed = 0
+    try:
+        rc = self._checkFile(file, headerOnly)
+        completed = 1
+        return rc
+    finally:
+        self.emit(FileEnd(file, context.err, context.warn, context.info, completed, context.stopped))
+        context.flush()
+        if completed and key is not None:
+            from cfchecker.resultcache import CachedResult
+            self.resultCache.put(key, settings, CachedResult(rc, context.err, context.warn, context.info, context.kept))
+
+  #----------------------------------------
+  def resultSettings(self, headerOnly):
+  #----------------------------------------
+    """How a file would be checked, as recorded in the result cache: (checker
+    version, CF version, table versions, options)"""
+    tables = self.std_name_dh.version_number+" ("+self.std_name_dh.last_modified+")"
+    options = repr((self.badc, self.coards, self.uploader, self.useFileName,
+                    bool(headerOnly or self.metadataOnly), self.maxErrors,
+                    self.backendName, self.areaTypes))
+    return (__version__, str(self.requestedVersion), tables, options)
+
+  def _checkFile(self, file, headerOnly):
     fileSuffix = re.compile('^\S+\.nc$')
 
-    print ""
+    self.say()
     if self.uploader:
         realfile = string.split(file,".nc")[0]+".nc"
-        print "CHECKING NetCDF FILE:", realfile
+        self.say("CHECKING NetCDF FILE:", realfile)
     elif self.useFileName=="no":
-        print "CHECKING NetCDF FILE"
+        self.say("CHECKING NetCDF FILE")
     else:
-        print "CHECKING NetCDF FILE:",file
-    print "====================="
+        self.say("CHECKING NetCDF FILE:",file)
+    self.say("=====================")
     
     # Check for valid filename
     if not fileSuffix.match(file):
-        print "ERROR (2.1): Filename must have .nc suffix"
+        self.error("2.1", "Filename must have .nc suffix")
         exit(1)
 
-    # Initialize udunits-2 package
-    # (Temporarily ignore messages to std error stream to prevent "Definition override" warnings
-    # being dislayed see Trac #50)
-    # Use ctypes callback functions to declare ut_error_message_handler (uemh)
-    # Don't fully understand why this works!  Solution supplied by ctypes-mailing-list. 19.01.10
-    uemh = CFUNCTYPE(c_int,c_char_p)
-    ut_set_error_message_handler = CFUNCTYPE(uemh,uemh)(("ut_set_error_message_handler",udunits))
-    ut_write_to_stderr = uemh(("ut_write_to_stderr",udunits))
-    ut_ignore = uemh(("ut_ignore",udunits))
-
-    old_handler = ut_set_error_message_handler(ut_ignore)
-                                       
-    # if self.udunits=None this will load the UDUNITS2 xml file from the default place
-    self.unitSystem=udunits.ut_read_xml(self.udunits)
+    # Load the reference data on first use, on a thread of its own while the
+    # file is opened.  Parsing the tables may print warnings, which belong
+    # after the report so far.
+    loading = None
     if not self.unitSystem:
-        exit("Could not read the UDUNITS2 xml database from: %s" % self.udunits)
+        self.runContext().flush()
+        loading = parallel.Background(self.setUp)
 
-    old_handler = ut_set_error_message_handler(ut_write_to_stderr)
+    # Read in netCDF file.  This is the only open; the handle is used for
+    # the whole check and closed when it is finished.
+    try:
+        self.profiled('openFile', self.openFile, file, headerOnly or self.metadataOnly)
+    finally:
+        if loading is not None:
+            try:
+                loading.result()
+            except:
+                self.closeFile()
+                raise
 
-    # Read in netCDF file
     try:
-        self.f=cdms.open(file,"r")
+        #if 'auto' version, check the CF version in the file
+        #if none found, use the default
+        check_auto = (self.version == 0.0)
+        if check_auto:
+            self.version = self.getFileCFVersion()
+            if self.version == 0.0:
+                self.version = Versions[-1]
 
-    except AttributeError:
-        print "NetCDF Attribute Error:"
-        raise
-    except:
-        print "\nCould not open file, please check that NetCDF is formatted correctly.\n".upper()
-        print "ERRORS detected:",1
-        raise
-        exit(1)
+        # Set up dictionary of all valid attributes, their type and use
+        self.setUpAttributeList()
 
-    #if 'auto' version, check the CF version in the file
-    #if none found, use the default
-    check_auto = (self.version == 0.0)
-    if check_auto:
-        self.version = self.getFileCFVersion()
-        if self.version == 0.0:
-            self.version = Versions[-1]
-
-    # Set up dictionary of all valid attributes, their type and use
-    self.setUpAttributeList()
-
-    # Set up dictionary of standard_names and their assoc. units
-    parser = make_parser()
-    parser.setFeature(feature_namespaces, 0)
-    self.std_name_dh = ConstructDict()
-    parser.setContentHandler(self.std_name_dh)
-    parser.parse(self.standardNames)
-
-    if self.version >= 1.4:
-        # Set up list of valid area_types
-        self.area_type_lh = ConstructList()
-        parser.setContentHandler(self.area_type_lh)
-        parser.parse(self.areaTypes)
-    
-    print "Using CF Checker Version",__version__
+        if self.version >= 1.4:
+            # Set up list of valid area_types
+            self.setUpAreaTypes()
 
-    if check_auto:
-        print "Checking against CF Version",str(self.version),"(auto)"
-    else:
-        print "Checking against CF Version",str(self.version)
+        self.say("Using CF Checker Version",__version__)
 
-    print "Using Standard Name Table Version "+self.std_name_dh.version_number+" ("+self.std_name_dh.last_modified+")"
+        if check_auto:
+            self.say("Checking against CF Version",str(self.version),"(auto)")
+        else:
+            self.say("Checking against CF Version",str(self.version))
 
-    if self.version >= 1.4:
-        print "Using Area Type Table Version "+self.area_type_lh.version_number+" ("+self.area_type_lh.last_modified+")"
-    print ""
-    
-    # Read in netCDF file
+        self.say("Using Standard Name Table Version "+self.std_name_dh.version_number+" ("+self.std_name_dh.last_modified+")")
+
+        if self.version >= 1.4:
+            self.say("Using Area Type Table Version "+self.area_type_lh.version_number+" ("+self.area_type_lh.last_modified+")")
+        self.say()
+
+        if self.maxErrors:
+            context = self.runContext()
+            context.errorLimit = self.maxErrors
+            context.deferredChecks = []
+            try:
+                return self._checker()
+            except StopCheck:
+                context.stopped = 1
+                self.variable = None
+                self.say()
+                self.say("Check stopped: maximum number of errors ("+str(self.maxErrors)+") reached")
+                return self.endReport()
+
+        return self._checker()
+    finally:
+        self.closeFile()
+
+  #---------------------------------------
+  def openFile(self, file, headerOnly=0):
+  #---------------------------------------
+    """Open file and keep the handle in self.f until closeFile().  The
+    header is read into self.meta (see metadata.py), which the checks use for
+    all their lookups, and the references between variables into self.graph
+    (see graph.py).
+
+    The backend (see backends.py) only reads the header when a file is
+    opened; variable data is read on demand through getValues().  With
+    headerOnly set getValues() refuses to read any data, so a header-only
+    run never touches the data section of the file."""
+    self.headerOnly = headerOnly
     try:
-        self.f=cdms.open(file,"r")
+        self.backend=getBackend(self.backendName, file)
+    except ImportError, e:
+        self.error(None, e)
+        self.say("ERRORS detected:",1)
+        raise
+
+    try:
+        self.f=self.backend.open(file)
+        # Everything the checks need from the header, read in one pass
+        from cfchecker.metadata import FileMetadata
+        self.meta=FileMetadata(self.f, self.backend)
+        self.graph=VariableGraph(self.meta)
 
     except AttributeError:
-        print "NetCDF Attribute Error:"
+        self.say("NetCDF Attribute Error:")
+        self.closeFile()
         raise
     except:
-        print "\nCould not open file, please check that NetCDF is formatted correctly.\n".upper()
-        print "ERRORS detected:",1
+        self.say("\nCould not open file, please check that NetCDF is formatted correctly.\n".upper())
+        self.say("ERRORS detected:",1)
+        self.closeFile()
         raise
 
+  #-----------------------
+  def closeFile(self):
+  #-----------------------
+    """Close the file opened by openFile()"""
+    if self.f is not None:
+        self.f.close()
+        self.f = None
+    self.meta = None
+    self.graph = None
+
+  #--------------------------------------------
+  def getValues(self, varName, start=None, stop=None):
+  #--------------------------------------------
+    """Read the values of variable varName, optionally only the elements
+    [start:stop] along its first dimension.  All variable data read by the
+    checks goes through here."""
+    if self.headerOnly:
+        raise RuntimeError("Attempt to read data of %s from a file opened header-only" % varName)
+    readVars = self.runContext().readVars
+    if readVars is not None:
+        readVars.add(varName)
+    if not self.backend.threadSafe:
+        self.dataLock.acquire()
     try:
-        return self._checker()
+        var = self.f[varName]
+        if start is None and stop is None:
+            values = var.getValue()
+        else:
+            values = var[start:stop]
     finally:
-        self.f.close()
-  
+        if not self.backend.threadSafe:
+            self.dataLock.release()
+    if self.profile is not None:
+        self.profile.read(getattr(values, 'nbytes', 0))
+    return values
+
+  #---------------------------------------------
+  def dataCheck(self, checkName, *args):
+  #---------------------------------------------
+    """Run the data check checkName (one of DATA_CHECKS) as
+    self.checkName(*args).  If the file is being checked header-only the
+    check is skipped, and recorded as skipped; if there is an error limit
+    it is put off until the header checks are done (see runDeferredChecks()).
+    Returns 0 if the check was run and failed."""
+    context = self.runContext()
+    template = context.template
+    if template is not None:
+        # Its findings depend on the data, not just the header
+        template.append(DataCheck(self.variable, checkName, args))
+        context.template = None
+    try:
+        if self.headerOnly:
+            self.skippedChecks[checkName] = self.skippedChecks.get(checkName, 0) + 1
+            return 1
+        if self.deferredChecks is not None:
+            self.deferredChecks.append((self.variable, checkName, args))
+            return 1
+        return self.runDataCheck(checkName, args)
+    finally:
+        context.template = template
+
+  #---------------------------------------------
+  def runDataCheck(self, checkName, args):
+  #---------------------------------------------
+    """Run the data check checkName now.  If an earlier file with the same
+    header ran it with the same arguments, and the variables it read then
+    have the same contents here, its findings are reused (see dedup.py)."""
+    context = self.runContext()
+    entry = context.headerFindings
+    if entry is None:
+        return self.profiled(checkName, getattr(self, checkName), *args)
+
+    for (reads, records, rc) in entry.results(checkName, args):
+        for (name, digest) in reads:
+            if self.contentDigest(name) != digest:
+                break
+        else:
+            for record in records:
+                context.reuse(record)
+            return rc
+
+    context.capture = []
+    context.readVars = set()
+    try:
+        rc = self.profiled(checkName, getattr(self, checkName), *args)
+        records = context.capture
+        names = context.readVars
+    finally:
+        context.capture = None
+        context.readVars = None
+    reads = [(name, self.contentDigest(name)) for name in sorted(names)]
+    entry.addResult(checkName, args, (reads, records, rc))
+    return rc
+
+  #----------------------------------------
+  def contentDigest(self, varName):
+  #----------------------------------------
+    """sha1 (hex) of the data of variable varName, read CHUNK_SIZE values
+    at a time"""
+    import numpy
+    digests = self.runContext().contentDigests
+    try:
+        return digests[varName]
+    except KeyError:
+        pass
+    sha = hashlib.sha1()
+    shape = tuple(self.meta[varName].shape)
+    if len(shape) == 0 or shape[0] == 0:
+        sha.update(numpy.ascontiguousarray(self.getValues(varName)).tostring())
+    else:
+        rowSize = 1
+        for n in shape[1:]:
+            rowSize = rowSize * n
+        step = max(1, CHUNK_SIZE // max(rowSize, 1))
+        for start in xrange(0, shape[0], step):
+            sha.update(numpy.ascontiguousarray(self.getValues(varName, start, start+step)).tostring())
+    digests[varName] = sha.hexdigest()
+    return digests[varName]
+
+  #------------------------------
+  def runDeferredChecks(self):
+  #------------------------------
+    """Run the data checks put off by dataCheck(), in the order they were
+    put off, each as part of the checks of the variable it was met in."""
+    self.say()
+    self.say("------------------")
+    self.say("Checking variable data")
+    self.say("------------------")
+    rc=1
+    checks=self.deferredChecks
+    self.deferredChecks=None
+    for (variable, checkName, args) in checks:
+        self.variable=variable
+        if not self.runDataCheck(checkName, args): rc=0
+    self.variable=None
+    return rc
+
+  #-----------------------------------------------
+  def profiled(self, checkName, function, *args):
+  #-----------------------------------------------
+    """Return function(*args), recorded as a call of checkName on the
+    variable being checked if profiling (see profiling.py)"""
+    if self.profile is None:
+        return function(*args)
+    return self.profile.call(checkName, self.variable, function, args)
+
+  #------------------------
+  def emit(self, record):
+  #------------------------
+    """Add record (see findings.py) to the report of the file being checked"""
+    self.runContext().emit(record)
+
+  #------------------------
+  def say(self, *items):
+  #------------------------
+    """Add a line made of items, as the print statement would make it, to the
+    text report"""
+    self.emit(Text(joinItems(items)))
+
+  #-------------------------------------------------
+  def addFinding(self, severity, section, items):
+  #-------------------------------------------------
+    """Report a finding without counting it"""
+    self.emit(Finding(severity, section, joinItems(items), self.runContext().file, self.variable, 0))
+
+  #-----------------------------------------------------------
+  def countFinding(self, severity, section, items, line=None):
+  #-----------------------------------------------------------
+    """Report a finding and count it; line is its line in the text report if
+    not the usual one (see Finding)"""
+    context = self.runContext()
+    context.emit(Finding(severity, section, joinItems(items), context.file, context.variable, 1, line))
+    context.count(severity)
+
+  #----------------------------------
+  def error(self, section, *items):
+  #----------------------------------
+    """Report an ERROR against section of the CF conventions (None if no
+    particular section); the message is made of items as by print.  Raises
+    StopCheck (see context.py) if the error limit is reached."""
+    self.countFinding(ERROR, section, items)
+
+  #------------------------------------
+  def warning(self, section, *items):
+  #------------------------------------
+    """Report a WARNING; see error()"""
+    self.countFinding(WARNING, section, items)
+
+  #----------------------------------------
+  def information(self, section, *items):
+  #----------------------------------------
+    """Report an INFO message; see error()"""
+    self.countFinding(INFO, section, items)
+
   def _checker(self):
     """
     Main implementation of checker assuming self.f exists.
     """
-    lowerVars=[]
+    rc=1
+    if self.headerMemo is None:
+        if not self._checkBody(): rc=0
+    elif not self._checkBodyOnce(): rc=0
+
+    # Data checks put off until the header had been checked
+    if self.deferredChecks:
+        if not self.runDeferredChecks(): rc=0
+
+    return self.endReport()
+
+  def _checkBody(self):
+    """All the checks but those put off by dataCheck()"""
+    lowerVars=set()
     rc=1
 
     # Check global attributes
-    if not self.chkGlobalAttributes(): rc=0
+    if not self.profiled('chkGlobalAttributes', self.chkGlobalAttributes): rc=0
         
-    (coordVars,auxCoordVars,boundsVars,climatologyVars,gridMappingVars)=self.getCoordinateDataVars()
+    (coordVars,auxCoordVars,boundsVars,climatologyVars,gridMappingVars)=self.profiled('getCoordinateDataVars', self.getCoordinateDataVars)
     self.coordVars = coordVars
     self.auxCoordVars = auxCoordVars
     self.boundsVars = boundsVars
     self.climatologyVars = climatologyVars
     self.gridMappingVars = gridMappingVars
+    # Variables named by a bounds, climatology or grid_mapping attribute
+    self.attachedVars = boundsVars | climatologyVars | gridMappingVars
+
+    if not self.profiled('chkReferences', self.chkReferences): rc=0
 
     #print "Auxillary Coordinate Vars:",auxCoordVars
     #print "Coordinate Vars: ",coordVars
 
-    allCoordVars=coordVars[:]
-    allCoordVars[len(allCoordVars):]=auxCoordVars[:]
+    allCoordVars=coordVars | auxCoordVars
+    self.allCoordVars = allCoordVars
 
-    self.setUpFormulas()
-    
-    axes=self.f.axes.keys()
+    axes=self.meta.axes
+    self.axes = axes
 
-    # Check each variable
-    for var in self.f._file_.variables.keys():
-        print ""
-        print "------------------"
-        print "Checking variable:",var
-        print "------------------"
-
-        if not self.validName(var):
-            print "ERROR (2.3): Invalid variable name -",var
-            self.err = self.err+1
-            rc=0
+    # The variable checks that apply to this version of CF
+    plan=VARIABLE_RULES.plan(self.version)
 
-        # Check to see if a variable with this name already exists (case-insensitive)
+    # Variables whose names differ only in case from an earlier variable's
+    clashes=set()
+    for var in self.meta.names:
         lowerVar=var.lower()
         if lowerVar in lowerVars:
-            print "WARNING (2.3): variable clash:-",var
-            self.warn = self.warn + 1
+            clashes.add(var)
         else:
-            lowerVars.append(lowerVar)
-
-        if var not in axes:
-            # Non-coordinate variable
-            if not self.chkDimensions(var,allCoordVars): rc=0
-        
-        if not self.chkDescription(var): rc=0
-
-        for attribute in self.f[var].attributes.keys():
-            if not self.chkAttribute(attribute,var,allCoordVars): rc=0
-
-        if not self.chkUnits(var,allCoordVars): rc=0
-        
-        if not self.chkValidMinMaxRange(var): rc=0
-
-        if not self.chk_FillValue(var): rc=0
+            lowerVars.add(lowerVar)
 
-        if not self.chkAxisAttribute(var): rc=0
-
-        if not self.chkPositiveAttribute(var): rc=0
-
-        if not self.chkCellMethods(var): rc=0
-
-        if not self.chkCellMeasures(var): rc=0
-        
-        if not self.chkFormulaTerms(var,allCoordVars): rc=0
-
-        if not self.chkCompressAttr(var): rc=0
-
-        if not self.chkPackedData(var): rc=0
-
-        if self.version >= 1.3:
-            # Additional conformance checks from CF-1.3 onwards
-            if not self.chkFlags(var): rc=0
-
-        if self.version >= 1.6:
-            # Additional conformance checks from CF-1.6 onwards
-            if not self.chkCFRole(var): rc=0
-            if not self.chkRaggedArray(var): rc=0
-
-        if var in coordVars:
-            if not self.chkMultiDimCoord(var, axes): rc=0
-            if not self.chkValuesMonotonic(var): rc=0
-
-        if var in gridMappingVars:
-            if not self.chkGridMappingVar(var) : rc=0
-
-        #print "Axes:",axes
-        if var in axes:
-            # Check var is a FileAxis.  If not then there may be a problem with its declaration.
-            # I.e. Multi-dimensional coordinate var with a dimension of the same name
-            # or an axis that hasn't been identified through the coordinates attribute
-            # CRM035 (17.04.07)
-            if not (isinstance(self.f[var], FileAxis) or isinstance(self.f[var], FileAuxAxis1D)):
-                print "WARNING (5): Possible incorrect declaration of a coordinate variable."
-                self.warn = self.warn+1
-            else:    
-                if self.f[var].isTime():
-                    if not self.chkTimeVariableAttributes(var): rc=0
+    # Check each variable
+    if self.threads > 1 and len(self.meta.names) > 1:
+        if not self.chkVariablesThreaded(self.meta.names, clashes, plan): rc=0
+    else:
+        for var in self.meta.names:
+            if not self.chkVariable(var, var in clashes, plan): rc=0
 
     #print self.cf_roleCount,"variable(s) have the cf_role attribute set"
     if self.version >= 1.6:
-        print " "
+        self.say(" ")
    
-        if self.raggedArrayFlag != 0 and not self.f.attributes.has_key('featureType'):
-            print "ERROR (9.4): The global attribute 'featureType' must be present (A ragged array representation has been used)"
-            self.err = self.err + 1
+        if self.raggedArrayFlag != 0 and not self.meta.attributes.has_key('featureType'):
+            self.error("9.4", "The global attribute 'featureType' must be present (A ragged array representation has been used)")
 
 
-        if self.f.attributes.has_key('featureType'):
-            featureType = self.f.attributes['featureType']
+        if self.meta.attributes.has_key('featureType'):
+            featureType = self.meta.attributes['featureType']
 
             if self.cf_roleCount == 0 and featureType != "point":
-                print "WARNING (9.5): A variable with the attribute cf_role should be included in a Discrete Geometry CF File"
-                self.warn = self.warn + 1
+                self.warning("9.5", "A variable with the attribute cf_role should be included in a Discrete Geometry CF File")
                     
             if re.match('^(timeSeries|trajectory|profile)$',featureType,re.I) and self.cf_roleCount != 1:
                 # Should only be a single occurence of a cf_role attribute
-                print "WARNING (9.5): CF Files containing",featureType,"featureType should only include a single occurance of a cf_role attribute"
-                self.warn = self.warn + 1
+                self.warning("9.5", "CF Files containing",featureType,"featureType should only include a single occurance of a cf_role attribute")
 
             elif re.match('^(timeSeriesProfile|trajectoryProfile)$',featureType,re.I) and self.cf_roleCount > 2:
                 # May contain up to 2 occurences of cf_roles attribute
-                print "ERROR (9.5): CF Files containing",featureType,"featureType may contain 2 occurences of a cf_role attribute"
-                self.err = self.err + 1
+                self.error("9.5", "CF Files containing",featureType,"featureType may contain 2 occurences of a cf_role attribute")
         
+    return rc
 
-    print ""
-    print "ERRORS detected:",self.err
-    print "WARNINGS given:",self.warn
-    print "INFORMATION messages:",self.info
+  #-----------------------------
+  def _checkBodyOnce(self):
+  #-----------------------------
+    """_checkBody(), replaying the findings of an earlier file with the same
+    header if there was one (see dedup.py)"""
+    context = self.runContext()
+    key = (self.meta.digest(), self.version, self.headerOnly)
+    entry = self.headerMemo.get(key)
+    if entry is not None:
+        context.headerFindings = entry
+        for record in entry.template:
+            if record.kind == 'dataCheck':
+                self.variable = record.variable
+                self.dataCheck(record.checkName, *record.args)
+                self.variable = None
+            else:
+                context.reuse(record)
+        return 1
+
+    entry = HeaderFindings([])
+    context.headerFindings = entry
+    context.template = entry.template
+    try:
+        rc = self._checkBody()
+    finally:
+        context.template = None
+    # Not reached if the check was stopped at the error limit
+    self.headerMemo.put(key, entry)
+    return rc
+
+  #---------------------------
+  def endReport(self):
+  #---------------------------
+    """Report the checks skipped and the counts, and return the return
+    code of checker()"""
+    if self.skippedChecks:
+        self.say()
+        self.say("Metadata-only mode: the following checks read variable data and were skipped:")
+        for check in DATA_CHECKS:
+            if self.skippedChecks.has_key(check[0]):
+                self.say("   "+check[1]+" ("+str(self.skippedChecks[check[0]])+" skipped)")
+
+    self.say()
+    self.say("ERRORS detected:",self.err)
+    self.say("WARNINGS given:",self.warn)
+    self.say("INFORMATION messages:",self.info)
 
     if self.err:
         # Return number of errors found
@@ -505,14 +1056,97 @@ class CFChecker:
         return 0
 
 
+  #---------------------------------------------
+  def chkVariable(self, var, clash, plan):
+  #---------------------------------------------
+    """Run the checks in plan (a rules.Plan) that apply to variable var.
+    clash is set if another variable has the same name ignoring case."""
+    rc=1
+    self.variable=var
+    self.emit(VariableStart(self.runContext().file, var))
+    self.say()
+    self.say("------------------")
+    self.say("Checking variable:",var)
+    self.say("------------------")
+
+    if not self.validName(var):
+        self.error("2.3", "Invalid variable name -",var)
+        rc=0
+
+    # Check to see if a variable with this name already exists (case-insensitive)
+    if clash:
+        self.warning("2.3", "variable clash:-",var)
+
+    roles=[]
+    if var in self.axes:
+        roles.append(AXIS)
+    else:
+        roles.append(NON_AXIS)
+    if var in self.coordVars:
+        roles.append(COORDINATE)
+    if var in self.gridMappingVars:
+        roles.append(GRID_MAPPING)
+
+    attributes=self.meta[var].attributes.keys()
+    for rule in plan.select(attributes, frozenset(roles)):
+        if rule.readsData or self.profile is None:
+            # Data checks are profiled by runDataCheck()
+            if not rule.run(self, var, attributes): rc=0
+        elif not self.profile.call(rule.method, var, rule.run, (self, var, attributes)): rc=0
+
+    self.variable=None
+    return rc
+
+  #-----------------------------------------------------------
+  def chkVariablesThreaded(self, names, clashes, plan):
+  #-----------------------------------------------------------
+    """Check the variables names on self.threads threads (see parallel.py),
+    printing their reports in the order of names.
+
+    Each variable is checked in a fork of the file's RunContext, which shares
+    the open file and its metadata but keeps its own records and counts; these
+    are added to the file's in the order of names.  The checks of one variable
+    do not depend on those of any other, so the report is the same as checking
+    them one after the other."""
+    context = self.runContext()
+
+    def check(var):
+        self.setRunContext(context.fork())
+        try:
+            return (self.chkVariable(var, var in clashes, plan), self.runContext())
+        except StopCheck:
+            # Its own errors reached the limit; merge() stops at the same error
+            return (0, self.runContext())
+
+    rc=1
+    results=parallel.mapOrdered(check, names, self.threads)
+    try:
+        for (var, (varRc, varContext), output) in results:
+            if output:
+                # Printed other than through the report; keep it in its place
+                context.flush()
+                sys.stdout.write(output)
+            context.merge(varContext)
+            if not varRc: rc=0
+    finally:
+        # Stops the threads if merge() raised StopCheck
+        results.close()
+    return rc
+
   #-----------------------------
   def setUpAttributeList(self):
   #-----------------------------
       """Set up Dictionary of valid attributes, their corresponding
       Type; S(tring), N(umeric) D(ata variable type)  and Use C(oordinate),
       D(ata non-coordinate) or G(lobal) variable."""
+
+      if self.attrLists.has_key(self.version):
+          # Already built for this CF version
+          self.AttrList = self.attrLists[self.version]
+          return
     
       self.AttrList={}
+      self.attrLists[self.version]=self.AttrList
       self.AttrList['add_offset']=['N','D']
       self.AttrList['ancillary_variables']=['S','D']
       self.AttrList['axis']=['S','C']
@@ -566,13 +1200,13 @@ class CFChecker:
   #---------------------------
       """Determine if list has any repeated elements."""
       # Rewrite to allow list to be either a list or a Numeric array
-      seen=[]
+      seen=set()
 
       for x in list:
           if x in seen:
               return 0
           else:
-              seen.append(x)        
+              seen.add(x)
       return 1
 
 
@@ -582,7 +1216,7 @@ class CFChecker:
       """Determine if variable is of Numeric data type."""
       types=['i','f','d']
       rc=1 
-      if self.f[var].dtype.char not in types:
+      if self.meta[var].dtype.char not in types:
           rc=0
       return rc
 
@@ -592,7 +1226,7 @@ class CFChecker:
       """Get standard_name of variable (i.e. just first part of standard_name attribute, without modifier)"""
       attName = 'standard_name'
       attDict = var.attributes
-      if attName not in attDict.keys():
+      if not attDict.has_key(attName):
           return None
       bits = string.split(attDict[attName])
       if bits:
@@ -607,7 +1241,7 @@ class CFChecker:
       attName = 'standard_name'
       attDict = var.attributes
 
-      if attName not in attDict.keys():
+      if not attDict.has_key(attName):
           return None
 
       bits = string.split(attDict[attName])
@@ -634,8 +1268,7 @@ class CFChecker:
         return "Z"
 
     # Parse the string representation of units into its binary representation for use by udunits
-    binaryUnit = udunits.ut_parse(self.unitSystem, units, "UT_ASCII")
-    if not binaryUnit:
+    if not self.unitSystem.isValid(units):
         # Don't print this message out o/w it is repeated for every variable
         # that has this dimension.  CRM033 return "None" instead
         # print "ERROR: Invalid units:",units
@@ -647,9 +1280,9 @@ class CFChecker:
     # Time Coordinate
     # 19.08.10 - Workaround since udunits2 deems a unit without reference time not convertible to a
     # unit with reference time and vice versa
-    if udunits.ut_are_convertible(binaryUnit, udunits.ut_parse(self.unitSystem, "second", "UT_ASCII")):
+    if self.unitSystem.areConvertible(units, "second"):
         return "T"
-    elif udunits.ut_are_convertible(binaryUnit, udunits.ut_parse(self.unitSystem, "seconds since 1-1-1 0:0:0", "UT_ASCII")):
+    elif self.unitSystem.areConvertible(units, "seconds since 1-1-1 0:0:0"):
         return "T"
     
     # Vertical Coordinate
@@ -658,7 +1291,7 @@ class CFChecker:
 
     # Variable is a vertical coordinate if the units are dimensionally
     # equivalent to Pressure
-    if udunits.ut_are_convertible(binaryUnit, udunits.ut_parse(self.unitSystem, "Pa", "UT_ASCII")):
+    if self.unitSystem.areConvertible(units, "Pa"):
         return "Z"
         
     # Latitude Coordinate
@@ -676,29 +1309,30 @@ class CFChecker:
   #--------------------------------
   def getCoordinateDataVars(self):
   #--------------------------------
-    """Obtain list of coordinate data variables, boundary
+    """Obtain sets of coordinate data variables, boundary
     variables, climatology variables and grid_mapping variables."""
     
-    variables=self.f.variables.keys()     # List of variables, but doesn't include coord vars
-    allVariables=self.f._file_.variables.keys()   # List of all vars, including coord vars
-    axes=self.f.axes.keys()
+    variables=self.meta.dataVariables     # Variables, but doesn't include coord vars
+    allVariables=self.meta.names          # List of all vars, including coord vars
+    axes=self.meta.axes
     
-    coordVars=[]
-    boundaryVars=[]
-    climatologyVars=[]
-    gridMappingVars=[]
-    auxCoordVars=[]
+    coordVars=set()
+    boundaryVars=set()
+    climatologyVars=set()
+    gridMappingVars=set()
+    auxCoordVars=set()
+    vertexPairs={}          # (lon, lat) pairs whose cell vertex order has been checked
 
     for var in allVariables:
         if var not in variables:
             # Coordinate variable - 1D & dimension is the same name as the variable
-            coordVars.append(var)
+            coordVars.add(var)
 
 ## Commented out 21.02.06 - Duplicate code also in method chkDimensions
 ## Probably can be completely removed.
 ##         if var not in coordVars:
 ##             # Non-coordinate variable so check if it has any repeated dimensions
-##             dimensions=self.f[var].getAxisIds()
+##             dimensions=self.meta[var].getAxisIds()
 ##             dimensions.sort()
 ##             if not self.uniqueList(dimensions):
 ##                 print "ERROR: variable has repeated dimensions"
@@ -707,44 +1341,39 @@ class CFChecker:
         #------------------------
         # Auxilliary Coord Checks
         #------------------------
-        if self.f[var].attributes.has_key('coordinates'):
+        if self.meta[var].attributes.has_key('coordinates'):
             # Check syntax of 'coordinates' attribute
-            if not self.parseBlankSeparatedList(self.f[var].attributes['coordinates']):
-                print "ERROR (5): Invalid syntax for 'coordinates' attribute in",var
-                self.err = self.err+1
+            if not self.parseBlankSeparatedList(self.meta[var].attributes['coordinates']):
+                self.error("5", "Invalid syntax for 'coordinates' attribute in",var)
             else:
-                coordinates=string.split(self.f[var].attributes['coordinates'])
+                coordinates=self.graph.references(var, 'coordinates')
                 for dataVar in coordinates:
                     if dataVar in variables:
                         #print dataVar
 
                         # Has Auxillary Coordinate already been identified and checked?
                         if dataVar not in auxCoordVars:
-                            auxCoordVars.append(dataVar)
+                            auxCoordVars.add(dataVar)
 
                             # Is the auxillary coordinate var actually a label?
-                            if self.f[dataVar].dtype.char == 'c':
+                            if self.meta[dataVar].dtype.char == 'c':
                                 # Label variable
-                                num_dimensions = len(self.f[dataVar].getAxisIds())
+                                num_dimensions = len(self.meta[dataVar].dimensions)
                                 if self.version < 1.4:
                                     if not num_dimensions == 2:
-                                        print "ERROR (6.1): Label variable",dataVar,"must have 2 dimensions only"
-                                        self.err = self.err+1
+                                        self.error("6.1", "Label variable",dataVar,"must have 2 dimensions only")
 
                                 if self.version >= 1.4:
                                     if num_dimensions != 1 and num_dimensions != 2:
-                                        print "ERROR (6.1): Label variable",dataVar,"must have 1 or 2 dimensions, but has",num_dimensions
-                                        self.err = self.err+1
+                                        self.error("6.1", "Label variable",dataVar,"must have 1 or 2 dimensions, but has",num_dimensions)
 
                                 if num_dimensions == 2:
-                                    if self.f[dataVar].getAxisIds()[0] not in self.f[var].getAxisIds():
-                                        if self.version >= 1.6 and self.f.attributes.has_key('featureType'):
+                                    if self.meta[dataVar].dimensions[0] not in self.meta[var].dimensions:
+                                        if self.version >= 1.6 and self.meta.attributes.has_key('featureType'):
                                             # This file contains Discrete Sampling Geometries
-                                            print "INFO (6.1): File contains a Discrete Sampling Geometry. Skipping check on dimensions of",dataVar
-                                            self.info = self.info + 1
+                                            self.information("6.1", "File contains a Discrete Sampling Geometry. Skipping check on dimensions of",dataVar)
                                         else:
-                                            print "ERROR (6.1): Leading dimension of",dataVar,"must match one of those for",var
-                                            self.err = self.err+1
+                                            self.error("6.1", "Leading dimension of",dataVar,"must match one of those for",var)
                             else:
                                 # Not a label variable
 
@@ -754,145 +1383,245 @@ class CFChecker:
                                 # or instance_dimension. Need to check that the sample dimension is the dimension of
                                 # the variable to which the aux coord var is attached.
 
-                                #print dataVar,"- Not a label variable. Dimensions are:",self.f[dataVar].getAxisIds()
-                                #print var,"dimensions are:",self.f[var].getAxisIds()
+                                #print dataVar,"- Not a label variable. Dimensions are:",self.meta[dataVar].getAxisIds()
+                                #print var,"dimensions are:",self.meta[var].getAxisIds()
 
-                                for dim in self.f[dataVar].getAxisIds():
-                                    if dim not in self.f[var].getAxisIds():
-                                        if self.version >= 1.6 and self.f.attributes.has_key('featureType'):
+                                for dim in self.meta[dataVar].dimensions:
+                                    if dim not in self.meta[var].dimensions:
+                                        if self.version >= 1.6 and self.meta.attributes.has_key('featureType'):
                                             # This file contains Discrete Sampling Geometries
-                                            print "INFO (5): File contains a Discrete Sampling Geometry. Skipping check on dimensions of",dataVar
-                                            self.info = self.info + 1
+                                            self.information("5", "File contains a Discrete Sampling Geometry. Skipping check on dimensions of",dataVar)
                                         else:
-                                            print "ERROR (5): Dimensions of",dataVar,"must be a subset of dimensions of",var
-                                            self.err = self.err+1
+                                            self.error("5", "Dimensions of",dataVar,"must be a subset of dimensions of",var)
                                     
                                         break
 
                     elif dataVar not in allVariables:
-                        print "ERROR (5): coordinates attribute referencing non-existent variable:",dataVar
-                        self.err = self.err+1
+                        self.error("5", "coordinates attribute referencing non-existent variable:",dataVar)
+
+                # Vertex order of 2-D (curvilinear) cells, checked once for each
+                # longitude/latitude pair
+                self.chkCellVertexOrder(coordinates, vertexPairs)
 
         #-------------------------
         # Boundary Variable Checks
         #-------------------------
-        if self.f[var].attributes.has_key('bounds'):
-            bounds=self.f[var].attributes['bounds']
+        bounds=self.graph.reference(var, 'bounds')
+        if bounds is not None:
             # Check syntax of 'bounds' attribute
             if not re.search("^[a-zA-Z0-9_]*$",bounds):
-                print "ERROR (7.1): Invalid syntax for 'bounds' attribute"
-                self.err = self.err+1
+                self.error("7.1", "Invalid syntax for 'bounds' attribute")
             else:
                 if bounds in variables:
-                    boundaryVars.append(bounds)
+                    boundaryVars.add(bounds)
 
                     if not self.isNumeric(bounds):
-                        print "ERROR (7.1): boundary variable with non-numeric data type"
-                        self.err = self.err+1
-                    if len(self.f[var].shape) + 1 == len(self.f[bounds].shape):
+                        self.error("7.1", "boundary variable with non-numeric data type")
+                    if len(self.meta[var].shape) + 1 == len(self.meta[bounds].shape):
                         if var in axes:
                             varDimensions=[var]
                         else:
-                            varDimensions=self.f[var].getAxisIds()
+                            varDimensions=self.meta[var].getAxisIds()
 
                         for dim in varDimensions:
-                            if dim not in self.f[bounds].getAxisIds():
-                                print "ERROR (7.1): Incorrect dimensions for boundary variable:",bounds
-                                self.err = self.err+1
+                            if dim not in self.meta[bounds].dimensions:
+                                self.error("7.1", "Incorrect dimensions for boundary variable:",bounds)
                     else:
-                        print "ERROR (7.1): Incorrect number of dimensions for boundary variable:",bounds
-                        self.err = self.err+1
-
-                    if self.f[bounds].attributes.has_key('units'):
-                        if self.f[bounds].attributes['units'] != self.f[var].attributes['units']:
-                            print "ERROR (7.1): Boundary var",bounds,"has inconsistent units to",var
-                            self.err = self.err+1
-                    if self.f[bounds].attributes.has_key('standard_name') and self.f[var].attributes.has_key('standard_name'):
-                        if self.f[bounds].attributes['standard_name'] != self.f[var].attributes['standard_name']:
-                            print "ERROR (7.1): Boundary var",bounds,"has inconsistent std_name to",var
-                            self.err = self.err+1
+                        self.error("7.1", "Incorrect number of dimensions for boundary variable:",bounds)
+
+                    if self.meta[bounds].attributes.has_key('units'):
+                        if self.meta[bounds].attributes['units'] != self.meta[var].attributes['units']:
+                            self.error("7.1", "Boundary var",bounds,"has inconsistent units to",var)
+                    if self.meta[bounds].attributes.has_key('standard_name') and self.meta[var].attributes.has_key('standard_name'):
+                        if self.meta[bounds].attributes['standard_name'] != self.meta[var].attributes['standard_name']:
+                            self.error("7.1", "Boundary var",bounds,"has inconsistent std_name to",var)
                 else:
-                    print "ERROR (7.1): bounds attribute referencing non-existent variable:",bounds
-                    self.err = self.err+1
+                    self.error("7.1", "bounds attribute referencing non-existent variable:",bounds)
                     
             # Check that points specified by a coordinate or auxilliary coordinate
             # variable should lie within, or on the boundary, of the cells specified by
-            # the associated boundary variable.
+            # the associated boundary variable, and that the cells are contiguous.
+            # The check is of var, so is profiled and reported as part of it
             if bounds in variables:
-                # Is boundary variable 2 dimensional?  If so can check that points
-                # lie within, or on the boundary.
-                if len(self.f[bounds].getAxisIds()) <= 2:
-                    varData=self.f[var].getValue()
-                    boundsData=self.f[bounds].getValue()
-##                    if len(varData) == 1:
-
-##                    if type(varData) == type(1) or type(varData) == type(1.00) or len(varData) == 1:
-                    if isinstance(varData,(int,long,float,numpy.floating)) or len(varData) == 1:
-                        # Gone for belts and braces approach here!!
-                        # Variable contains only one value
-                        # Bounds array will be 1 dimensional
-                        if not ((varData <= boundsData[0] and varData >= boundsData[1])
-                                or (varData >= boundsData[0] and varData <= boundsData[1])):
-                            print "WARNING (7.1): Data for variable",var,"lies outside cell boundaries"
-                            self.warn = self.warn+1
-                    else:
-                        i=0
-                        for value in varData:
-                            if not ((value <= boundsData[i][0] and value >= boundsData[i][1]) \
-                                    or (value >= boundsData[i][0] and value <= boundsData[i][1])):
-                                print "WARNING (7.1): Data for variable",var,"lies outside cell boundaries"
-                                self.warn = self.warn+1
-                                break
-                            i=i+1
+                self.variable=var
+                try:
+                    self.dataCheck('chkBoundsData', var, bounds)
+                finally:
+                    self.variable=None
 
         #----------------------------
         # Climatology Variable Checks
         #----------------------------
-        if self.f[var].attributes.has_key('climatology'):
-            climatology=self.f[var].attributes['climatology']
+        climatology=self.graph.reference(var, 'climatology')
+        if climatology is not None:
             # Check syntax of 'climatology' attribute
             if not re.search("^[a-zA-Z0-9_]*$",climatology):
-                print "ERROR (7.4): Invalid syntax for 'climatology' attribute"
-                self.err = self.err+1
+                self.error("7.4", "Invalid syntax for 'climatology' attribute")
             else:
                 if climatology in variables:
-                    climatologyVars.append(climatology)
+                    climatologyVars.add(climatology)
                     if not self.isNumeric(climatology):
-                        print "ERROR (7.4): climatology variable with non-numeric data type"
-                        self.err = self.err+1
-                    if self.f[climatology].attributes.has_key('units'):
-                        if self.f[climatology].attributes['units'] != self.f[var].attributes['units']:
-                            print "ERROR (7.4): Climatology var",climatology,"has inconsistent units to",var
-                            self.err = self.err+1
-                    if self.f[climatology].attributes.has_key('standard_name'):
-                        if self.f[climatology].attributes['standard_name'] != self.f[var].attributes['standard_name']:
-                            print "ERROR (7.4): Climatology var",climatology,"has inconsistent std_name to",var
-                            self.err = self.err+1
-                    if self.f[climatology].attributes.has_key('calendar'):
-                        if self.f[climatology].attributes['calendar'] != self.f[var].attributes['calendar']:
-                            print "ERROR (7.4): Climatology var",climatology,"has inconsistent calendar to",var
-                            self.err = self.err+1
+                        self.error("7.4", "climatology variable with non-numeric data type")
+                    if self.meta[climatology].attributes.has_key('units'):
+                        if self.meta[climatology].attributes['units'] != self.meta[var].attributes['units']:
+                            self.error("7.4", "Climatology var",climatology,"has inconsistent units to",var)
+                    if self.meta[climatology].attributes.has_key('standard_name'):
+                        if self.meta[climatology].attributes['standard_name'] != self.meta[var].attributes['standard_name']:
+                            self.error("7.4", "Climatology var",climatology,"has inconsistent std_name to",var)
+                    if self.meta[climatology].attributes.has_key('calendar'):
+                        if self.meta[climatology].attributes['calendar'] != self.meta[var].attributes['calendar']:
+                            self.error("7.4", "Climatology var",climatology,"has inconsistent calendar to",var)
                 else:
-                    print "ERROR (7.4): climatology attribute referencing non-existent variable"
-                    self.err = self.err+1
+                    self.error("7.4", "climatology attribute referencing non-existent variable")
 
         #------------------------------------------
         # Is there a grid_mapping variable?
         #------------------------------------------
-        if self.f[var].attributes.has_key('grid_mapping'):
-            grid_mapping = self.f[var].attributes['grid_mapping']
+        grid_mapping = self.graph.reference(var, 'grid_mapping')
+        if grid_mapping is not None:
             # Check syntax of grid_mapping attribute: a string whose value is a single variable name.
             if not re.search("^[a-zA-Z0-9_]*$",grid_mapping):
-                print "ERROR (5.6):",var,"- Invalid syntax for 'grid_mapping' attribute"
-                self.err = self.err+1
+                self.error("5.6", var,"- Invalid syntax for 'grid_mapping' attribute")
             else:
                 if grid_mapping in variables:
-                    gridMappingVars.append(grid_mapping)
+                    gridMappingVars.add(grid_mapping)
                 else:
-                    print "ERROR (5.6): grid_mapping attribute referencing non-existent variable",grid_mapping
-                    self.err = self.err+1
+                    self.error("5.6", "grid_mapping attribute referencing non-existent variable",grid_mapping)
                     
-    return (coordVars, auxCoordVars, boundaryVars, climatologyVars, gridMappingVars)
+    return (frozenset(coordVars), frozenset(auxCoordVars), frozenset(boundaryVars),
+            frozenset(climatologyVars), frozenset(gridMappingVars))
+
+
+  #---------------------------
+  def chkReferences(self):
+  #---------------------------
+    """Checks on the graph of references between variables that are not
+    made where the individual attributes are checked:
+    1) ancillary_variables must name variables in the file (Section 3.4)
+    2) a boundary variable should not refer back to its coordinate through a
+       chain of references (e.g. a bounds attribute naming the coordinate)
+       (Sections 7.1 and 7.4)"""
+    rc=1
+    for reference in self.graph.dangling('ancillary_variables'):
+        self.error("3.4", "ancillary_variables attribute of",reference.source,"referencing non-existent variable:",reference.target)
+        rc=0
+
+    # Other cycles are allowed, e.g. two auxiliary coordinates naming each
+    # other in their coordinates attributes, or ancillary variables that
+    # are ancillary to each other.  A warning, so does not fail the check.
+    for cycle in self.graph.cycles():
+        bounds=[i for i in range(len(cycle)) if BOUNDARY_SECTIONS.has_key(cycle[i].attribute)]
+        if not bounds:
+            continue
+        # Start the chain at the coordinate
+        cycle=cycle[bounds[0]:]+cycle[:bounds[0]]
+        chain=string.join([r.source+" ("+r.attribute+")" for r in cycle]," -> ")
+        self.warning(BOUNDARY_SECTIONS[cycle[0].attribute], "Circular reference between variables:",chain,"->",cycle[0].source)
+    return rc
+
+  #-----------------------------------------------
+  def chkBoundsData(self, varName, boundsName):
+  #-----------------------------------------------
+    """Section 7.1: Check that the points of a coordinate or auxiliary coordinate
+    lie within, or on the boundary of, their cells and, for 1-D coordinates, that
+    the cells neither overlap nor have gaps and that the bounds of every cell are
+    given in the same order.  2-D cells are checked for shared vertices.  The
+    data are read CHUNK_SIZE values at a time."""
+    from cfchecker.bounds import analyse as analyseBounds
+    rc=1
+    var=self.meta[varName]
+    shape=tuple(var.shape)
+    boundsShape=tuple(self.meta[boundsName].shape)
+
+    # Dimensions of the boundary variable are checked elsewhere
+    if len(shape) > 2 or len(boundsShape) != len(shape)+1 or boundsShape[:-1] != shape:
+        return rc
+
+    # Longitude cells may straddle the wrap-around point
+    period=None
+    if var.attributes.has_key('units') and self.getInterpretation(var.attributes['units']) == "X":
+        period=360.0
+
+    if len(shape) == 0:
+        readPoints=lambda start, stop: self.getValues(varName)
+        readBounds=lambda start, stop: self.getValues(boundsName)
+    else:
+        readPoints=lambda start, stop: self.getValues(varName, start, stop)
+        readBounds=lambda start, stop: self.getValues(boundsName, start, stop)
+
+    report=analyseBounds(readPoints, readBounds, shape, boundsShape[-1], CHUNK_SIZE, period)
+
+    if report.outside is not None:
+        self.warning("7.1", "Data for variable",varName,"lies outside cell boundaries (first at index "+str(report.outside)+")")
+        rc=0
+
+    if report.overlap is not None:
+        self.warning("7.1", "Cells of boundary variable",boundsName,"overlap (cells",report.overlap,"and",str(report.overlap+1)+")")
+        rc=0
+
+    if report.gap is not None:
+        # Non-contiguous cells are allowed, but unusual enough to mention
+        self.information("7.1", "Cells of boundary variable",boundsName,"are not contiguous (gap after cell",str(report.gap)+")")
+
+    if report.noncontiguous is not None:
+        self.information("7.1", "Cells of boundary variable",boundsName,"are not contiguous (cell",str(report.noncontiguous)+")")
+
+    if report.order is not None:
+        self.warning("7.1", "Inconsistent vertex order in boundary variable",boundsName,"(cell",str(report.order)+")")
+        rc=0
+
+    return rc
+
+
+  #-------------------------------------------------------
+  def chkCellVertexOrder(self, coordinates, checkedPairs):
+  #-------------------------------------------------------
+    """Section 7.1: The vertices of 2-D cells must be traversed anticlockwise in
+    the longitude-latitude plane.  coordinates is the list of names in a
+    'coordinates' attribute; the bounds of its 2-D longitude and latitude
+    variables, if both have 4 vertices, are checked.  checkedPairs records the
+    pairs already checked for this file."""
+    lon=None
+    lat=None
+    for name in coordinates:
+        boundsName=self.graph.reference(name, 'bounds')
+        if name not in self.meta.dataVariables or boundsName is None:
+            continue
+        var=self.meta[name]
+        if len(var.shape) != 2 or boundsName not in self.meta.dataVariables or \
+           tuple(self.meta[boundsName].shape) != tuple(var.shape)+(4,):
+            continue
+        if var.attributes.has_key('units'):
+            interp=self.getInterpretation(var.attributes['units'])
+            if interp == "X":
+                lon=(name, boundsName)
+            elif interp == "Y":
+                lat=(name, boundsName)
+
+    if lon is None or lat is None or lon[0] == lat[0] or checkedPairs.has_key((lon[0], lat[0])):
+        return 1
+    checkedPairs[(lon[0], lat[0])]=1
+
+    return self.dataCheck('chkCellVertexData', lon, lat)
+
+
+  #--------------------------------------
+  def chkCellVertexData(self, lon, lat):
+  #--------------------------------------
+    """The data part of chkCellVertexOrder(): lon and lat are the (name,
+    bounds name) pairs of the 2-D longitude and latitude"""
+    from cfchecker.bounds import firstClockwiseCell
+    if tuple(self.meta[lon[0]].shape) != tuple(self.meta[lat[0]].shape):
+        return 1
+
+    cell=firstClockwiseCell(lambda start, stop: self.getValues(lon[1], start, stop),
+                            lambda start, stop: self.getValues(lat[1], start, stop),
+                            tuple(self.meta[lon[0]].shape), 4, CHUNK_SIZE)
+    if cell is not None:
+        self.warning("7.1", "Cell vertices of",lon[1],"and",lat[1],"must be traversed anticlockwise (cell",str(cell)+")")
+        return 0
+
+    return 1
 
 
   #-------------------------------------
@@ -900,7 +1629,7 @@ class CFChecker:
   #-------------------------------------
       """Section 5.6: Grid Mapping Variable Checks"""
       rc=1
-      var=self.f[varName]
+      var=self.meta[varName]
       
       if var.attributes.has_key('grid_mapping_name'):
           # Check grid_mapping_name is valid
@@ -917,17 +1646,14 @@ class CFChecker:
               validNames[len(validNames):] = ['lambert_cylindrical_equal_area','mercator','orthographic']
               
           if var.grid_mapping_name not in validNames:
-              print "ERROR (5.6): Invalid grid_mapping_name:",var.grid_mapping_name
-              self.err = self.err+1
+              self.error("5.6", "Invalid grid_mapping_name:",var.grid_mapping_name)
               rc=0
       else:
-          print "ERROR (5.6): No grid_mapping_name attribute set"
-          self.err = self.err+1
+          self.error("5.6", "No grid_mapping_name attribute set")
           rc=0
               
-      if len(var.getAxisIds()) != 0:
-          print "WARNING (5.6): A grid mapping variable should have 0 dimensions"
-          self.warn = self.warn+1
+      if len(var.dimensions) != 0:
+          self.warning("5.6", "A grid mapping variable should have 0 dimensions")
 
       return rc
 
@@ -997,41 +1723,38 @@ class CFChecker:
   #------------------------------
     """Check validity of global attributes."""
     rc=1
-    if self.f.attributes.has_key('Conventions'):
-        conventions = self.f.attributes['Conventions']
+    if self.meta.attributes.has_key('Conventions'):
+        conventions = self.meta.attributes['Conventions']
         
         if conventions not in CFVersions:
-            print "ERROR (2.6.1): This netCDF file does not appear to contain CF Convention data."
-            self.err = self.err+1
+            self.error("2.6.1", "This netCDF file does not appear to contain CF Convention data.")
             rc=0
 
         if conventions != 'CF-'+str(self.version):
-            print "WARNING: Inconsistency - The conventions attribute is set to "+conventions+", but you've requested a validity check against CF",self.version
-            self.warn = self.warn+1
+            self.warning(None, "Inconsistency - The conventions attribute is set to "+conventions+", but you've requested a validity check against CF",self.version)
             
     else:
-        print "WARNING (2.6.1): No 'Conventions' attribute present"
-        self.warn = self.warn+1
+        self.warning("2.6.1", "No 'Conventions' attribute present")
         rc=1
 
 
 
     # Discrete geometries
-    if self.version >= 1.6 and self.f.attributes.has_key('featureType'):
-        featureType = self.f.attributes['featureType']
+    if self.version >= 1.6 and self.meta.attributes.has_key('featureType'):
+        featureType = self.meta.attributes['featureType']
 
         if not re.match('^(point|timeSeries|trajectory|profile|timeSeriesProfile|trajectoryProfile)$',featureType,re.I):
-            print "ERROR (9.4): Global attribute 'featureType' contains invalid value"
+            # Not counted
+            self.addFinding(ERROR, "9.4", ["Global attribute 'featureType' contains invalid value"])
 
         #self.chkFeatureType()
 
 
 
     for attribute in ['title','history','institution','source','reference','comment']:
-        if self.f.attributes.has_key(attribute):
-            if type(self.f.attributes[attribute]) != types.StringType:
-                print "ERROR (2.6.2): Global attribute",attribute,"must be of type 'String'"
-                self.err = self.err+1
+        if self.meta.attributes.has_key(attribute):
+            if type(self.meta.attributes[attribute]) != types.StringType:
+                self.error("2.6.2", "Global attribute",attribute,"must be of type 'String'")
 
     return rc
 
@@ -1042,11 +1765,12 @@ class CFChecker:
   #------------------------------
     """Return CF version of file, used for auto version option. If Conventions is COARDS return CF-1.0, else 0.0"""
     rc = 0.0
-    if self.f.attributes.has_key('Conventions'):
-        conventions = self.f.attributes['Conventions']
+    if self.meta.attributes.has_key('Conventions'):
+        conventions = self.meta.attributes['Conventions']
         
         if conventions == 'COARDS':
-            print "WARNING: The conventions attribute is set to "+conventions+", assuming CF-1.0"
+            # Not counted
+            self.addFinding(WARNING, None, ["The conventions attribute is set to "+conventions+", assuming CF-1.0"])
             rc = 1.0
         elif conventions not in CFVersions:
             rc = 0.0
@@ -1080,7 +1804,7 @@ class CFChecker:
        is a boundary variable or climatology variable, where
        1 trailing dimension is allowed."""
 
-    var=self.f[varName]
+    var=self.meta[varName]
     dimensions=var.getAxisIds()
     trailingVars=[]
     
@@ -1100,21 +1824,20 @@ class CFChecker:
         for dim in dimensions:
             i=i+1
             try:
-                if hasattr(self.f[dim],'axis'):
-                    pos=order.index(self.f[dim].axis)
+                if hasattr(self.meta[dim],'axis'):
+                    pos=order.index(self.meta[dim].axis)
 
                     # Is there already a dimension with this axis attribute specified.
                     if axesFound[pos] == 1:
-                        print "ERROR (4): Variable has more than 1 coordinate variable with same axis value"
-                        self.err = self.err+1
+                        self.error("4", "Variable has more than 1 coordinate variable with same axis value")
                     else:
                         axesFound[pos] = 1
-                elif hasattr(self.f[dim],'units'):
+                elif hasattr(self.meta[dim],'units'):
                     # Determine interpretation of variable by units attribute
-                    if hasattr(self.f[dim],'positive'):
-                        interp=self.getInterpretation(self.f[dim].units,self.f[dim].positive)
+                    if hasattr(self.meta[dim],'positive'):
+                        interp=self.getInterpretation(self.meta[dim].units,self.meta[dim].positive)
                     else:
-                        interp=self.getInterpretation(self.f[dim].units)
+                        interp=self.getInterpretation(self.meta[dim].units)
 
                     if not interp: raise ValueError
                     pos=order.index(interp)
@@ -1125,8 +1848,7 @@ class CFChecker:
                 if firstST == -1:
                     firstST=pos
             except AttributeError:
-                print "ERROR: Problem accessing variable:",dim,"(May not exist in file)."
-                self.err = self.err+1
+                self.error(None, "Problem accessing variable:",dim,"(May not exist in file).")
                 exit(self.err)
             except ValueError:
                 # Dimension is not T,Z,Y or X axis
@@ -1139,28 +1861,23 @@ class CFChecker:
                     lastPos=pos
                     trailingVars=[]
                 else:
-                    print "WARNING (2.4): space/time dimensions appear in incorrect order"
-                    self.warn = self.warn+1
+                    self.warning("2.4", "space/time dimensions appear in incorrect order")
 
         # As per CRM #022 
         # This check should only be applied for COARDS conformance.
         if self.coards:
-            validTrailing=self.boundsVars[:]
-            validTrailing[len(validTrailing):]=self.climatologyVars[:]
+            validTrailing=self.boundsVars | self.climatologyVars
             if lastNonST > firstST and firstST != -1:
                 if len(trailingVars) == 1:
                     if var.id not in validTrailing:
-                        print "WARNING (2.4): dimensions",nonSpaceDimensions,"should appear to left of space/time dimensions"
-                        self.warn = self.warn+1
+                        self.warning("2.4", "dimensions",nonSpaceDimensions,"should appear to left of space/time dimensions")
                 else:
-                    print "WARNING (2.4): dimensions",nonSpaceDimensions,"should appear to left of space/time dimensions"
-                    self.warn = self.warn+1
+                    self.warning("2.4", "dimensions",nonSpaceDimensions,"should appear to left of space/time dimensions")
 
                 
         dimensions.sort()
         if not self.uniqueList(dimensions):
-            print "ERROR (2.4): variable has repeated dimensions"
-            self.err = self.err+1
+            self.error("2.4", "variable has repeated dimensions")
 
 ## Removed this check as per emails 11 June 2004 (See CRM #020)
 ##     # Check all dimensions of data variables have associated coordinate variables
@@ -1180,11 +1897,10 @@ class CFChecker:
     is of the correct type and that it is attached to the right
     kind of variable."""
     rc=1
-    var=self.f[varName]
+    var=self.meta[varName]
 
     if not self.validName(attribute) and attribute != "_FillValue":
-        print "ERROR: Invalid attribute name -",attribute
-        self.err = self.err+1
+        self.error(None, "Invalid attribute name -",attribute)
         return 0
 
     value=var.attributes[attribute]
@@ -1201,13 +1917,13 @@ class CFChecker:
             attrType='S'
         elif attrType == types.IntType or attrType == types.FloatType:
             attrType='N'
-        elif attrType == type(Numeric.array([])):
+        elif attrType == arrayType():
             attrType='N'
         elif attrType == types.NoneType:
             #attrType=self.AttrList[attribute][0]
             attrType='NoneType'
         else:
-            print "Unknown Type for attribute:",attribute,attrType
+            self.say("Unknown Type for attribute:",attribute,attrType)
 
         # If attrType = 'NoneType' then it has been automatically created e.g. missing_value
         typeError=0
@@ -1225,7 +1941,7 @@ class CFChecker:
                     # 26.02.10 - CDAT-5.2 - An inconsistency means that determining the type of
                     # a FileAxis or FileVariable is different.  C.Doutriaux will hopefully
                     # make this more uniform (Raised on the cdat mailing list) CF Trac #
-                    if varName in self.f.axes.keys():
+                    if varName in self.meta.axes:
                         # FileAxis Variable
                         if var.typecode() != var.attributes[attribute].dtype.char:
                             typeError=1
@@ -1238,8 +1954,7 @@ class CFChecker:
                 typeError=1
 
             if typeError:
-                print "ERROR: Attribute",attribute,"of incorrect type"
-                self.err = self.err+1
+                self.error(None, "Attribute",attribute,"of incorrect type")
                 rc=0
             
         # Attribute attached to the wrong kind of variable
@@ -1259,12 +1974,9 @@ class CFChecker:
                     # variables whether set explicitly or not. Is this a cdms thing?
                     # Using var.missing_value is null then missing_value not set in the file
                     if var.missing_value:
-                        print "WARNING: attribute",attribute,"attached to wrong kind of variable"
-                        self.warn = self.warn+1
+                        self.warning(None, "attribute",attribute,"attached to wrong kind of variable")
                 else:
-                    print "INFO: attribute '" + attribute + "' is being used in a non-standard way"
-#                    print "Ros: I am here"
-                    self.info = self.info+1
+                    self.information(None, "attribute '" + attribute + "' is being used in a non-standard way")
             else:
                 i=i+1
 
@@ -1273,98 +1985,23 @@ class CFChecker:
         if attribute in TimeAttributes:
 
             if var.attributes.has_key('units'):
-                varUnits = udunits.ut_parse(self.unitSystem, var.attributes['units'], "UT_ASCII")
-                secsSinceEpoch = udunits.ut_parse(self.unitSystem, "seconds since 1970-01-01", "UT_ASCII")
-                if not udunits.ut_are_convertible(varUnits, secsSinceEpoch) :
-                    print "ERROR (4.4.1): Attribute",attribute,"may only be attached to time coordinate variable"
-                    self.err = self.err+1
+                if not self.unitSystem.areConvertible(var.attributes['units'], "seconds since 1970-01-01"):
+                    self.error("4.4.1", "Attribute",attribute,"may only be attached to time coordinate variable")
                     rc=0
-
-                # Free up resources associated with varUnits
-                udunits.ut_free(varUnits)
-                udunits.ut_free(secsSinceEpoch)
                 
             else:        
-                print "ERROR (4.4.1): Attribute",attribute,"may only be attached to time coordinate variable"
-                self.err = self.err+1
+                self.error("4.4.1", "Attribute",attribute,"may only be attached to time coordinate variable")
                 rc=0
         
     return rc
 
 
-  #----------------------------------
-  def chkCellMethods(self, varName):
-  #----------------------------------
-    """Checks on cell_methods attribute
-    1) Correct syntax
-    2) Valid methods
-    3) Valid names
-    4) No duplicate entries for dimension other than 'time'"""
-    # dim1: [dim2: [dim3: ...]] method [ (comment) ]
-    # where comment is of the form:  ([interval: value unit [interval: ...] comment:] remainder)
-    rc=1
-    error = 0  # Flag to indicate validity of cell_methods string syntax
-    varDimensions={}
-    var=self.f[varName]
-    
-    if var.attributes.has_key('cell_methods'):
-        cellMethods=var.attributes['cell_methods']
-        getComments=re.compile(r'\([^)]+\)')
-
-        # Remove comments from the cell_methods string and split at these points
-        noComments=getComments.sub('%5A',cellMethods)
-        substrings=re.split('%5A',noComments)
-        pr=re.compile(r'^\s*(\S+\s*:\s*(\S+\s*:\s*)*(point|sum|maximum|median|mid_range|minimum|mean|mode|standard_deviation|variance)(\s+(over|within)\s+(days|years))?\s*)+$')
-        # Validate each substring
-        for s in substrings:
-            if s:
-                if not pr.match(s):
-                    strError=s
-                    error=1
-                    break
-
-                # Validate dim and check that it only appears once unless it is 'time'
-                allDims=re.findall(r'\S+\s*:',s)
-                for part in allDims:
-                    dims=re.split(':',part)
-                    for d in dims:
-                        if d:
-                            if var.getAxisIndex(d) == -1 and not d in self.std_name_dh.dict.keys():
-                                print "ERROR (7.3): Invalid 'name' in cell_methods attribute:",d
-                                self.err = self.err+1
-                                rc=0
-                            elif varDimensions.has_key(d) and d != "time":
-                                print "ERROR (7.3): Multiple cell_methods entries for dimension:",d
-                                self.err = self.err+1
-                            else:
-                                varDimensions[d]=1
-
-        # Validate the comment if it is standardized
-        ### RSH TO DO:  Still need to implement validation of unit in the standardized comment.
-        if not error:
-            comments=getComments.findall(cellMethods)
-            cpr=re.compile(r'^\((interval:\s+\d+\s+(years|months|days|hours|minutes|seconds)\s*)*(comment: .+)?\)')
-            for c in comments:
-                if re.search(r'^\(\s*interval',c):
-                    # Only need to check standardized comments i.e. those beginning (interval ...)
-                    if not cpr.match(c):
-                        strError=c
-                        error=1
-                        break
-
-        if error:
-            print "ERROR (7.3): Invalid cell_methods syntax: '" + strError + "'"
-            self.err = self.err + 1
-            rc=0
-
-    return rc
-
   #----------------------------
   def chkCFRole(self,varName):
   #----------------------------
       # Validate cf_role attribute
       rc=1
-      var=self.f[varName]
+      var=self.meta[varName]
 
       if var.attributes.has_key('cf_role'):
           cf_role=var.attributes['cf_role']
@@ -1374,8 +2011,7 @@ class CFChecker:
           self.cf_roleCount = self.cf_roleCount + 1
 
           if not cf_role in ['timeseries_id','profile_id','trajectory_id']:
-              print "ERROR (9.5): Invalid value for cf_role attribute"
-              self.err = self.err + 1
+              self.error("9.5", "Invalid value for cf_role attribute")
 
               rc=0
       return rc
@@ -1385,7 +2021,7 @@ class CFChecker:
   #---------------------------------
       # Validate count/index variable
       rc=1
-      var=self.f[varName]
+      var=self.meta[varName]
   
       if var.attributes.has_key('sample_dimension'):
 
@@ -1393,8 +2029,7 @@ class CFChecker:
           self.raggedArrayFlag = 1
           
           if var.dtype.char != 'i':
-              print "ERROR (9.3): count variable '"+varName+"' must be of type integer"
-              self.err = self.err + 1
+              self.error("9.3", "count variable '"+varName+"' must be of type integer")
 
       if var.attributes.has_key('instance_dimension'):
 
@@ -1402,26 +2037,14 @@ class CFChecker:
           self.raggedArrayFlag = 1
 
           if var.dtype.char != 'i':
-              print "ERROR (9.3): index variable '"+varName+"' must be of type integer"
-              self.err = self.err + 1
+              self.error("9.3", "index variable '"+varName+"' must be of type integer")
 
                 
   #----------------------------------
   def isValidUdunitsUnit(self,unit):
   #----------------------------------
       # units must be recognizable by udunits package
-      udunitsUnit = udunits.ut_parse(self.unitSystem, unit, "UT_ASCII")
-      if udunitsUnit:
-          # Valid unit
-          rc=1
-      else:
-          # Invalid unit
-          rc=0
-
-      # Free up resources associated with udunitsUnit
-      udunits.ut_free(udunitsUnit)
-      
-      return rc
+      return self.unitSystem.isValid(unit)
 
 
   #---------------------------------------------------
@@ -1431,22 +2054,21 @@ class CFChecker:
       rc=1
       # Is it a string-valued aux coord var with standard_name of area_type?
       if value in self.auxCoordVars:
-          if self.f[value].dtype.char != 'c':
+          if self.meta[value].dtype.char != 'c':
               rc=0
           elif type == "type2":
               # <type2> has the additional requirement that it is not allowed a leading dimension of more than one
-              leadingDim = self.f[value].getAxisIds()[0]
+              leadingDim = self.meta[value].dimensions[0]
               # Must not be a value of more than one
-              if self.f.dimensions[leadingDim] > 1:
-                  print "ERROR (7.3):",value,"is not allowed a leading dimension of more than one."
-                  self.err = self.err + 1
+              if self.meta.dimensions[leadingDim] > 1:
+                  self.error("7.3", value,"is not allowed a leading dimension of more than one.")
 
-          if self.f[value].attributes.has_key('standard_name'):
-              if self.f[value].attributes['standard_name'] != 'area_type':
+          if self.meta[value].attributes.has_key('standard_name'):
+              if self.meta[value].attributes['standard_name'] != 'area_type':
                   rc=0
                   
       # Is type a valid area_type according to the area_type table
-      elif value not in self.area_type_lh.list:
+      elif value not in self.areaTypeNames:
           rc=0
 
       return rc
@@ -1459,118 +2081,72 @@ class CFChecker:
        dim1: [dim2: [dim3: ...]] method [where type1 [over type2]] [ (comment) ]
        where comment is of the form:  ([interval: value unit [interval: ...] comment:] remainder)
     """
-    
     rc=1
-    error = 0  # Flag to indicate validity of cell_methods string syntax
     varDimensions={}
-    var=self.f[varName]
+    var=self.meta[varName]
     
     if var.attributes.has_key('cell_methods'):
-        cellMethods=var.attributes['cell_methods']
-
-#        cellMethods="lat: area: maximum (interval: 1 hours interval: 3 hours comment: fred)"
+        cellMethods=cellmethods.parse(var.attributes['cell_methods'])
 
-        pr1=re.compile(r'^'
-                      r'(\s*\S+\s*:\s*(\S+\s*:\s*)*'
-                      r'([a-z_]+)'
-                      r'(\s+where\s+\S+(\s+over\s+\S+)?)?'
-                      r'(\s+(over|within)\s+(days|years))?\s*'
-                      r'(\((interval:\s+\d+\s+\S+\s*)*(comment: .+)?.*\))?)'
-                      r'+$')
-        
         # Validate the entire string
-        m = pr1.match(cellMethods)
-        if not m:
-            print "ERROR (7.3) Invalid syntax for cell_methods attribute"
-            self.err = self.err + 1
+        if cellMethods.error is not None:
+            # Worded as it always has been in the text report, without the colon
+            self.countFinding(ERROR, "7.3", ["Invalid syntax for cell_methods attribute"],
+                              "ERROR (7.3) Invalid syntax for cell_methods attribute")
             rc=0
 
-        # Grab each word-list - dim1: [dim2: [dim3: ...]] method [where type1 [over type2]] [within|over days|years] [(comment)]
-        pr2=re.compile(r'(?P<dimensions>\s*\S+\s*:\s*(\S+\s*:\s*)*'
-                      r'(?P<method>[a-z_]+)'
-                      r'(?:\s+where\s+(?P<type1>\S+)(?:\s+over\s+(?P<type2>\S+))?)?'
-                      r'(?:\s+(?:over|within)\s+(?:days|years))?\s*)'
-                      r'(?P<comment>\([^)]+\))?')
-
-        substr_iter=pr2.finditer(cellMethods)
-        
-        # Validate each substring
-        for s in substr_iter:
-            if not re.match(r'point|sum|maximum|median|mid_range|minimum|mean|mode|standard_deviation|variance',s.group('method')):
-                print "ERROR (7.3): Invalid cell_method:",s.group('method')
-                self.err = self.err + 1
+        # Validate each entry - dim1: [dim2: [dim3: ...]] method [where type1 [over type2]] [within|over days|years] [(comment)]
+        for entry in cellMethods.entries:
+            if entry.method not in cellmethods.METHODS:
+                self.error("7.3", "Invalid cell_method:",entry.method)
                 rc=0
 
             if self.version >= 1.4:
-                if s.group('type1'):
-                    if not self.isValidCellMethodTypeValue('type1', s.group('type1')):
-                        print "ERROR (7.3): Invalid type1: '"+s.group('type1')+"' - must be a variable name or valid area_type"
-                        self.err = self.err + 1
-
-                if s.group('type2'):
-                    if not self.isValidCellMethodTypeValue('type2', s.group('type2')):
-                        print "ERROR (7.3): Invalid type2: '"+s.group('type2')+"' - must be a variable name or valid area_type"
-                        self.err = self.err + 1
+                if entry.where:
+                    if not self.isValidCellMethodTypeValue('type1', entry.where):
+                        self.error("7.3", "Invalid type1: '"+entry.where+"' - must be a variable name or valid area_type")
+
+                if entry.over:
+                    if not self.isValidCellMethodTypeValue('type2', entry.over):
+                        self.error("7.3", "Invalid type2: '"+entry.over+"' - must be a variable name or valid area_type")
                                                       
             # Validate dim and check that it only appears once unless it is 'time'
-            allDims=re.findall(r'\S+\s*:',s.group('dimensions'))
-            dc=0          # Number of dims
-            
-            for part in allDims:
-                dims=re.split(':',part)
-
-                for d in dims:
-                    if d:
-                        dc=dc+1
-                        if var.getAxisIndex(d) == -1 and not d in self.std_name_dh.dict.keys():
-                            if self.version >= 1.4:
-                                # Extra constraints at CF-1.4 and above
-                                if d != "area":
-                                    print "ERROR (7.3): Invalid 'name' in cell_methods attribute:",d
-                                    self.err = self.err+1
-                                    rc=0
-                            else:
-                                print "ERROR (7.3): Invalid 'name' in cell_methods attribute:",d
-                                self.err = self.err+1
-                                rc=0
-                                
-                        else:
-                            # dim is a variable dimension
-                            if varDimensions.has_key(d) and d != "time":
-                                print "ERROR (7.3): Multiple cell_methods entries for dimension:",d
-                                self.err = self.err+1
-                                rc=0
-                            else:
-                                varDimensions[d]=1
-                                
-                            if self.version >= 1.4:
-                                # If dim is a coordinate variable and cell_method is not 'point' check
-                                # if the coordinate variable has either bounds or climatology attributes
-                                if d in self.coordVars and s.group('method') != 'point':
-                                    if not self.f[d].attributes.has_key('bounds') and not self.f[d].attributes.has_key('climatology'):
-                                        print "WARNING (7.3): Coordinate variable",d,"should have bounds or climatology attribute"
-                                        self.warn = self.warn + 1
-                                                
-            # Validate the comment associated with this method, if present
-            comment = s.group('comment')
-            if comment:
-                getIntervals = re.compile(r'(?P<interval>interval:\s+\d+\s+(?P<unit>\S+)\s*)')
-                allIntervals = getIntervals.finditer(comment)
-
-                # There must be zero, one or exactly as many interval clauses as there are dims
-                i=0   # Number of intervals present
-                for m in allIntervals:
-                    i=i+1
-                    unit=m.group('unit')
-                    if not self.isValidUdunitsUnit(unit):
-                        print "ERROR (7.3): Invalid unit",unit,"in cell_methods comment"
-                        self.err = self.err + 1
+            for d in entry.names:
+                if var.getAxisIndex(d) == -1 and not d in self.stdNames:
+                    if self.version >= 1.4:
+                        # Extra constraints at CF-1.4 and above
+                        if d != "area":
+                            self.error("7.3", "Invalid 'name' in cell_methods attribute:",d)
+                            rc=0
+                    else:
+                        self.error("7.3", "Invalid 'name' in cell_methods attribute:",d)
                         rc=0
-
-                if i > 1 and i != dc:
-                    print "ERROR (7.3): Incorrect number or interval clauses in cell_methods attribute"
-                    self.err = self.err + 1
+                        
+                else:
+                    # dim is a variable dimension
+                    if varDimensions.has_key(d) and d != "time":
+                        self.error("7.3", "Multiple cell_methods entries for dimension:",d)
+                        rc=0
+                    else:
+                        varDimensions[d]=1
+                        
+                    if self.version >= 1.4:
+                        # If dim is a coordinate variable and cell_method is not 'point' check
+                        # if the coordinate variable has either bounds or climatology attributes
+                        if d in self.coordVars and entry.method != 'point':
+                            if not self.meta[d].attributes.has_key('bounds') and not self.meta[d].attributes.has_key('climatology'):
+                                self.warning("7.3", "Coordinate variable",d,"should have bounds or climatology attribute")
+                                        
+            # Validate the interval clauses of the comment, if present.
+            # There must be zero, one or exactly as many interval clauses as there are dims
+            for (value, unit) in entry.intervals:
+                if not self.isValidUdunitsUnit(unit):
+                    self.error("7.3", "Invalid unit",unit,"in cell_methods comment")
                     rc=0
+
+            if len(entry.intervals) > 1 and len(entry.intervals) != len(entry.names):
+                self.error("7.3", "Incorrect number or interval clauses in cell_methods attribute")
+                rc=0
                     
     return rc
 
@@ -1583,62 +2159,46 @@ class CFChecker:
     2) Reference valid variable
     3) Valid measure"""
     rc=1
-    var=self.f[varName]
+    var=self.meta[varName]
     
     if var.attributes.has_key('cell_measures'):
         cellMeasures=var.attributes['cell_measures']
         if not re.search("^([a-zA-Z0-9]+: +([a-zA-Z0-9_ ]+:?)*( +[a-zA-Z0-9_]+)?)$",cellMeasures):
-            print "ERROR (7.2): Invalid cell_measures syntax"
-            self.err = self.err+1
+            self.error("7.2", "Invalid cell_measures syntax")
             rc=0
         else:
             # Need to validate the measure + name
-            split=string.split(cellMeasures)
-            splitIter=iter(split)
-            try:
-                while 1:
-                    measure=splitIter.next()
-                    variable=splitIter.next()
-
-                    if variable not in self.f.variables.keys():
-                        print "WARNING (7.2): cell_measures referring to variable '"+variable+"' that doesn't exist in this netCDF file."
-                        print "INFO (7.2): This is strictly an error if the cell_measures variable is not included in the dataset."
-                        self.warn = self.warn+1
+            for (measure, variable) in self.graph.labelledReferences(varName, 'cell_measures'):
+                if variable not in self.meta.dataVariables:
+                    self.warning("7.2", "cell_measures referring to variable '"+variable+"' that doesn't exist in this netCDF file.")
+                    # Not counted
+                    self.addFinding(INFO, "7.2", ["This is strictly an error if the cell_measures variable is not included in the dataset."])
+                    rc=0
+                    
+                else:
+                    # Valid variable name in cell_measures so carry on with tests.    
+                    if len(self.meta[variable].dimensions) > len(var.dimensions):
+                        self.error("7.2", "Dimensions of",variable,"must be same or a subset of",var.getAxisIds())
                         rc=0
-                        
                     else:
-                        # Valid variable name in cell_measures so carry on with tests.    
-                        if len(self.f[variable].getAxisIds()) > len(var.getAxisIds()):
-                            print "ERROR (7.2): Dimensions of",variable,"must be same or a subset of",var.getAxisIds()
-                            self.err = self.err+1
-                            rc=0
-                        else:
-                            # If cell_measures variable has more dims than var then this check automatically will fail
-                            # Put in else so as not to duplicate ERROR messages.
-                            for dim in self.f[variable].getAxisIds():
-                                if dim not in var.getAxisIds():
-                                    print "ERROR (7.2): Dimensions of",variable,"must be same or a subset of",var.getAxisIds()
-                                    self.err = self.err+1
-                                    rc=0
-                    
-                        measure=re.sub(':','',measure)
-                        if not re.match("^(area|volume)$",measure):
-                            print "ERROR (7.2): Invalid measure in attribute cell_measures"
-                            self.err = self.err+1
-                            rc=0
+                        # If cell_measures variable has more dims than var then this check automatically will fail
+                        # Put in else so as not to duplicate ERROR messages.
+                        for dim in self.meta[variable].dimensions:
+                            if dim not in var.dimensions:
+                                self.error("7.2", "Dimensions of",variable,"must be same or a subset of",var.getAxisIds())
+                                rc=0
+                
+                    if not re.match("^(area|volume)$",measure):
+                        self.error("7.2", "Invalid measure in attribute cell_measures")
+                        rc=0
 
-                        if measure == "area" and self.f[variable].units != "m2":
-                            print "ERROR (7.2): Must have square meters for area measure"
-                            self.err = self.err+1
-                            rc=0
+                    if measure == "area" and self.meta[variable].units != "m2":
+                        self.error("7.2", "Must have square meters for area measure")
+                        rc=0
 
-                        if measure == "volume" and self.f[variable].units != "m3":
-                            print "ERROR (7.2): Must have cubic meters for volume measure"
-                            self.err = self.err+1
-                            rc=0
-                        
-            except StopIteration:
-                pass
+                    if measure == "volume" and self.meta[variable].units != "m3":
+                        self.error("7.2", "Must have cubic meters for volume measure")
+                        rc=0
             
     return rc
 
@@ -1653,18 +2213,16 @@ class CFChecker:
     3) Invalid formula_terms syntax
     4) Var referenced, not declared"""
     rc=1
-    var=self.f[varName]
+    var=self.meta[varName]
     
     if var.attributes.has_key('formula_terms'):
 
         if varName not in allCoordVars:
-            print "ERROR (4.3.2): formula_terms attribute only allowed on coordinate variables"
-            self.err = self.err+1
+            self.error("4.3.2", "formula_terms attribute only allowed on coordinate variables")
             
         # Get standard_name to determine which formula is to be used
         if not var.attributes.has_key('standard_name'):
-            print "ERROR (4.3.2): Cannot get formula definition as no standard_name"
-            self.err = self.err+1
+            self.error("4.3.2", "Cannot get formula definition as no standard_name")
             # No sense in carrying on as can't validate formula_terms without valid standard name
             return 0
 
@@ -1672,8 +2230,7 @@ class CFChecker:
         (stdName,modifier) = self.getStdName(var)
         
         if not self.alias.has_key(stdName):
-            print "ERROR (4.3.2): No formula defined for standard name:",stdName
-            self.err = self.err+1
+            self.error("4.3.2", "No formula defined for standard name:",stdName)
             # No formula available so can't validate formula_terms
             return 0
 
@@ -1681,32 +2238,26 @@ class CFChecker:
 
         formulaTerms=var.attributes['formula_terms']
         if not re.search("^([a-zA-Z0-9_]+: +[a-zA-Z0-9_]+( +)?)*$",formulaTerms):
-            print "ERROR (4.3.2): Invalid formula_terms syntax"
-            self.err = self.err+1
+            self.error("4.3.2", "Invalid formula_terms syntax")
             rc=0
         else:
             # Need to validate the term & var
-            split=string.split(formulaTerms)
-            for x in split[:]:
-                if not re.search("^[a-zA-Z0-9_]+:$", x):
-                    # Variable - should be declared in netCDF file
-                    if x not in self.f._file_.variables.keys():
-                        print "ERROR (4.3.2):",x,"is not declared as a variable"
-                        self.err = self.err+1
-                        rc=0       
-                else:
-                    # Term - Should be present in formula
-                    x=re.sub(':','',x)
-                    found='false'
-                    for formula in self.formulas[index]:
-                        if re.search(x,formula):
-                            found='true'
-                            break
-
-                    if found == 'false':
-                        print "ERROR (4.3.2): term",x,"not present in formula"
-                        self.err = self.err+1
-                        rc=0
+            for (term, x) in self.graph.labelledReferences(varName, 'formula_terms'):
+                # Term - Should be present in formula
+                found='false'
+                for formula in self.formulas[index]:
+                    if re.search(term,formula):
+                        found='true'
+                        break
+
+                if found == 'false':
+                    self.error("4.3.2", "term",term,"not present in formula")
+                    rc=0
+
+                # Variable - should be declared in netCDF file
+                if not self.meta.has_key(x):
+                    self.error("4.3.2", x,"is not declared as a variable")
+                    rc=0
 
     return rc
 
@@ -1716,7 +2267,7 @@ class CFChecker:
   #----------------------------------------
       """Check units attribute"""
       rc=1
-      var=self.f[varName]
+      var=self.meta[varName]
 
       if self.badc:
           rc = self.chkBADCUnits(var)
@@ -1729,29 +2280,25 @@ class CFChecker:
           # Type of units is a string
           units = var.attributes['units']
           if type(units) != types.StringType:
-              print "ERROR (3.1): units attribute must be of type 'String'"
-              self.err = self.err+1
+              self.error("3.1", "units attribute must be of type 'String'")
               # units not a string so no point carrying out further tests
               return 0
             
           # units - level, layer and sigma_level are deprecated
           if units in ['level','layer','sigma_level']:
-              print "WARNING (3.1): units",units,"is deprecated"
-              self.warn = self.warn+1
+              self.warning("3.1", "units",units,"is deprecated")
           elif units == 'month':
-              print "WARNING (4.4): The unit 'month', defined by udunits to be exactly year/12, should"
-              print "         be used with caution."
-              self.warn = self.warn+1
+              self.warning("4.4", "The unit 'month', defined by udunits to be exactly year/12, should\n"
+                                  "         be used with caution.")
           elif units == 'year':
-              print "WARNING (4.4): The unit 'year', defined by udunits to be exactly 365.242198781 days,"
-              print "         should be used with caution. It is not a calendar year."
+              # Not counted
+              self.addFinding(WARNING, "4.4", ["The unit 'year', defined by udunits to be exactly 365.242198781 days,\n"
+                                               "         should be used with caution. It is not a calendar year."])
           else:
               
               # units must be recognizable by udunits package
-              varUnit = udunits.ut_parse(self.unitSystem, units, "UT_ASCII")
-              if not varUnit:
-                  print "ERROR (3.1): Invalid units: ",units
-                  self.err = self.err+1
+              if not self.unitSystem.isValid(units):
+                  self.error("3.1", "Invalid units: ",units)
                   # Invalid units so no point continuing with further unit checks
                   return 0
         
@@ -1764,47 +2311,32 @@ class CFChecker:
                   if modifier == 'number_of_observations':
                       # Standard Name modifier is number_of_observations therefore units should be "1".  See Appendix C
                       if not units == "1":
-                          print "ERROR (3.3): Standard Name modifier 'number_of_observations' present therefore units must be set to 1."
-                          self.err = self.err + 1
+                          self.error("3.3", "Standard Name modifier 'number_of_observations' present therefore units must be set to 1.")
                   
-                  elif stdName in self.std_name_dh.dict.keys():
+                  elif stdName in self.stdNames:
                       # Get canonical units from standard name table
                       stdNameUnits = self.std_name_dh.dict[stdName]
 
                       # stdNameUnits is unicode which udunits can't deal with.  Explicity convert it to ASCII
                       stdNameUnits=stdNameUnits.encode('ascii')
 
-                      canonicalUnit = udunits.ut_parse(self.unitSystem, stdNameUnits, "UT_ASCII")
-
                       # To compare units we need to remove the reference time from the variable units
+                      varUnits = units
                       if re.search("since",units):
                           # unit attribute contains a reference time - remove it
-                          udunits.ut_free(varUnit)
-                          varUnit = udunits.ut_parse(self.unitSystem, units.split()[0], "UT_ASCII")
+                          varUnits = units.split()[0]
 
                       # If variable has cell_methods=variance we need to square standard_name table units
+                      squared = 0
                       if var.attributes.has_key('cell_methods'):
-                          # Remove comments from the cell_methods string - no need to search these
-                          getComments=re.compile(r'\([^)]+\)')
-                          noComments=getComments.sub('%5A',var.attributes['cell_methods'])
-
-                          if re.search(r'(\s+|:)variance',noComments):
+                          if 'variance' in cellmethods.parse(var.attributes['cell_methods']).methods():
                               # Variance method so standard_name units need to be squared.
-                              unit1 = udunits.ut_parse(self.unitSystem, stdNameUnits, "UT_ASCII")
-                              canonicalUnit = udunits.ut_multiply(unit1,unit1)
-                              udunits.ut_free(unit1)
+                              squared = 1
 
-                      if not udunits.ut_are_convertible(varUnit, canonicalUnit):
+                      if not self.unitSystem.areConvertible(varUnits, stdNameUnits, squared):
                           # Conversion unsuccessful
-                          print "ERROR (3.1): Units are not consistent with those given in the standard_name table."
-                          self.err = self.err+1
+                          self.error("3.1", "Units are not consistent with those given in the standard_name table.")
                           rc=0
-
-                      # Free resources associated with canonicalUnit
-                      udunits.ut_free(canonicalUnit)
-
-              # Free resources associated with udunitsUnit
-              udunits.ut_free(varUnit)
               
       else:
 
@@ -1813,25 +2345,22 @@ class CFChecker:
           if var.id in allCoordVars:
               
               # Label variables do not require units attribute
-              if self.f[var.id].typecode() != 'c':
+              if self.meta[var.id].typecode() != 'c':
                   if var.attributes.has_key('axis'):
                       if not var.axis == 'Z':
-                          print "WARNING (3.1): units attribute should be present"
-                          self.warn = self.warn+1
+                          self.warning("3.1", "units attribute should be present")
                   elif not hasattr(var,'positive') and not hasattr(var,'formula_terms') and not hasattr(var,'compress'):
-                      print "WARNING (3.1): units attribute should be present"
-                      self.warn = self.warn+1
+                      self.warning("3.1", "units attribute should be present")
 
-          elif var.id not in self.boundsVars and var.id not in self.climatologyVars and var.id not in self.gridMappingVars:
+          elif var.id not in self.attachedVars:
               # Variable is not a boundary or climatology variable
 
-              dimensions = self.f[var.id].getAxisIds()
+              dimensions = self.meta[var.id].getAxisIds()
 
-              if not hasattr(var,'flag_values') and len(dimensions) != 0 and self.f[var.id].typecode() != 'c':
+              if not hasattr(var,'flag_values') and len(dimensions) != 0 and self.meta[var.id].typecode() != 'c':
                   # Variable is not a flag variable or a scalar or a label
                   
-                  print "INFO (3.1): No units attribute set.  Please consider adding a units attribute for completeness."
-                  self.info = self.info+1 
+                  self.information("3.1", "No units attribute set.  Please consider adding a units attribute for completeness.")
 
       return rc
 
@@ -1848,7 +2377,7 @@ class CFChecker:
       # units must be recognizable by the BADC units file
       for line in units_lines:
           if hasattr(var, 'units') and var.attributes['units'] in string.split(line):
-              print "Valid units in BADC list:", var.attributes['units']
+              self.say("Valid units in BADC list:", var.attributes['units'])
               rc=1
               break
           else:
@@ -1861,14 +2390,13 @@ class CFChecker:
   def chkValidMinMaxRange(self, varName):
   #---------------------------------------
       """Check that valid_range and valid_min/valid_max are not both specified"""
-      var=self.f[varName]
+      var=self.meta[varName]
     
       if var.attributes.has_key('valid_range'):
           if var.attributes.has_key('valid_min') or \
              var.attributes.has_key('valid_max'):
 
-              print "ERROR (2.5.1): Illegal use of valid_range and valid_min/valid_max"
-              self.err = self.err+1
+              self.error("2.5.1", "Illegal use of valid_range and valid_min/valid_max")
               return 0
 
       return 1
@@ -1881,13 +2409,14 @@ class CFChecker:
     2) _FillValue lies outside of valid_range
     3) type of missing_value
     4) flag use of missing_value as deprecated"""
+    import numpy
     rc=1
-    var=self.f[varName]
+    var=self.meta[varName]
 
 ##    varType=var.dtype.char
 
-    if var.__dict__.has_key('_FillValue'):
-        fillValue=var.__dict__['_FillValue']
+    if var.attributes.has_key('_FillValue'):
+        fillValue=var.attributes['_FillValue']
         
 ## 05.02.08 No longer needed as this is now detected by chkAttribute as _FillValue
 ## has an attribute type of 'D'. See Trac #022
@@ -1905,15 +2434,12 @@ class CFChecker:
             # Check _FillValue is outside valid_range
             validRange=var.attributes['valid_range']
             if fillValue > validRange[0] and fillValue < validRange[1]:
-                print "WARNING (2.5.1): _FillValue should be outside valid_range"
-                self.warn = self.warn+1
+                self.warning("2.5.1", "_FillValue should be outside valid_range")
 
         if var.id in self.boundsVars:
-            print "WARNING (7.1): Boundary Variable",var.id,"should not have _FillValue attribute"
-            self.warn = self.warn+1
+            self.warning("7.1", "Boundary Variable",var.id,"should not have _FillValue attribute")
         elif var.id in self.climatologyVars:
-            print "ERROR (7.4): Climatology Variable",var.id,"must not have _FillValue attribute"
-            self.err = self.err+1
+            self.error("7.4", "Climatology Variable",var.id,"must not have _FillValue attribute")
             rc=0
 
     if var.attributes.has_key('missing_value'):
@@ -1924,13 +2450,11 @@ class CFChecker:
 
         try:
             if missingValue:
-                if var.__dict__.has_key('_FillValue'):
+                if var.attributes.has_key('_FillValue'):
                     if fillValue != missingValue:
                         # Special case: NaN == NaN is not detected as NaN does not compare equal to anything else
                         if not (numpy.isnan(fillValue) and numpy.isnan(missingValue)):
-                            print "WARNING (2.5.1): missing_value and _FillValue set to differing values"
-                            
-                            self.warn = self.warn+1
+                            self.warning("2.5.1", "missing_value and _FillValue set to differing values")
 
 ## 08.12.10 missing_value is no longer deprecated by the NUG
 ##            else:
@@ -1953,11 +2477,9 @@ class CFChecker:
 ##                 rc=0
 
                 if var.id in self.boundsVars:
-                    print "WARNING (7.1): Boundary Variable",var.id,"should not have missing_value attribute"
-                    self.warn = self.warn+1
+                    self.warning("7.1", "Boundary Variable",var.id,"should not have missing_value attribute")
                 elif var.id in self.climatologyVars:
-                    print "ERROR (7.4): Climatology Variable",var.id,"must not have missing_value attribute"
-                    self.err = self.err+1
+                    self.error("7.4", "Climatology Variable",var.id,"must not have missing_value attribute")
                     rc=0
 
         except ValueError:
@@ -1966,8 +2488,9 @@ class CFChecker:
 #                self.err = self.err+1
 #                rc=0
 #            else:
-            print "ValueError:", exc_info()[1]
-            print "INFO: Could not complete tests on missing_value attribute"
+            self.say("ValueError:", exc_info()[1])
+            # Not counted
+            self.addFinding(INFO, None, ["Could not complete tests on missing_value attribute"])
             raise
             rc=0
                 
@@ -1978,18 +2501,16 @@ class CFChecker:
   def chkAxisAttribute(self, varName):
   #------------------------------------
       """Check validity of axis attribute"""
-      var=self.f[varName]
+      var=self.meta[varName]
       
       if var.attributes.has_key('axis'):
           if not re.match('^(X|Y|Z|T)$',var.attributes['axis'],re.I):
-              print "ERROR (4): Invalid value for axis attribute"
-              self.err = self.err+1
+              self.error("4", "Invalid value for axis attribute")
               return 0
 
           # axis attribute is allowed on an aux coord var as of CF-1.6
           if self.version >= 1.1 and self.version < 1.6 and varName in self.auxCoordVars:
-              print "ERROR (4): Axis attribute is not allowed for auxillary coordinate variables."
-              self.err = self.err+1
+              self.error("4", "Axis attribute is not allowed for auxillary coordinate variables.")
               return 0
           
           # Check that axis attribute is consistent with the coordinate type
@@ -2009,8 +2530,7 @@ class CFChecker:
           if interp != None:
               # It was possible to deduce axis interpretation from units/positive
               if interp != var.axis:
-                  print "ERROR (4): axis attribute inconsistent with coordinate type as deduced from units and/or positive"
-                  self.err = self.err+1
+                  self.error("4", "axis attribute inconsistent with coordinate type as deduced from units and/or positive")
                   return 0
             
       return 1
@@ -2019,80 +2539,80 @@ class CFChecker:
   #----------------------------------------
   def chkPositiveAttribute(self, varName):
   #----------------------------------------
-      var=self.f[varName]
+      var=self.meta[varName]
       if var.attributes.has_key('positive'):
           if not re.match('^(down|up)$',var.attributes['positive'],re.I):
-              print "ERROR (4.3): Invalid value for positive attribute"
-              self.err = self.err+1
+              self.error("4.3", "Invalid value for positive attribute")
               return 0
 
       return 1
 
 
+  #-----------------------------------
+  def chkAxisVariable(self, varName):
+  #-----------------------------------
+      """Checks on a variable named after a dimension"""
+      # Check var is a FileAxis.  If not then there may be a problem with its declaration.
+      # I.e. Multi-dimensional coordinate var with a dimension of the same name
+      # or an axis that hasn't been identified through the coordinates attribute
+      # CRM035 (17.04.07)
+      if not self.meta[varName].isAxis:
+          self.warning("5", "Possible incorrect declaration of a coordinate variable.")
+      elif self.meta[varName].isTime():
+          return self.chkTimeVariableAttributes(varName)
+
+      return 1
+
+
   #-----------------------------------------
   def chkTimeVariableAttributes(self, varName):
   #-----------------------------------------
     rc=1
-    var=self.f[varName]
+    var=self.meta[varName]
     
     if var.attributes.has_key('calendar'):
         if not re.match('(gregorian|standard|proleptic_gregorian|noleap|365_day|all_leap|366_day|360_day|julian|none)',
                         var.attributes['calendar'],re.I):
             # Non-standardized calendar so month_lengths should be present
             if not var.attributes.has_key('month_lengths'):
-                print "ERROR (4.4.1): Non-standard calendar, so month_lengths attribute must be present"
-                self.err = self.err+1
+                self.error("4.4.1", "Non-standard calendar, so month_lengths attribute must be present")
                 rc=0
         else:   
             if var.attributes.has_key('month_lengths') or \
                var.attributes.has_key('leap_year') or \
                var.attributes.has_key('leap_month'):
-                print "ERROR (4.4.1): The attributes 'month_lengths', 'leap_year' and 'leap_month' must not appear when 'calendar' is present."
-                self.err = self.err+1
+                self.error("4.4.1", "The attributes 'month_lengths', 'leap_year' and 'leap_month' must not appear when 'calendar' is present.")
                 rc=0
 
     if not var.attributes.has_key('calendar') and not var.attributes.has_key('month_lengths'):
-        print "WARNING (4.4.1): Use of the calendar and/or month_lengths attributes is recommended for time coordinate variables"
-        self.warn = self.warn+1
+        self.warning("4.4.1", "Use of the calendar and/or month_lengths attributes is recommended for time coordinate variables")
         rc=0
         
     if var.attributes.has_key('month_lengths'):
         if len(var.attributes['month_lengths']) != 12 and \
            var.attributes['month_lengths'].dtype.char != 'i':
-            print "ERROR (4.4.1): Attribute 'month_lengths' should be an integer array of size 12"
-            self.err = self.err+1
+            self.error("4.4.1", "Attribute 'month_lengths' should be an integer array of size 12")
             rc=0
 
     if var.attributes.has_key('leap_year'):
         if var.attributes['leap_year'].dtype.char != 'i' and \
            len(var.attributes['leap_year']) != 1:
-            print "ERROR (4.4.1): leap_year should be a scalar value"
-            self.err = self.err+1
+            self.error("4.4.1", "leap_year should be a scalar value")
             rc=0
 
     if var.attributes.has_key('leap_month'):
         if not re.match("^(1|2|3|4|5|6|7|8|9|10|11|12)$",
                         str(var.attributes['leap_month'][0])):
-            print "ERROR (4.4.1): leap_month should be between 1 and 12"
-            self.err = self.err+1
+            self.error("4.4.1", "leap_month should be between 1 and 12")
             rc=0
 
         if not var.attributes.has_key('leap_year'):
-            print "WARNING (4.4.1): leap_month is ignored as leap_year NOT specified"
-            self.warn = self.warn+1
+            self.warning("4.4.1", "leap_month is ignored as leap_year NOT specified")
 
     # Time units must contain a reference time
     # To do this; test if the "unit" in question is convertible with a known timestamp "unit".
-    varUnits=udunits.ut_parse(self.unitSystem, var.units, "UT_ASCII")
-    secsSinceEpoch=udunits.ut_parse(self.unitSystem, "seconds since 1970-01-01", "UT_ASCII")
-    
-    if not udunits.ut_are_convertible(secsSinceEpoch, varUnits):
-        print "ERROR (4.4): Invalid units and/or reference time"
-        self.err = self.err+1
-
-    # Free resources used by varUnits and secsSinceEpoch
-    udunits.ut_free(varUnits)
-    udunits.ut_free(secsSinceEpoch)
+    if not self.unitSystem.areConvertible("seconds since 1970-01-01", var.units):
+        self.error("4.4", "Invalid units and/or reference time")
         
     return rc
 
@@ -2103,15 +2623,13 @@ class CFChecker:
       """Check 1) standard_name & long_name attributes are present
                2) for a valid standard_name as listed in the standard name table."""
       rc=1
-      var=self.f[varName]
+      var=self.meta[varName]
 
       if not var.attributes.has_key('standard_name') and \
          not var.attributes.has_key('long_name'):
 
-          exceptions=self.boundsVars+self.climatologyVars+self.gridMappingVars
-          if var.id not in exceptions:
-              print "WARNING (3): No standard_name or long_name attribute specified"
-              self.warn = self.warn + 1
+          if var.id not in self.attachedVars:
+              self.warning("3", "No standard_name or long_name attribute specified")
               
       if var.attributes.has_key('standard_name'):
           # Check if valid by the standard_name table and allowed modifiers
@@ -2121,29 +2639,27 @@ class CFChecker:
           # followed by a modifier (E.g. atmosphere_cloud_liquid_water_content status_flag)
           std_name_el=string.split(std_name)
           if not std_name_el:
-              print "ERROR (3.3): Empty string for 'standard_name' attribute"
-              self.err = self.err + 1
+              self.error("3.3", "Empty string for 'standard_name' attribute")
               rc=0
               
           elif not self.parseBlankSeparatedList(std_name) or len(std_name_el) > 2:
-              print "ERROR (3.3): Invalid syntax for 'standard_name' attribute: '"+std_name+"'"
-              self.err = self.err + 1
+              self.error("3.3", "Invalid syntax for 'standard_name' attribute: '"+std_name+"'")
               rc=0
 
           else:
               # Validate standard_name
               name=std_name_el[0]
-              if not name in self.std_name_dh.dict.keys():
+              if not name in self.stdNames:
                   if chkDerivedName(name):
-                      print "ERROR (3.3): Invalid standard_name:",name
-                      self.err = self.err + 1
+                      self.error("3.3", "Invalid standard_name:",name)
                       rc=0
 
               if len(std_name_el) == 2:
                   # Validate modifier
                   modifier=std_name_el[1]
                   if not modifier in ['detection_minimum','number_of_observations','standard_error','status_flag']:
-                      print "ERROR (3.3): Invalid standard_name modifier: "+modifier
+                      # Not counted
+                      self.addFinding(ERROR, "3.3", ["Invalid standard_name modifier: "+modifier])
                       rc=0
                       
       return rc
@@ -2153,55 +2669,59 @@ class CFChecker:
   def chkCompressAttr(self, varName):
   #-----------------------------------
     rc=1
-    var=self.f[varName]
+    var=self.meta[varName]
     if var.attributes.has_key('compress'):
         compress=var.attributes['compress']
 
         if var.typecode() != 'i':
-            print "ERROR (8.2):",var.id,"- compress attribute can only be attached to variable of type int."
-            self.err = self.err+1
+            self.error("8.2", var.id,"- compress attribute can only be attached to variable of type int.")
             return 0
         if not re.search("^[a-zA-Z0-9_ ]*$",compress):
-            print "ERROR (8.2): Invalid syntax for 'compress' attribute"
-            self.err = self.err+1
+            self.error("8.2", "Invalid syntax for 'compress' attribute")
             rc=0
         else:
             dimensions=string.split(compress)
             dimProduct=1
             for x in dimensions:
                 found='false'
-                if x in self.f.axes.keys():
+                if x in self.meta.axes:
                     # Get product of compressed dimension sizes for use later
                     #dimProduct=dimProduct*self.f.dimensions[x]
-                    dimProduct=dimProduct*len(self.f.axes[x])
+                    dimProduct=dimProduct*self.meta.dimensions[x]
                     found='true'
 
                 if found != 'true':
-                    print "ERROR (8.2): compress attribute naming non-existent dimension: ",x
-                    self.err = self.err+1
+                    self.error("8.2", "compress attribute naming non-existent dimension: ",x)
                     rc=0
 
-            values=var.getValue()
-            outOfRange=0
-            for val in values[:]:
-                if val < 0 or val > dimProduct-1:
-                    outOfRange=1
-                    break;
-                
-            if outOfRange:
-                print "ERROR (8.2): values of",var.id,"must be in the range 0 to",dimProduct-1
-                self.err = self.err+1
+            self.dataCheck('chkCompressValues', varName, dimProduct)
     return rc
 
+  #-----------------------------------------------------
+  def chkCompressValues(self, varName, dimProduct):
+  #-----------------------------------------------------
+    """The values of compressed index variable varName must lie in the
+    range 0 to dimProduct-1"""
+    var=self.meta[varName]
+    values=self.getValues(varName)
+    outOfRange=0
+    for val in values[:]:
+        if val < 0 or val > dimProduct-1:
+            outOfRange=1
+            break;
+        
+    if outOfRange:
+        self.error("8.2", "values of",var.id,"must be in the range 0 to",dimProduct-1)
+    return 1
+
   #---------------------------------
   def chkPackedData(self, varName):
   #---------------------------------
     rc=1
-    var=self.f[varName]
+    var=self.meta[varName]
     if var.attributes.has_key('scale_factor') and var.attributes.has_key('add_offset'):
         if var.attributes['scale_factor'].dtype.char != var.attributes['add_offset'].dtype.char:
-            print "ERROR (8.1): scale_factor and add_offset must be the same numeric data type"
-            self.err = self.err+1
+            self.error("8.1", "scale_factor and add_offset must be the same numeric data type")
             # No point running rest of packed data tests
             return 0
 
@@ -2216,7 +2736,7 @@ class CFChecker:
     # 30.01.13 - CDAT-5.2 - An inconsistency means that determining the type of
     # a FileAxis or FileVariable is different.  C.Doutriaux will hopefully
     # make this more uniform (Raised on the cdat mailing list) CF Trac #
-    if varName in self.f.axes.keys():
+    if varName in self.meta.axes:
         # FileAxis Variable
         varType=var.typecode()
     else:
@@ -2227,25 +2747,22 @@ class CFChecker:
     # One or other attributes present; run remaining checks
     if varType != type:
         if type != 'f' and type != 'd':
-            print "ERROR (8.1): scale_factor and add_offset must be of type float or double"
-            self.err = self.err+1
+            self.error("8.1", "scale_factor and add_offset must be of type float or double")
             rc=0
 
         if varType != 'b' and  varType != 'h' and varType != 'i':
-            print "ERROR (8.1):",var.id,"must be of type byte, short or int"
-            self.err = self.err+1
+            self.error("8.1", var.id,"must be of type byte, short or int")
             rc=0
 
         if type == 'f' and varType == 'i':
-            print "WARNING (8.1): scale_factor/add_offset are type float, therefore",var.id,"should not be of type int"
-            self.warn = self.warn+1
+            self.warning("8.1", "scale_factor/add_offset are type float, therefore",var.id,"should not be of type int")
             
     return rc
 
   #----------------------------
   def chkFlags(self, varName):
   #----------------------------
-      var=self.f[varName]
+      var=self.meta[varName]
       rc=1
       
       if var.attributes.has_key('flag_meanings'):
@@ -2255,8 +2772,7 @@ class CFChecker:
 
 #          if not self.parseBlankSeparatedList(meanings):
           if not self.extendedBlankSeparatedList(meanings):
-                print "ERROR (3.5): Invalid syntax for 'flag_meanings' attribute"
-                self.err = self.err+1
+                self.error("3.5", "Invalid syntax for 'flag_meanings' attribute")
                 rc=0
           
           if var.attributes.has_key('flag_values'):
@@ -2276,11 +2792,11 @@ class CFChecker:
                   
               retcode = self.equalNumOfValues(values,meanings)
               if retcode == -1:
-                  print "ERROR (3.5): Problem in subroutine equalNumOfValues"
+                  # Not counted
+                  self.addFinding(ERROR, "3.5", ["Problem in subroutine equalNumOfValues"])
                   rc = 0
               elif not retcode:
-                  print "ERROR (3.5): Number of flag_values values must equal the number or words/phrases in flag_meanings"
-                  self.err = self.err + 1
+                  self.error("3.5", "Number of flag_values values must equal the number or words/phrases in flag_meanings")
                   rc = 0
                   
               # flag_values values must be mutually exclusive
@@ -2288,8 +2804,7 @@ class CFChecker:
                   values = values.split()
 
               if not self.uniqueList(values):
-                  print "ERROR (3.5): flag_values attribute must contain a list of unique values"
-                  self.err = self.err + 1
+                  self.error("3.5", "flag_values attribute must contain a list of unique values")
                   rc = 0
                   
           if var.attributes.has_key('flag_masks'):
@@ -2298,18 +2813,17 @@ class CFChecker:
 
               retcode = self.equalNumOfValues(masks,meanings)
               if retcode == -1:
-                  print "ERROR (3.5): Problem in subroutine equalNumOfValues"
+                  # Not counted
+                  self.addFinding(ERROR, "3.5", ["Problem in subroutine equalNumOfValues"])
                   rc = 0
               elif not retcode:
-                  print "ERROR (3.5): Number of flag_masks values must equal the number or words/phrases in flag_meanings"
-                  self.err = self.err + 1
+                  self.error("3.5", "Number of flag_masks values must equal the number or words/phrases in flag_meanings")
                   rc = 0
                   
               # flag_values values must be non-zero
               for v in masks:
                   if v == 0:
-                      print "ERROR (3.5): flag_masks values must be non-zero"
-                      self.err = self.err + 1
+                      self.error("3.5", "flag_masks values must be non-zero")
                       rc = 0
                       
           # Doesn't make sense to do bitwise comparison for char variable
@@ -2323,19 +2837,16 @@ class CFChecker:
                       bitwise_AND = v & masks[i]
 
                       if bitwise_AND != v:
-                          print "WARNING (3.5): Bitwise AND of flag_value",v,"and corresponding flag_mask",masks[i],"doesn't match flag_value."
-                          self.warn = self.warn + 1
+                          self.warning("3.5", "Bitwise AND of flag_value",v,"and corresponding flag_mask",masks[i],"doesn't match flag_value.")
                       i=i+1
                  
           if values_or_masks == 0:
               # flag_meanings attribute present, but no flag_values or flag_masks
-              print "ERROR (3.5): flag_meanings present, but no flag_values or flag_masks specified"
-              self.err = self.err + 1
+              self.error("3.5", "flag_meanings present, but no flag_values or flag_masks specified")
               rc = 0
 
           if var.attributes.has_key('flag_values') and not var.attributes.has_key('flag_meanings'):
-              print "ERROR (3.5): flag_meanings attribute is missing"
-              self.err = self.err + 1
+              self.error("3.5", "flag_meanings attribute is missing")
               rc = 0
               
       return rc
@@ -2344,7 +2855,7 @@ class CFChecker:
   #-----------------------
   def getType(self, arg):
   #-----------------------
-      if type(arg) == type(Numeric.array([])):
+      if type(arg) == arrayType():
           return "array"
 
       elif type(arg) == str:
@@ -2354,7 +2865,7 @@ class CFChecker:
           return "list"
 
       else:
-          print "<cfchecker> ERROR: Unknown Type in getType("+arg+")"
+          self.say("<cfchecker> ERROR: Unknown Type in getType("+arg+")")
           return 0
   
   
@@ -2393,63 +2904,81 @@ class CFChecker:
   #------------------------------------------
       """If a coordinate variable is multi-dimensional, then it is recommended
       that the variable name should not match the name of any of its dimensions."""
-      var=self.f[varName]
+      var=self.meta[varName]
     
-      # This is a temporary work around to obtain the dimensions of the coord
-      # var.  In CDMS vn4.0 only 1D coord vars will be axis variables; There
-      # will be no need to use _obj_. See CRM #011
-      if var.id in axes and len(var._obj_.dimensions) > 1:
+      # The dimensions of axis variables come from the snapshot, which works
+      # around cdms axes having no getAxisIds(). See CRM #011
+      if var.id in axes and len(var.dimensions) > 1:
           # Multi-dimensional coordinate var
-          if var.id in var._obj_.dimensions:
-              print "WARNING (5): The name of a multi-dimensional coordinate variable"
-              print "             should not match the name of any of its dimensions."
-              self.warn = self.warn + 1
+          if var.id in var.dimensions:
+              self.warning("5", "The name of a multi-dimensional coordinate variable\n"
+                                "             should not match the name of any of its dimensions.")
 
 
   #--------------------------------------
   def chkValuesMonotonic(self, varName):
   #--------------------------------------
     """A coordinate variable must have values that are strictly monotonic
-    (increasing or decreasing)."""
+    (increasing or decreasing).  The values are read CHUNK_SIZE at a time,
+    the last value of each chunk being carried over to the next, so memory
+    use stays bounded however long the coordinate is."""
+    import numpy
     rc=1
-    var=self.f[varName]
-    values=var.getValue()
-    i=0
-    for val in values[:]:
-        if i == 0:
-            # First value - no comparison to do
-            i=i+1
-            lastVal=val
-            continue
-        elif i == 1:
-            i=i+1
-            if val < lastVal:
-                # Decreasing sequence
-                type='decr'
-            elif val > lastVal:
-                # Increasing sequence
-                type='incr'
+    var=self.meta[varName]
+    if len(var.shape) == 0:
+        return rc
+    length=var.shape[0]
+
+    direction=0      # 1 increasing, -1 decreasing, 0 not yet known
+    last=None        # Last value of the previous chunk
+
+    for start in range(0, length, CHUNK_SIZE):
+        values=numpy.ravel(numpy.ma.getdata(self.getValues(varName, start, min(start+CHUNK_SIZE, length))))
+        if last is not None:
+            values=numpy.concatenate((last, values))
+            offset=start-1   # Index in the variable of values[0]
+        else:
+            offset=start
+
+        # Order is checked up to the first NaN, so whichever of the two
+        # comes first is reported
+        firstNaN=None
+        if values.dtype.kind in 'fc':
+            nans=numpy.isnan(values)
+            if nans.any():
+                firstNaN=nans.argmax()
+                values=values[:firstNaN]
+
+        if len(values) > 1:
+            if direction == 0:
+                if values[1] > values[0]:
+                    # Increasing sequence
+                    direction=1
+                elif values[1] < values[0]:
+                    # Decreasing sequence
+                    direction=-1
+
+            if direction == 1:
+                bad=values[1:] <= values[:-1]
             else:
-                # Same value - ERROR
-                print "ERROR (5): co-ordinate variable '" + var.id + "' not monotonic"
-                self.err = self.err+1
-                return 1
+                # Also catches a repeated first value, when direction is still 0
+                bad=values[1:] >= values[:-1]
 
-            lastVal=val
-        else:
-            i=i+1
-            if val < lastVal and type != 'decr':
-                # ERROR - should be increasing value
-                print "ERROR (5): co-ordinate variable '" + var.id + "' not monotonic"
-                self.err = self.err+1
-                return 1
-            elif val > lastVal and type != 'incr':
-                # ERROR - should be decreasing value
-                print "ERROR (5): co-ordinate variable '" + var.id + "' not monotonic"
-                self.err = self.err+1
-                return 1
+            if bad.any():
+                i=bad.argmax()
+                if values[i+1] == values[i]:
+                    self.error("5", "co-ordinate variable '" + var.id + "' not monotonic (duplicate value at index " + str(offset+i+1) + ")")
+                else:
+                    self.error("5", "co-ordinate variable '" + var.id + "' not monotonic (first violation at index " + str(offset+i+1) + ")")
+                return 0
+
+        if firstNaN is not None:
+            self.error("5", "co-ordinate variable '" + var.id + "' contains NaN values (first at index " + str(offset+firstNaN) + ")")
+            return 0
 
-            lastVal=val
+        last=values[-1:]
+
+    return rc
 
 
 def getargs(arglist):
@@ -2472,6 +3001,16 @@ def getargs(arglist):
     badc=None
     coards=None
     version=Versions[-1]
+    jobs=1
+    metadataOnly=None
+    backend=None
+    threads=1
+    reportFormat='text'
+    maxErrors=None
+    resultCache=None
+    serve=None
+    daemon=None
+    profile=None
     
     # set to environment variables
     if environ.has_key(udunitskey):
@@ -2482,7 +3021,7 @@ def getargs(arglist):
         areatypes=environ[areatypeskey]
 
     try:
-        (opts,args)=getopt(arglist[1:],'a:bchlnu:s:v:',['area_types=','badc','coards','help','uploader','noname','udunits=','cf_standard_names=','version='])
+        (opts,args)=getopt(arglist[1:],'a:bcf:hj:lmnt:u:s:v:',['area_types=','badc','coards','format=','help','jobs=','uploader','metadata-only','threads=','fail-fast','max-errors=','result-cache=','profile=','serve=','daemon=','backend=','noname','udunits=','cf_standard_names=','version='])
     except GetoptError:
         stderr.write('%s\n'%__doc__)
         exit(1)
@@ -2497,9 +3036,66 @@ def getargs(arglist):
         if a in ('-c','--coards'):
             coards="yes"
             continue
+        if a in ('-f','--format'):
+            reportFormat=v.strip()
+            if reportFormat not in FORMATS:
+                stderr.write('ERROR in command line: --format must be one of %s\n' % ', '.join(FORMATS))
+                exit(1)
+            continue
         if a in ('-h','--help'):
             print __doc__
             exit(0)
+        if a in ('-j','--jobs'):
+            try:
+                jobs=int(v)
+            except ValueError:
+                jobs=0
+            if jobs < 1:
+                stderr.write('ERROR in command line: --jobs must be a positive integer\n')
+                exit(1)
+            continue
+        if a in ('-t','--threads'):
+            try:
+                threads=int(v)
+            except ValueError:
+                threads=0
+            if threads < 1:
+                stderr.write('ERROR in command line: --threads must be a positive integer\n')
+                exit(1)
+            continue
+        if a in ('-m','--metadata-only'):
+            metadataOnly="yes"
+            continue
+        if a == '--fail-fast':
+            maxErrors=1
+            continue
+        if a == '--max-errors':
+            try:
+                maxErrors=int(v)
+            except ValueError:
+                maxErrors=0
+            if maxErrors < 1:
+                stderr.write('ERROR in command line: --max-errors must be a positive integer\n')
+                exit(1)
+            continue
+        if a == '--result-cache':
+            resultCache=v.strip()
+            continue
+        if a == '--profile':
+            profile=v.strip()
+            continue
+        if a == '--serve':
+            serve=v.strip()
+            continue
+        if a == '--daemon':
+            daemon=v.strip()
+            continue
+        if a == '--backend':
+            backend=v.strip()
+            if backend not in BACKENDS:
+                stderr.write('ERROR in command line: --backend must be one of %s\n' % ', '.join(BACKENDS))
+                exit(1)
+            continue
         if a in ('-l','--uploader'):
             uploader="yes"
             continue
@@ -2523,11 +3119,15 @@ def getargs(arglist):
                     version=Versions[-1]
             continue
             
-    if len(args) == 0:
+    if (len(args) == 0) != (serve is not None):
         stderr.write('ERROR in command line\n\nusage:\n%s\n'%__doc__)
         exit(1)
 
-    return (badc,coards,uploader,useFileName,standardname,areatypes,udunits,version,args)
+    if profile is not None and (serve is not None or daemon is not None):
+        stderr.write('ERROR in command line: --profile cannot be used with --serve or --daemon\n')
+        exit(1)
+
+    return (badc,coards,uploader,useFileName,standardname,areatypes,udunits,version,jobs,metadataOnly,backend,threads,reportFormat,maxErrors,resultCache,profile,serve,daemon,args)
 
 
 #--------------------------
@@ -2536,13 +3136,5 @@ def getargs(arglist):
 
 if __name__ == '__main__':
 
-    from sys import argv,exit
-
-    (badc,coards,uploader,useFileName,standardName,areaTypes,udunitsDat,version,files)=getargs(argv)
-    
-    inst = CFChecker(uploader=uploader, useFileName=useFileName, badc=badc, coards=coards, cfStandardNamesXML=standardName, cfAreaTypesXML=areaTypes, udunitsDat=udunitsDat, version=version)
-    for file in files:
-        rc = inst.checker(file)
-        exit (rc)
-
-
+    from cfchecker import cfchecks_main
+    cfchecks_main()
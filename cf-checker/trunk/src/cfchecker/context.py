@@ -0,0 +1,173 @@
+#-------------------------------------------------------------
+# Name: context.py
+#
+# The state of one run of the checker over one file.
+#
+# A CFChecker holds what is shared by every file it checks (the
+# options, the udunits system and the reference tables).  What
+# belongs to the file being checked - the open file and its
+# metadata, the CF version, the variable roles and the counts of
+# errors, warnings and information messages - is kept in a
+# RunContext instead.  The checker keeps the current context of
+# each thread in thread-local storage, so one checker with its
+# tables loaded can check several files at once from different
+# threads.
+#
+# The report of the file is emitted as records (see findings.py)
+# into its context, which passes them on to a reporter (see
+# reporters.py) BATCH_SIZE at a time.
+#
+# A context can be given an error limit, after which the check of
+# the file is abandoned by raising StopCheck; see
+# CFChecker.error().
+#
+# A context can also keep the records emitted, for the result
+# cache (see resultcache.py) and for reuse by later files with
+# the same header (see dedup.py).
+#-------------------------------------------------------------
+
+import copy
+
+from cfchecker.findings import ERROR, WARNING
+
+# Number of records handed to the reporter at once
+BATCH_SIZE = 256
+
+
+class StopCheck(Exception):
+    """Raised when the number of errors reported for a file reaches the
+    error limit of its context"""
+    pass
+
+
+class RunContext:
+    """The state of a check of one file.  See CFChecker.RUN_STATE for the
+    attributes of the checker that are kept here."""
+    def __init__(self, version=None, file=None, reporter=None):
+        self.file = file                 # Name of the file being checked
+        self.reporter = reporter         # Where the records go; None keeps them in records
+        self.records = []                # Records not yet handed to the reporter
+        self.variable = None             # The variable being checked, None between variables
+        self.kept = None                 # If a list, every record emitted is also kept here
+        self.template = None             # If a list, the records of the header checks are kept here
+        self.capture = None              # If a list, the records of the data check being run are kept here
+        self.readVars = None             # If a set, the variables whose data is read are added to it
+        self.headerFindings = None       # Findings of files with the same header (see dedup.py)
+        self.contentDigests = {}         # Digest of the data of each variable digested so far
+
+        self.version = version           # CF version the file is checked against
+        self.AttrList = None             # Valid attributes for that version
+
+        self.f = None                    # The file being checked
+        self.meta = None                 # Snapshot of its header
+        self.graph = None                # References between its variables
+        self.backend = None              # The backend it was opened with
+        self.headerOnly = 0
+
+        self.errorLimit = None           # Stop after this many errors; None for no limit
+        self.stopped = 0                 # Set if the check was stopped at the error limit
+        self.deferredChecks = None       # Data checks put off until the header checks are done
+
+        # Roles of the variables, set by _checker()
+        self.coordVars = frozenset()
+        self.auxCoordVars = frozenset()
+        self.boundsVars = frozenset()
+        self.climatologyVars = frozenset()
+        self.gridMappingVars = frozenset()
+        self.attachedVars = frozenset()
+        self.allCoordVars = frozenset()
+        self.axes = frozenset()
+
+        self.resetCounts()
+
+    def resetCounts(self):
+        """Zero the counts kept while checking a file"""
+        self.err = 0
+        self.warn = 0
+        self.info = 0
+        self.cf_roleCount = 0            # Number of occurences of the cf_role attribute in the file
+        self.raggedArrayFlag = 0         # Flag to indicate if file contains any ragged array representations
+        self.skippedChecks = {}          # Data checks skipped in metadata-only mode, and how often
+
+    def fork(self):
+        """Return a context for checking part of the same file, e.g. some of
+        its variables on another thread: it shares everything but the records
+        and counts"""
+        child = RunContext()
+        child.__dict__.update(self.__dict__)
+        child.reporter = None
+        child.records = []
+        child.kept = None
+        child.capture = None
+        child.readVars = None
+        child.resetCounts()
+        if self.deferredChecks is not None:
+            child.deferredChecks = []
+        if self.template is not None:
+            child.template = []
+        return child
+
+    def emit(self, record):
+        self.records.append(record)
+        if self.kept is not None:
+            self.kept.append(record)
+        if self.template is not None:
+            self.template.append(record)
+        if self.capture is not None:
+            self.capture.append(record)
+        if self.reporter is not None and len(self.records) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Hand the records emitted so far to the reporter"""
+        if self.reporter is not None and self.records:
+            records = self.records
+            self.records = []
+            self.reporter.write(records)
+
+    def merge(self, other):
+        """Add the records and counts of other, a fork of this context, to its own.
+
+        The findings are counted as they are added, so if the error limit is
+        reached StopCheck is raised at the same finding as it would have been
+        had the fork's checks been run in this context."""
+        # The fork kept its own template, without the records of its data checks
+        template = self.template
+        self.template = None
+        try:
+            for record in other.records:
+                self.emit(record)
+                if record.kind == 'finding' and record.counted:
+                    self.count(record.severity)
+        finally:
+            self.template = template
+        if template is not None:
+            template.extend(other.template)
+        self.cf_roleCount = self.cf_roleCount + other.cf_roleCount
+        self.raggedArrayFlag = self.raggedArrayFlag or other.raggedArrayFlag
+        for (checkName, count) in other.skippedChecks.items():
+            self.skippedChecks[checkName] = self.skippedChecks.get(checkName, 0) + count
+        if other.deferredChecks:
+            self.deferredChecks.extend(other.deferredChecks)
+
+    def reuse(self, record):
+        """Emit record, kept from the check of another file, as if it had been
+        emitted by this check"""
+        if hasattr(record, 'file'):
+            record = copy.copy(record)
+            record.file = self.file
+        self.emit(record)
+        if record.kind == 'finding' and record.counted:
+            self.count(record.severity)
+
+    def count(self, severity):
+        """Count a finding of severity, raising StopCheck if it is the error
+        that reaches the error limit"""
+        if severity == ERROR:
+            self.err = self.err + 1
+            if self.errorLimit and self.err >= self.errorLimit:
+                raise StopCheck()
+        elif severity == WARNING:
+            self.warn = self.warn + 1
+        else:
+            self.info = self.info + 1
@@ -0,0 +1,389 @@
+#-------------------------------------------------------------
+# Name: daemon.py
+#
+# A long-lived checker that checks files on request.
+#
+# Every cfchecks run pays for starting Python and loading udunits
+# and the reference tables before it looks at a file.  Run with
+# --serve, cfchecks does that once and then answers check
+# requests, one JSON object per line, on a Unix domain socket or
+# on its standard input:
+#
+#   {"id": 1, "path": "/data/file.nc", "version": "1.6",
+#    "options": {"metadataOnly": "yes", "maxErrors": 10}}
+#
+# Only path is needed.  version is a CF version or "auto", and
+# options may hold any of REQUEST_OPTIONS; what is not given is
+# as the daemon was started with.  The flags take "yes", "no" or
+# a boolean, maxErrors and threads an integer of at least 1, as
+# on the command line (null for maxErrors is no limit); a request
+# with any other value is refused.  The reply is the records of
+# the report (see findings.py), each a line of JSON as made by
+# findings.toDict(), followed by
+#
+#   {"record": "done", "id": 1, "rc": 2, "errors": 2, ...}
+#
+# which has an "error" message if the file could not be checked.
+#
+# On a socket the records are sent as the check goes on, and the
+# requests of each connection are answered in turn.  On standard
+# input the requests are answered on jobs threads, each reply
+# being written whole once it is ready, so replies may not come
+# in the order of the requests.  However many clients there are,
+# at most jobs files are checked at once.
+#
+# Run with --daemon, cfchecks is a client of a daemon: it sends
+# its files to the daemon and writes the replies as the report
+# it would have written itself.
+#-------------------------------------------------------------
+
+import os, sys, errno, signal, socket, threading, traceback, Queue, SocketServer
+from cStringIO import StringIO
+import json
+
+from cfchecker.cfchecks import CFChecker, Versions
+from cfchecker.findings import toDict, fromDict
+from cfchecker.reporters import Reporter, getReporter, TEXT
+from cfchecker.batch import printSummary, summaryCode
+from cfchecker import parallel
+
+# Options a request may set, as CFChecker keyword arguments
+REQUEST_OPTIONS = ('badc', 'coards', 'uploader', 'useFileName', 'metadataOnly', 'maxErrors', 'threads')
+
+# Options that are flags, set by "yes" or true and cleared by "no", false or
+# null, with the values CFChecker takes for each
+FLAG_OPTIONS = {'badc': ("yes", None),
+                'coards': ("yes", None),
+                'uploader': ("yes", None),
+                'metadataOnly': ("yes", None),
+                'useFileName': ("yes", "no")}
+
+# Address meaning standard input and output
+STDIO = '-'
+
+
+class WireReporter(Reporter):
+    """Writes every record as a line of JSON"""
+    def render(self, record, chunks):
+        chunks.append(json.dumps(toDict(record), sort_keys=True))
+        chunks.append("\n")
+
+
+class RequestError(Exception):
+    pass
+
+
+def _str(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def _option(name, value):
+    """The CFChecker keyword argument for the request option name set to
+    value; raises RequestError if the value is not valid for the option"""
+    if name not in REQUEST_OPTIONS:
+        raise RequestError("Unknown option: %s" % name)
+    if FLAG_OPTIONS.has_key(name):
+        (on, off) = FLAG_OPTIONS[name]
+        if value is True or value == "yes":
+            return on
+        if value is None or value is False or value == "no":
+            return off
+        raise RequestError("Option %s must be \"yes\", \"no\" or a boolean: %s" % (name, json.dumps(value)))
+    if value is None and name == 'maxErrors':
+        return None
+    # bool is a kind of int, but true is no number of errors or threads
+    if not isinstance(value, (int, long)) or isinstance(value, bool) or value < 1:
+        raise RequestError("Option %s must be an integer of at least 1: %s" % (name, json.dumps(value)))
+    return value
+
+
+def runChecker(checker, path, reporter):
+    """Check path, writing the report to reporter.  Returns (rc, errors,
+    warnings, info, error), error being why the check could not be done, or
+    None.  As batch.runChecker(), a check that could not be done counts as
+    one error."""
+    error = None
+    try:
+        rc = checker.checker(path, reporter=reporter)
+    except SystemExit, e:
+        if e.code is None or isinstance(e.code, int):
+            rc = e.code or 0
+        else:
+            error = str(e.code)
+            rc = 1
+    except KeyboardInterrupt:
+        raise
+    except:
+        error = "".join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()
+        rc = 1
+
+    err = checker.err
+    if rc > 0 and not err:
+        err = 1
+    return (rc, err, checker.warn, checker.info, error)
+
+
+class Daemon:
+    """Answers requests with checkers that share the reference data of a
+    CFChecker made with kwargs, one checker for each set of options"""
+    def __init__(self, jobs=1, **kwargs):
+        self.jobs = jobs
+        self.kwargs = kwargs
+        self.base = CFChecker(**kwargs)
+        self.base.setUp()
+        self.base.setUpAreaTypes()
+        self.checkers = {}
+        self.lock = threading.Lock()
+        self.slots = threading.Semaphore(jobs)   # Held while checking a file
+
+    def close(self):
+        self.base.close()
+
+    def checkerFor(self, request):
+        """The path of request and the checker to check it with; raises
+        RequestError if the request is not valid"""
+        path = request.get('path')
+        if not isinstance(path, basestring) or not path:
+            raise RequestError("Request has no path")
+
+        kwargs = dict(self.kwargs)
+        version = request.get('version')
+        if version == 'auto':
+            kwargs['version'] = 0.0
+        elif version is not None:
+            try:
+                kwargs['version'] = float(version)
+            except (TypeError, ValueError):
+                kwargs['version'] = None
+            if kwargs['version'] not in Versions:
+                raise RequestError("Unknown CF version: %s" % version)
+
+        options = request.get('options') or {}
+        if not isinstance(options, dict):
+            raise RequestError("Request options must be an object")
+        for (name, value) in options.items():
+            kwargs[str(name)] = _option(name, value)
+        kwargs['dedup'] = 1
+
+        key = kwargs.items()
+        key.sort()
+        key = tuple(key)
+        self.lock.acquire()
+        try:
+            if not self.checkers.has_key(key):
+                self.checkers[key] = self.base.sharing(**kwargs)
+            return (_str(path), self.checkers[key])
+        finally:
+            self.lock.release()
+
+    def answer(self, line, stream):
+        """Answer the request line, writing the reply to stream"""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            self.done(stream, None, (1, 1, 0, 0, "Request is not a JSON object"))
+            return
+        try:
+            (path, checker) = self.checkerFor(request)
+        except RequestError, e:
+            self.done(stream, request.get('id'), (1, 1, 0, 0, str(e)))
+            return
+
+        self.slots.acquire()
+        try:
+            result = runChecker(checker, path, WireReporter(stream))
+        finally:
+            self.slots.release()
+        self.done(stream, request.get('id'), result)
+
+    def done(self, stream, id, result):
+        (rc, err, warn, info, error) = result
+        reply = {'record': 'done', 'id': id, 'rc': rc,
+                 'errors': err, 'warnings': warn, 'information': info}
+        if error is not None:
+            reply['error'] = error
+        stream.write(json.dumps(reply, sort_keys=True) + "\n")
+        stream.flush()
+
+    #-----------------------------------
+    # Standard input and output
+    #-----------------------------------
+    def serveStream(self, input, output):
+        """Answer the requests read from input until it ends"""
+        requests = Queue.Queue(self.jobs)
+        lock = threading.Lock()
+
+        def work():
+            while 1:
+                line = requests.get()
+                if line is None:
+                    return
+                reply = StringIO()
+                self.answer(line, reply)
+                lock.acquire()
+                try:
+                    output.write(reply.getvalue())
+                    output.flush()
+                finally:
+                    lock.release()
+
+        workers = []
+        for i in range(self.jobs):
+            worker = threading.Thread(target=work)
+            worker.setDaemon(1)
+            worker.start()
+            workers.append(worker)
+
+        for line in iter(input.readline, ''):
+            if line.strip():
+                requests.put(line)
+        for worker in workers:
+            requests.put(None)
+        for worker in workers:
+            worker.join()
+
+    #-----------------------------------
+    # Unix domain socket
+    #-----------------------------------
+    def serveSocket(self, address):
+        """Answer the requests of clients connecting to the Unix domain
+        socket address until interrupted"""
+        if os.path.exists(address):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(address)
+            except socket.error:
+                # Left behind by a daemon that is no longer running
+                os.unlink(address)
+            else:
+                probe.close()
+                raise RequestError("A daemon is already serving on %s" % address)
+
+        server = _Server(address, _Handler)
+        server.daemon = self
+        try:
+            # Only the owner may have files checked as the owner
+            os.chmod(address, 0600)
+            server.serve_forever()
+        finally:
+            server.server_close()
+            try:
+                os.unlink(address)
+            except OSError:
+                pass
+
+
+class _Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        try:
+            for line in iter(self.rfile.readline, ''):
+                if line.strip():
+                    self.server.daemon.answer(line, self.wfile)
+        except socket.error, e:
+            if e.args[0] not in (errno.EPIPE, errno.ECONNRESET):
+                raise
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+#-----------------------------------
+def serve(address, jobs=1, **kwargs):
+#-----------------------------------
+    """Serve check requests on the Unix domain socket address, or on
+    standard input and output if address is STDIO, checking at most jobs
+    files at once, until interrupted or terminated.  kwargs are passed on to
+    CFChecker and give the defaults of the requests.  Returns the exit code."""
+    signal.signal(signal.SIGTERM, _terminate)
+    # Anything printed other than a reply must not get mixed up with them
+    output = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        daemon = Daemon(jobs, **kwargs)
+        try:
+            if address == STDIO:
+                daemon.serveStream(sys.stdin, output)
+            else:
+                daemon.serveSocket(address)
+        finally:
+            daemon.close()
+    except KeyboardInterrupt:
+        pass
+    except RequestError, e:
+        sys.stderr.write("%s\n" % e)
+        return 1
+    finally:
+        sys.stdout = output
+    return 0
+
+
+#-----------------------------------
+def checkFilesRemote(address, files, jobs=1, reportFormat=TEXT, version=Versions[-1], **options):
+#-----------------------------------
+    """Check files with the daemon serving on the Unix domain socket
+    address, writing the report and returning the return code as
+    batch.checkFiles() would.  jobs files are sent to the daemon at once;
+    options are REQUEST_OPTIONS.
+
+    The files are sent with their absolute paths, which are the names the
+    report gives them."""
+    if version == 0.0:
+        version = 'auto'
+    else:
+        version = str(version)
+    local = threading.local()
+    sockets = []
+
+    def check(index):
+        if not hasattr(local, 'files'):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(address)
+            sockets.append(sock)
+            local.files = (sock.makefile('rb'), sock.makefile('wb', 0))
+        (input, output) = local.files
+        output.write(json.dumps({'id': index, 'path': os.path.abspath(files[index]),
+                                 'version': version, 'options': options}) + "\n")
+        records = []
+        for line in iter(input.readline, ''):
+            reply = json.loads(line)
+            if reply['record'] == 'done':
+                return (records, reply)
+            records.append(fromDict(reply))
+        raise socket.error(errno.ECONNRESET, "Connection closed by the daemon")
+
+    reporter = getReporter(reportFormat)
+    if reportFormat == TEXT:
+        out = sys.stdout
+    else:
+        out = sys.stderr
+    results = []
+    sys.stdout.write(reporter.header)
+    try:
+        for (index, (records, reply), output) in parallel.mapOrdered(check, range(len(files)), jobs):
+            reporter.write(records)
+            if reply.has_key('error'):
+                print >>out, reply['error']
+            results.append((reply['rc'], reply['errors'], reply['warnings'], reply['information']))
+    except socket.error, e:
+        sys.stdout.write(reporter.footer)
+        sys.stderr.write("Cannot check files with the daemon on %s: %s\n" % (address, e.args[-1]))
+        return 1
+    finally:
+        for sock in sockets:
+            sock.close()
+    sys.stdout.write(reporter.footer)
+
+    if len(files) == 1:
+        return summaryCode(results)
+    if reportFormat == TEXT:
+        return printSummary(files, results)
+    return summaryCode(results)
@@ -0,0 +1,100 @@
+#-------------------------------------------------------------
+# Name: dedup.py
+#
+# Reuse of findings between files with the same header.
+#
+# The files of an archive are often alike in all but their data:
+# a model run writes thousands of files whose headers differ at
+# most in the values of the time coordinate.  Every check but the
+# data checks (see DATA_CHECKS in cfchecks.py) looks only at the
+# header, which CFChecker reads into a FileMetadata snapshot.  Two
+# files whose snapshots have the same digest therefore get the
+# same findings from those checks.
+#
+# When a batch is checked, the records of the first file with a
+# given header are kept as a template, each data check being
+# replaced by a DataCheck slot.  A later file with the same header
+# replays the template, running only the data checks.  Those are
+# in turn reused when the variables they read have the same
+# contents as when they were last run, so a file that repeats an
+# earlier one costs little more than digesting its coordinates.
+#
+# The report is the same as that of a full check.
+#-------------------------------------------------------------
+
+import threading
+
+# Number of headers whose findings are kept
+MAX_HEADERS = 32
+
+# Number of results kept for each data check of a header
+MAX_DATA_RESULTS = 8
+
+
+class DataCheck:
+    """Slot in a template for the data check checkName, called with args
+    while checking variable (None for the checks of the file as a whole)"""
+    kind = 'dataCheck'
+    def __init__(self, variable, checkName, args):
+        self.variable = variable
+        self.checkName = checkName
+        self.args = args
+
+
+class HeaderFindings:
+    """What has been found in the files with one header: the template of
+    their records and the results of their data checks"""
+    def __init__(self, template):
+        self.template = template
+        self.dataResults = {}          # (checkName, args) -> [(reads, records, rc), ...]
+        self.lock = threading.Lock()
+
+    def results(self, checkName, args):
+        """The results kept for data check checkName called with args: a list
+        of (reads, records, rc), where reads lists the (name, content digest)
+        of each variable the check read"""
+        self.lock.acquire()
+        try:
+            return list(self.dataResults.get((checkName, args), ()))
+        finally:
+            self.lock.release()
+
+    def addResult(self, checkName, args, result):
+        self.lock.acquire()
+        try:
+            results = self.dataResults.setdefault((checkName, args), [])
+            results.insert(0, result)
+            del results[MAX_DATA_RESULTS:]
+        finally:
+            self.lock.release()
+
+
+class HeaderMemo:
+    """The HeaderFindings of the last MAX_HEADERS headers met, by key"""
+    def __init__(self):
+        self.entries = {}
+        self.order = []                # Keys, least recently used first
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        self.lock.acquire()
+        try:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.order.remove(key)
+                self.order.append(key)
+            return entry
+        finally:
+            self.lock.release()
+
+    def put(self, key, entry):
+        self.lock.acquire()
+        try:
+            if self.entries.has_key(key):
+                self.order.remove(key)
+            self.entries[key] = entry
+            self.order.append(key)
+            while len(self.order) > MAX_HEADERS:
+                del self.entries[self.order.pop(0)]
+        finally:
+            self.lock.release()
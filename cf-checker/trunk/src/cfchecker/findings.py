@@ -0,0 +1,135 @@
+#-------------------------------------------------------------
+# Name: findings.py
+#
+# The records a check of a file produces.
+#
+# Rather than printing, the checker emits a stream of records
+# into the RunContext of the file (see context.py), which hands
+# them in batches to a reporter (see reporters.py):
+#
+#   FileStart      a file is about to be checked
+#   VariableStart  the checks of a variable are about to run
+#   Finding        an ERROR, WARNING or INFO message
+#   Text           any other line of the plain text report
+#   FileEnd        the check of a file is over, with its counts
+#
+# The text report is made of the Text and Finding records only;
+# the structured reports use the rest.
+#
+# toDict() and fromDict() convert records to and from plain
+# dictionaries, for sending them elsewhere (see daemon.py).
+#-------------------------------------------------------------
+
+ERROR = 'ERROR'
+WARNING = 'WARNING'
+INFO = 'INFO'
+SEVERITIES = (ERROR, WARNING, INFO)
+
+
+def joinItems(items):
+    """Join items with single blanks, as the print statement does"""
+    words = []
+    for item in items:
+        if isinstance(item, basestring):
+            words.append(item)
+        else:
+            words.append(str(item))
+    return " ".join(words)
+
+
+class FileStart:
+    kind = 'fileStart'
+    def __init__(self, file):
+        self.file = file
+
+
+class VariableStart:
+    kind = 'variableStart'
+    def __init__(self, file, variable):
+        self.file = file
+        self.variable = variable
+
+
+class Finding:
+    """severity is one of SEVERITIES; section the section of the CF
+    conventions the finding refers to (e.g. '7.1'), or None; variable the
+    variable being checked, None for the checks of the file as a whole.
+    counted is 0 for the few findings left out of the file's counts.  line
+    is the finding's line in the text report where that is not the usual
+    one made by text(), for the odd message whose wording older reports had
+    and scripts may look for."""
+    kind = 'finding'
+    line = None          # For findings pickled before there was a line
+    def __init__(self, severity, section, message, file=None, variable=None, counted=1, line=None):
+        self.severity = severity
+        self.section = section
+        self.message = message
+        self.file = file
+        self.variable = variable
+        self.counted = counted
+        self.line = line
+
+    def __repr__(self):
+        return "<Finding %s>" % self.text()
+
+    def label(self):
+        if self.section:
+            return "%s (%s)" % (self.severity, self.section)
+        return self.severity
+
+    def text(self):
+        """The finding as it appears in the text report"""
+        if self.line is not None:
+            return self.line
+        return "%s: %s" % (self.label(), self.message)
+
+
+class Text:
+    kind = 'text'
+    def __init__(self, text):
+        self.text = text
+
+
+class FileEnd:
+    """completed is 0 if the check was abandoned (the file could not be
+    opened, or a check raised an exception); stopped is 1 if it was cut
+    short on reaching the maximum number of errors"""
+    kind = 'fileEnd'
+    def __init__(self, file, err, warn, info, completed=1, stopped=0):
+        self.file = file
+        self.err = err
+        self.warn = warn
+        self.info = info
+        self.completed = completed
+        self.stopped = stopped
+
+
+def toDict(record):
+    """record as a dictionary of plain values, e.g. to send as JSON"""
+    d = dict(record.__dict__)
+    d['record'] = record.kind
+    return d
+
+
+def _str(value):
+    # JSON gives back unicode; the reporters expect str
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def fromDict(d):
+    """The record made by toDict(); raises KeyError if d is not one"""
+    kind = d['record']
+    if kind == Text.kind:
+        return Text(_str(d['text']))
+    if kind == Finding.kind:
+        return Finding(_str(d['severity']), _str(d['section']), _str(d['message']),
+                       _str(d['file']), _str(d['variable']), d['counted'], _str(d.get('line')))
+    if kind == VariableStart.kind:
+        return VariableStart(_str(d['file']), _str(d['variable']))
+    if kind == FileStart.kind:
+        return FileStart(_str(d['file']))
+    if kind == FileEnd.kind:
+        return FileEnd(_str(d['file']), d['err'], d['warn'], d['info'], d['completed'], d['stopped'])
+    raise KeyError(kind)
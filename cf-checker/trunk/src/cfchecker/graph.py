@@ -0,0 +1,165 @@
+#-------------------------------------------------------------
+# Name: graph.py
+#
+# The references between the variables of a file.
+#
+# Variables refer to one another by name through the attributes
+# coordinates, bounds, climatology, grid_mapping, cell_measures,
+# formula_terms and ancillary_variables.  The attribute strings
+# are split once, when the graph is built from the metadata
+# snapshot (see metadata.py), into directed edges from the
+# variable holding the attribute to each variable it names.
+#
+# The graph only parses; it does not judge the syntax of the
+# attributes, which is left to the checks.
+#-------------------------------------------------------------
+
+# Attributes holding a blank separated list of variable names
+LIST_ATTRIBUTES = ('coordinates', 'ancillary_variables')
+
+# Attributes holding a single variable name
+NAME_ATTRIBUTES = ('bounds', 'climatology', 'grid_mapping')
+
+# Attributes holding "label: name" pairs
+#   cell_measures   measure: variable [measure: variable ...]
+#   formula_terms   term: variable [term: variable ...]
+PAIR_ATTRIBUTES = ('cell_measures', 'formula_terms')
+
+REFERENCE_ATTRIBUTES = LIST_ATTRIBUTES + NAME_ATTRIBUTES + PAIR_ATTRIBUTES
+
+
+class Reference:
+    """An edge of the graph: source names target in its attribute.  label is
+    the measure or term the target is given for (cell_measures and
+    formula_terms only), without its colon."""
+    def __init__(self, source, attribute, target, label=None):
+        self.source = source
+        self.attribute = attribute
+        self.target = target
+        self.label = label
+
+    def __repr__(self):
+        return "%s -%s-> %s" % (self.source, self.attribute, self.target)
+
+
+def _parse(source, attribute, value):
+    if attribute in NAME_ATTRIBUTES:
+        return [Reference(source, attribute, value)]
+
+    words = value.split()
+    if attribute in LIST_ATTRIBUTES:
+        return [Reference(source, attribute, word) for word in words]
+
+    references = []
+    if attribute == 'cell_measures':
+        # Measures and variables alternate; a trailing measure is ignored
+        for i in range(0, len(words)-1, 2):
+            references.append(Reference(source, attribute, words[i+1], words[i].replace(':', '')))
+    else:
+        # formula_terms: each variable belongs to the term before it
+        term = None
+        for word in words:
+            if word.endswith(':'):
+                term = word.replace(':', '')
+            else:
+                references.append(Reference(source, attribute, word, term))
+    return references
+
+
+class VariableGraph:
+    """The references between the variables described by meta (a
+    FileMetadata), built in one pass over their attributes."""
+    def __init__(self, meta):
+        self.names = frozenset(meta.names)
+        self.outgoing = {}         # source -> {attribute: [Reference, ...]}
+        self.incoming = {}         # target -> [Reference, ...]
+
+        for source in meta.names:
+            attributes = meta[source].attributes
+            for attribute in REFERENCE_ATTRIBUTES:
+                value = attributes.get(attribute)
+                if not isinstance(value, basestring):
+                    continue
+                references = _parse(source, attribute, value)
+                self.outgoing.setdefault(source, {})[attribute] = references
+                for reference in references:
+                    self.incoming.setdefault(reference.target, []).append(reference)
+
+    def edges(self, source, attribute=None):
+        """The references made by source, through attribute or all of them"""
+        outgoing = self.outgoing.get(source, {})
+        if attribute is not None:
+            return outgoing.get(attribute, [])
+        edges = []
+        for attribute in REFERENCE_ATTRIBUTES:
+            edges.extend(outgoing.get(attribute, []))
+        return edges
+
+    def references(self, source, attribute):
+        """The names source gives in attribute, in order"""
+        return [reference.target for reference in self.edges(source, attribute)]
+
+    def reference(self, source, attribute):
+        """The single name source gives in attribute (bounds, climatology or
+        grid_mapping), or None"""
+        edges = self.edges(source, attribute)
+        if edges:
+            return edges[0].target
+        return None
+
+    def labelledReferences(self, source, attribute):
+        """(label, name) pairs given by source in cell_measures or formula_terms"""
+        return [(reference.label, reference.target) for reference in self.edges(source, attribute)]
+
+    def referrers(self, target, attribute=None):
+        """The variables that refer to target, through attribute or any"""
+        return [reference.source for reference in self.incoming.get(target, [])
+                if attribute is None or reference.attribute == attribute]
+
+    def dangling(self, attribute=None):
+        """References to variables that are not in the file"""
+        dangling = []
+        for source in self.outgoing.keys():
+            for reference in self.edges(source, attribute):
+                if reference.target not in self.names:
+                    dangling.append(reference)
+        return dangling
+
+    def cycles(self):
+        """Return the cycles of the graph, each as the list of References
+        leading from a variable back to itself.  A formula_terms reference
+        to its own variable (sigma: lev on lev) is required by CF and is
+        not a cycle."""
+        def follow(source):
+            return [reference for reference in self.edges(source)
+                    if reference.target in self.names and
+                    not (reference.attribute == 'formula_terms' and reference.target == source)]
+
+        cycles = []
+        done = {}                  # Variables whose descendants have all been explored
+        for start in sorted(self.outgoing.keys()):
+            if done.has_key(start):
+                continue
+            # Iterative depth first search; path holds the References from
+            # start to the current variable, onPath their sources
+            path = []
+            onPath = {start: 0}
+            stack = [(start, iter(follow(start)))]
+            while stack:
+                (source, edges) = stack[-1]
+                for reference in edges:
+                    target = reference.target
+                    if onPath.has_key(target):
+                        cycles.append(path[onPath[target]:] + [reference])
+                    elif not done.has_key(target):
+                        path.append(reference)
+                        onPath[target] = len(path)
+                        stack.append((target, iter(follow(target))))
+                        break
+                else:
+                    stack.pop()
+                    del onPath[source]
+                    done[source] = 1
+                    if path:
+                        path.pop()
+        return cycles
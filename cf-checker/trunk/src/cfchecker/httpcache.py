@@ -0,0 +1,109 @@
+#-------------------------------------------------------------
+# Name: httpcache.py
+#
+# On-disk cache for reference tables given as URLs.
+#
+# A table is downloaded once and kept under the checker cache
+# directory together with its ETag and Last-Modified headers.
+# Later runs send a conditional request (If-None-Match /
+# If-Modified-Since) and only download the table again when the
+# server says it has changed.  If the server cannot be reached
+# the cached copy is used.
+#
+# urllib2 is only imported when a table is fetched, as it takes
+# longer to import than the rest of the checker's start-up.
+#-------------------------------------------------------------
+
+import os, sys, re, errno
+import hashlib
+import json
+
+TIMEOUT = 30         # seconds
+
+
+def isURL(source):
+    return re.match(r'^(https?|ftp)://', source) is not None
+
+
+def _cachePaths(url, cacheDir):
+    key = hashlib.sha1(url).hexdigest()
+    base = os.path.join(cacheDir, 'http', key)
+    return (base + '.xml', base + '.json')
+
+
+def _readMeta(metaPath):
+    try:
+        return json.load(open(metaPath))
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _writeAtomic(path, data):
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    out = open(tmp, 'wb')
+    try:
+        out.write(data)
+    finally:
+        out.close()
+    os.rename(tmp, path)
+
+
+def fetch(url, cacheDir, timeout=TIMEOUT):
+    """Return (path, data): path is that of an up to date local copy of url,
+    or None if the copy could not be written to cacheDir, in which case data
+    holds what was downloaded (it is None otherwise).
+
+    The copy is revalidated against the server on every call using the
+    ETag/Last-Modified headers of the previous response.  When the server is
+    unreachable (or returns an error) a previously cached copy is returned
+    with a warning on stderr; with no cached copy the error is raised."""
+    import socket, urllib2
+    (dataPath, metaPath) = _cachePaths(url, cacheDir)
+    meta = _readMeta(metaPath)
+    if meta is None or not os.path.isfile(dataPath):
+        meta = None
+
+    request = urllib2.Request(url)
+    if meta:
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+
+    try:
+        response = urllib2.urlopen(request, timeout=timeout)
+        try:
+            data = response.read()
+            headers = response.info()
+        finally:
+            response.close()
+    except urllib2.HTTPError, e:
+        if e.code == 304 and meta:
+            # Not modified
+            return (dataPath, None)
+        return _fallback(url, dataPath, meta, e)
+    except (urllib2.URLError, socket.error, IOError), e:
+        return _fallback(url, dataPath, meta, e)
+
+    try:
+        try:
+            os.makedirs(os.path.dirname(dataPath))
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+        _writeAtomic(dataPath, data)
+        _writeAtomic(metaPath, json.dumps({'url': url,
+                                           'etag': headers.getheader('ETag'),
+                                           'last_modified': headers.getheader('Last-Modified')}))
+    except (IOError, OSError):
+        # Cache directory not writable; hand back what was downloaded
+        return (None, data)
+
+    return (dataPath, None)
+
+
+def _fallback(url, dataPath, meta, e):
+    if meta:
+        sys.stderr.write("WARNING: Could not retrieve %s (%s); using cached copy\n" % (url, e))
+        return (dataPath, None)
+    raise e
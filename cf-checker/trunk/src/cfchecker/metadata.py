@@ -0,0 +1,131 @@
+#-------------------------------------------------------------
+# Name: metadata.py
+#
+# Snapshot of the header of the file being checked.
+#
+# The dimensions, variables and attributes of a file are read
+# from the backend (see backends.py) in a single pass when the
+# file is opened.  The checks then look everything up in the
+# snapshot, so the backend is asked for each piece of metadata
+# only once however many checks use it.  Only variable data is
+# still read through the backend, by CFChecker.getValues().
+#-------------------------------------------------------------
+
+import hashlib
+import numpy
+
+
+def _digestValue(sha, value):
+    """Add an attribute value (a string or an array) to sha"""
+    if isinstance(value, basestring):
+        sha.update('s%d:' % len(value))
+        sha.update(value)
+    else:
+        value = numpy.asarray(value)
+        sha.update('a%s%r:' % (value.dtype.str, value.shape))
+        sha.update(numpy.ascontiguousarray(value).tostring())
+
+
+def _digestAttributes(sha, attributes):
+    names = attributes.keys()
+    names.sort()
+    sha.update('%d:' % len(names))
+    for name in names:
+        _digestValue(sha, name)
+        _digestValue(sha, attributes[name])
+
+
+class VariableMetadata:
+    """The header information of one variable.
+
+    Offers the parts of the cdms2 FileVariable/FileAxis interface used by
+    the checks (id, attributes, shape, dtype, typecode(), getAxisIds(),
+    getAxisIndex(), isTime() and attributes as python attributes)."""
+    def __init__(self, obj, isAxis):
+        self.id = obj.id
+        self.attributes = dict(obj.attributes)
+        self.shape = tuple(obj.shape)
+        self.dtype = obj.dtype
+        self.isAxis = isAxis               # Coordinate variable recognised by the backend
+        if isAxis:
+            # cdms2 axes have no getAxisIds(); see CRM #011
+            self.dimensions = tuple(obj._obj_.dimensions)
+            self._typecode = obj.typecode()
+            self._isTime = obj.isTime()
+        else:
+            self.dimensions = tuple(obj.getAxisIds())
+            self._typecode = obj.dtype.char
+            self._isTime = 0
+
+    def __getattr__(self, name):
+        # As cdms2, the netCDF attributes are also python attributes
+        try:
+            return self.__dict__['attributes'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def typecode(self):
+        return self._typecode
+
+    def getAxisIds(self):
+        return list(self.dimensions)
+
+    def getAxisIndex(self, name):
+        if name in self.dimensions:
+            return self.dimensions.index(name)
+        return -1
+
+    def isTime(self):
+        return self._isTime
+
+    def addToDigest(self, sha):
+        sha.update(repr((self.id, self.shape, self.dtype.str, self.isAxis, self.dimensions,
+                         self._typecode, self._isTime)))
+        _digestAttributes(sha, self.attributes)
+
+
+class FileMetadata:
+    """The header information of a file, read through backend.
+
+    names          all the variables, in the order the backend lists them
+    variables      VariableMetadata for each variable, by name
+    dataVariables  the names of the variables that are not coordinate
+                   variables (cdms2's CdmsFile.variables)
+    axes           the names of the dimensions (cdms2's CdmsFile.axes)
+    dimensions     the length of each dimension
+    attributes     the global attributes"""
+    def __init__(self, f, backend):
+        self.attributes = dict(f.attributes)
+        self.dataVariables = frozenset(f.variables.keys())
+        self.axes = frozenset(f.axes.keys())
+
+        self.dimensions = {}
+        for name in self.axes:
+            self.dimensions[name] = len(f.axes[name])
+
+        self.names = f._file_.variables.keys()
+        self.variables = {}
+        for name in self.names:
+            obj = f[name]
+            self.variables[name] = VariableMetadata(obj, backend.isAxis(obj))
+
+    def digest(self):
+        """sha1 (hex) of everything in the snapshot; two files have the same
+        digest if their headers say the same thing"""
+        sha = hashlib.sha1()
+        dimensions = self.dimensions.items()
+        dimensions.sort()
+        sha.update(repr((dimensions, sorted(self.dataVariables), sorted(self.axes), self.names)))
+        _digestAttributes(sha, self.attributes)
+        for name in self.names:
+            self.variables[name].addToDigest(sha)
+        return sha.hexdigest()
+
+    def __getitem__(self, name):
+        """The metadata of variable name, or None if there is no such variable"""
+        return self.variables.get(name)
+
+    def has_key(self, name):
+        return self.variables.has_key(name)
+
+    __contains__ = has_key
@@ -0,0 +1,269 @@
+#-------------------------------------------------------------
+# Name: netcdf3.py
+#
+# Pure Python reader for netCDF files in the classic, 64-bit
+# offset and CDF-5 (64-bit data) formats.
+#
+# The file is mmap'd and only its header is decoded when it is
+# opened.  Variable data is returned as NumPy arrays that are
+# views onto the mapping, so no data is copied and nothing is
+# read from disk until the values are actually used.
+#
+# Format reference: "The NetCDF Classic Format Specification"
+# and "CDF-5 file format specification" (Unidata / PnetCDF).
+#-------------------------------------------------------------
+
+import os, mmap, struct
+import numpy
+
+MAGIC = 'CDF'
+
+CLASSIC = 1
+OFFSET64 = 2
+DATA64 = 5
+FORMATS = {CLASSIC: 'classic', OFFSET64: '64bit_offset', DATA64: 'cdf5'}
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+# nc_type -> numpy type (netCDF data is big-endian)
+TYPES = {1: 'b',            # NC_BYTE
+         2: 'c',            # NC_CHAR
+         3: '>i2',          # NC_SHORT
+         4: '>i4',          # NC_INT
+         5: '>f4',          # NC_FLOAT
+         6: '>f8',          # NC_DOUBLE
+         7: 'B',            # NC_UBYTE   (CDF-5 only)
+         8: '>u2',          # NC_USHORT  (CDF-5 only)
+         9: '>u4',          # NC_UINT    (CDF-5 only)
+         10: '>i8',         # NC_INT64   (CDF-5 only)
+         11: '>u8'}         # NC_UINT64  (CDF-5 only)
+
+
+def formatVersion(path):
+    """Return the format version byte (1, 2 or 5) of the netCDF file path,
+    or None if it is not a classic format netCDF file."""
+    try:
+        f = open(path, 'rb')
+        try:
+            magic = f.read(4)
+        finally:
+            f.close()
+    except (IOError, OSError):
+        return None
+    if len(magic) == 4 and magic[:3] == MAGIC and FORMATS.has_key(ord(magic[3])):
+        return ord(magic[3])
+    return None
+
+
+def _pad(n):
+    return (n + 3) & ~3
+
+
+class _HeaderReader:
+    """Cursor over the header of a mapped netCDF file"""
+    def __init__(self, mm, version):
+        self.mm = mm
+        self.pos = 4
+        if version == DATA64:
+            self.nonNegFormat = '>q'
+        else:
+            self.nonNegFormat = '>i'
+        if version == CLASSIC:
+            self.offsetFormat = '>i'
+        else:
+            self.offsetFormat = '>q'
+
+    def _unpack(self, format):
+        size = struct.calcsize(format)
+        if self.pos + size > len(self.mm):
+            raise ValueError("Truncated netCDF header")
+        value = struct.unpack_from(format, self.mm, self.pos)[0]
+        self.pos = self.pos + size
+        return value
+
+    def int(self):
+        return self._unpack('>i')
+
+    def nonNeg(self):
+        return self._unpack(self.nonNegFormat)
+
+    def offset(self):
+        return self._unpack(self.offsetFormat)
+
+    def bytes(self, n):
+        if self.pos + n > len(self.mm):
+            raise ValueError("Truncated netCDF header")
+        value = self.mm[self.pos:self.pos+n]
+        self.pos = self.pos + _pad(n)
+        return value
+
+    def name(self):
+        return self.bytes(self.nonNeg())
+
+    def list(self, tag, readItem):
+        """Read a dim_list, gatt_list/vatt_list or var_list"""
+        listTag = self.int()
+        n = self.nonNeg()
+        if listTag == 0 and n == 0:
+            # ABSENT
+            return []
+        if listTag != tag:
+            raise ValueError("Corrupt netCDF header (expected tag %d, found %d)" % (tag, listTag))
+        return [readItem() for i in xrange(n)]
+
+    def attribute(self):
+        name = self.name()
+        ncType = self.int()
+        n = self.nonNeg()
+        if not TYPES.has_key(ncType):
+            raise ValueError("Unknown type %d for attribute %s" % (ncType, name))
+        dtype = numpy.dtype(TYPES[ncType])
+        data = self.bytes(n * dtype.itemsize)
+        if ncType == 2:
+            # Character attributes are strings; trailing NULs are padding
+            return (name, data.rstrip('\0'))
+        values = numpy.fromstring(data, dtype)
+        return (name, values.astype(dtype.newbyteorder('=')))
+
+    def attributes(self):
+        return dict(self.list(NC_ATTRIBUTE, self.attribute))
+
+
+class Variable:
+    """A variable of a netCDF file.  name, dimensions (a tuple of dimension
+    names), shape, dtype and attributes describe it; data() returns its values."""
+    def __init__(self, dataset, name, dimensions, attributes, ncType, vsize, begin):
+        self.dataset = dataset
+        self.name = name
+        self.dimensions = dimensions
+        self.attributes = attributes
+        self.dtype = numpy.dtype(TYPES[ncType])
+        self.vsize = vsize
+        self.begin = begin
+        self.isRecord = len(dimensions) > 0 and dimensions[0] == dataset.unlimited
+        self.shape = tuple([dataset.dimensions[d] for d in dimensions])
+
+    def typecode(self):
+        return self.dtype.char
+
+    def data(self):
+        """Return the values as a read-only array viewing the mapped file"""
+        return self.dataset.view(self)
+
+
+class Dataset:
+    """Header of a classic, 64-bit offset or CDF-5 netCDF file.
+
+    dimensions maps dimension names to their lengths (the current number of
+    records for the unlimited dimension), variables maps names to Variable
+    instances and attributes holds the global attributes.  Character
+    attributes are strings and numeric ones 1-D arrays, as with cdms."""
+    def __init__(self, path):
+        self.path = path
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if os.fstat(fd).st_size < 8:
+                raise ValueError("Not a netCDF file: %s" % path)
+            self.mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic = self.mm[:4]
+        if magic[:3] != MAGIC or not FORMATS.has_key(ord(magic[3])):
+            raise ValueError("Not a classic format netCDF file: %s" % path)
+        self.version = ord(magic[3])
+        self.format = FORMATS[self.version]
+
+        header = _HeaderReader(self.mm, self.version)
+        numrecs = header.nonNeg()
+
+        dimensions = header.list(NC_DIMENSION, lambda: (header.name(), header.nonNeg()))
+        self.dimensionNames = [d[0] for d in dimensions]
+        self.dimensions = {}
+        self.unlimited = None
+        for (name, length) in dimensions:
+            if length == 0:
+                self.unlimited = name
+            self.dimensions[name] = length
+
+        self.attributes = header.attributes()
+
+        def variable():
+            name = header.name()
+            dimids = [header.nonNeg() for i in xrange(header.nonNeg())]
+            attributes = header.attributes()
+            ncType = header.int()
+            vsize = header.nonNeg()
+            begin = header.offset()
+            if not TYPES.has_key(ncType):
+                raise ValueError("Unknown type %d for variable %s" % (ncType, name))
+            return (name, tuple([self.dimensionNames[i] for i in dimids]), attributes, ncType, vsize, begin)
+        variables = header.list(NC_VARIABLE, variable)
+        self.headerSize = header.pos
+
+        self.variableNames = [v[0] for v in variables]
+        self.variables = {}
+        for v in variables:
+            self.variables[v[0]] = Variable(self, *v)
+
+        self.recsize = self._recordSize()
+        if self.unlimited is not None:
+            if numrecs == -1:
+                # STREAMING: the number of records was not written
+                numrecs = self._countRecords()
+            self.dimensions[self.unlimited] = numrecs
+            for var in self.variables.values():
+                var.shape = tuple([self.dimensions[d] for d in var.dimensions])
+
+    def _recordVariables(self):
+        return [v for v in self.variables.values() if v.isRecord]
+
+    def _recordSize(self):
+        # Worked out from the shapes rather than summing vsize, which
+        # saturates for record variables of more than 4GiB per record
+        records = self._recordVariables()
+        sizes = [int(numpy.prod(v.shape[1:])) * v.dtype.itemsize for v in records]
+        if len(records) == 1:
+            # A single record variable is not padded
+            return sizes[0]
+        return sum([_pad(size) for size in sizes])
+
+    def _countRecords(self):
+        records = self._recordVariables()
+        if not records or not self.recsize:
+            return 0
+        begin = min([v.begin for v in records])
+        return max(0, (len(self.mm) - begin) // self.recsize)
+
+    def view(self, var):
+        """Return the values of var as an array viewing the mapped file"""
+        if self.mm is None:
+            raise ValueError("I/O operation on closed file: %s" % self.path)
+        shape = tuple([self.dimensions[d] for d in var.dimensions])
+        count = int(numpy.prod(shape))
+        if count == 0:
+            return numpy.empty(shape, var.dtype)
+
+        itemStrides = []
+        stride = var.dtype.itemsize
+        for n in reversed(shape):
+            itemStrides.insert(0, stride)
+            stride = stride * n
+
+        if var.isRecord:
+            strides = (self.recsize,) + tuple(itemStrides[1:])
+            end = var.begin + (shape[0]-1)*self.recsize + itemStrides[0]
+        else:
+            strides = tuple(itemStrides)
+            end = var.begin + count*var.dtype.itemsize
+        if end > len(self.mm):
+            raise ValueError("Data of %s extends beyond the end of %s" % (var.name, self.path))
+
+        return numpy.ndarray(shape, var.dtype, buffer=self.mm, offset=var.begin, strides=strides)
+
+    def close(self):
+        # The mapping is released when the last array viewing it is freed;
+        # unmapping it now would leave those arrays pointing at nothing.
+        self.mm = None
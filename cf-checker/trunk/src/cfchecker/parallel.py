@@ -0,0 +1,198 @@
+#-------------------------------------------------------------
+# Name: parallel.py
+#
+# Checking the variables of one file on a pool of threads.
+#
+# The checks print their findings as they go.  While the pool
+# is running sys.stdout is replaced by a ThreadOutput, which
+# gives each worker thread a buffer of its own; the buffer
+# filled while checking a variable is handed back with its
+# result, and results are returned in the order the variables
+# were given, so the report is the same as a serial run's.
+#
+# Several pools may run at once (one checker checking files on
+# several threads, each with a pool for its variables); they
+# share one ThreadOutput, installed by the first pool to start
+# and removed by the last to finish.
+#
+# Background runs a single call on a thread of its own, e.g. to
+# load the reference tables while a file is being opened.
+#-------------------------------------------------------------
+
+import sys, threading
+from cStringIO import StringIO
+
+
+class ThreadOutput:
+    """Stands in for stream (usually sys.stdout).  What a thread writes
+    between capture() and release() is kept for that thread; anything
+    else goes straight to stream.  The print statement's softspace flag
+    is kept per thread too, so concurrent prints cannot disturb each
+    other's spacing."""
+    def __init__(self, stream):
+        self.__dict__['stream'] = stream
+        self.__dict__['local'] = threading.local()
+
+    def __getattr__(self, name):
+        if name == 'softspace':
+            return getattr(self.__dict__['local'], 'softspace', 0)
+        return getattr(self.__dict__['stream'], name)
+
+    def __setattr__(self, name, value):
+        if name == 'softspace':
+            self.local.softspace = value
+        else:
+            self.__dict__[name] = value
+
+    def capture(self):
+        self.local.buffer = StringIO()
+
+    def release(self):
+        """Stop capturing this thread's output and return it"""
+        text = self.local.buffer.getvalue()
+        self.local.buffer = None
+        self.local.softspace = 0
+        return text
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            self.stream.write(text)
+        else:
+            buffer.write(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+
+_installLock = threading.Lock()
+_installed = [None, 0, 0]        # The ThreadOutput in sys.stdout, the number of pools using it
+                                 # and whether it was put there by installOutput()
+
+def installOutput():
+    """Make sys.stdout a ThreadOutput, if it is not already, and return it"""
+    _installLock.acquire()
+    try:
+        if _installed[1] == 0:
+            if isinstance(sys.stdout, ThreadOutput):
+                _installed[0] = sys.stdout
+                _installed[2] = 0
+            else:
+                _installed[0] = sys.stdout = ThreadOutput(sys.stdout)
+                _installed[2] = 1
+        _installed[1] = _installed[1] + 1
+        return _installed[0]
+    finally:
+        _installLock.release()
+
+def removeOutput():
+    """Undo installOutput()"""
+    _installLock.acquire()
+    try:
+        _installed[1] = _installed[1] - 1
+        if _installed[1] == 0:
+            if _installed[2] and sys.stdout is _installed[0]:
+                sys.stdout = _installed[0].stream
+            _installed[0] = None
+    finally:
+        _installLock.release()
+
+
+def mapOrdered(function, items, threads):
+    """Call function(item) for each of items on a pool of threads worker
+    threads, yielding (item, result, output) in the order of items, where
+    output is what the call printed.  An exception raised by a call is
+    raised again here when its turn comes, after which no more calls are
+    started."""
+    items = list(items)
+    results = {}                 # index -> (result, output, exc_info)
+    state = {'next': 0, 'stop': 0}
+    lock = threading.Lock()
+    done = threading.Condition(lock)
+
+    def work():
+        while 1:
+            lock.acquire()
+            try:
+                index = state['next']
+                if state['stop'] or index >= len(items):
+                    return
+                state['next'] = index + 1
+            finally:
+                lock.release()
+
+            output.capture()
+            try:
+                result = (function(items[index]), None)
+            except:
+                result = (None, sys.exc_info())
+            text = output.release()
+
+            done.acquire()
+            try:
+                results[index] = (result[0], text, result[1])
+                done.notifyAll()
+            finally:
+                done.release()
+
+    workers = []
+    for i in range(min(threads, len(items))):
+        worker = threading.Thread(target=work)
+        worker.setDaemon(1)
+        workers.append(worker)
+
+    output = installOutput()
+    try:
+        for worker in workers:
+            worker.start()
+
+        for index in range(len(items)):
+            done.acquire()
+            try:
+                while not results.has_key(index):
+                    done.wait()
+                (result, text, excInfo) = results.pop(index)
+            finally:
+                done.release()
+
+            if excInfo is not None:
+                output.write(text)
+                raise excInfo[0], excInfo[1], excInfo[2]
+            yield (items[index], result, text)
+    finally:
+        lock.acquire()
+        state['stop'] = 1
+        lock.release()
+        for worker in workers:
+            if worker.isAlive():
+                worker.join()
+        removeOutput()
+
+
+class Background:
+    """Calls function() on a thread of its own.  result() waits for the call
+    to finish and returns what it returned, or raises what it raised."""
+    def __init__(self, function):
+        self.function = function
+        self.outcome = None          # (result, exc_info)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.setDaemon(1)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.outcome = (self.function(), None)
+        except:
+            self.outcome = (None, sys.exc_info())
+
+    def result(self):
+        self.thread.join()
+        (result, excInfo) = self.outcome
+        if excInfo is not None:
+            raise excInfo[0], excInfo[1], excInfo[2]
+        return result
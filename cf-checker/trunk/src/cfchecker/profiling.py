@@ -0,0 +1,257 @@
+#-------------------------------------------------------------
+# Name: profiling.py
+#
+# Where the time of a check goes.
+#
+# With --profile the checker records, for each check and each
+# variable it was run on, the number of calls, the wall time
+# spent in it, the bytes of variable data it read and, if the
+# tracemalloc module is available, the peak memory it allocated.
+# The checks recorded are the rules run on each variable (see
+# rules.py), the data checks (see DATA_CHECKS in cfchecks.py) and
+# the checks of the file as a whole, whose variable is None;
+# opening a file and reading its header is recorded as openFile.
+#
+# A check run from within another (a rule running a data check)
+# is charged for its own time and reads, which are not charged
+# to the check that ran it, so the times of all the checks add up
+# to the time spent checking.  The peak memory of a check does
+# include that of the checks it ran.  Memory is traced for the
+# whole process, by clearing the traces each time a check starts
+# or ends, so with --threads it includes what other threads
+# allocated meanwhile, and memory freed after being handed from
+# one check to the one that ran it is not seen to be freed.
+#
+# When profiling is off CFChecker.profile is None and the checks
+# pay for nothing more than testing it.
+#-------------------------------------------------------------
+
+import sys, time, threading
+
+# Name under which data read outside any check is recorded
+OUTSIDE = '(outside checks)'
+
+# Number of rows in each table of the text report
+TOP = 20
+
+
+class _Frame:
+    """A check being run"""
+    def __init__(self, check, variable):
+        self.check = check
+        self.variable = variable
+        self.start = 0.0
+        self.childTime = 0.0         # Time taken by the checks it ran
+        self.bytesRead = 0
+        self.allocated = 0           # Bytes allocated since it started, up to the last clearing of the traces
+        self.peak = 0
+
+
+class Profile:
+    """What the checks of one or more files cost.  entries maps (check,
+    variable) to [calls, seconds, bytes read, peak bytes allocated].  A
+    Profile may be shared by checkers, and by threads."""
+    def __init__(self, traceMemory=1):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()   # The stack of checks being run by each thread
+        self.open = []                   # The frames of every thread, while memory is traced
+        self.tracemalloc = None
+        if traceMemory:
+            try:
+                import tracemalloc
+            except ImportError:
+                pass
+            else:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                self.tracemalloc = tracemalloc
+
+    def stack(self):
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = []
+            return self.local.stack
+
+    #-----------------------------------
+    # Recording
+    #-----------------------------------
+    def call(self, check, variable, function, args):
+        """Return function(*args), recorded as a call of check on variable"""
+        frame = _Frame(check, variable)
+        stack = self.stack()
+        if self.tracemalloc is not None:
+            self.lock.acquire()
+            try:
+                self.foldMemory()
+                self.open.append(frame)
+            finally:
+                self.lock.release()
+        stack.append(frame)
+        frame.start = time.time()
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.time() - frame.start
+            stack.pop()
+            if stack:
+                stack[-1].childTime = stack[-1].childTime + elapsed
+            self.lock.acquire()
+            try:
+                if self.tracemalloc is not None:
+                    self.foldMemory()
+                    self.open.remove(frame)
+                self.record(check, variable, 1, elapsed - frame.childTime, frame.bytesRead, frame.peak)
+            finally:
+                self.lock.release()
+
+    def read(self, nbytes):
+        """Charge nbytes of variable data read to the check being run"""
+        stack = self.stack()
+        if stack:
+            stack[-1].bytesRead = stack[-1].bytesRead + nbytes
+        else:
+            self.lock.acquire()
+            try:
+                self.record(OUTSIDE, None, 0, 0.0, nbytes, 0)
+            finally:
+                self.lock.release()
+
+    def foldMemory(self):
+        """Add the memory traced since the last call to the frames open, and
+        start tracing afresh.  Called with the lock held."""
+        (current, peak) = self.tracemalloc.get_traced_memory()
+        for frame in self.open:
+            frame.peak = max(frame.peak, frame.allocated + peak)
+            frame.allocated = frame.allocated + current
+        self.tracemalloc.clear_traces()
+
+    def record(self, check, variable, calls, seconds, bytesRead, peak):
+        """Add to the entry of (check, variable).  Called with the lock held."""
+        entry = self.entries.get((check, variable))
+        if entry is None:
+            self.entries[(check, variable)] = [calls, seconds, bytesRead, peak]
+        else:
+            entry[0] = entry[0] + calls
+            entry[1] = entry[1] + seconds
+            entry[2] = entry[2] + bytesRead
+            entry[3] = max(entry[3], peak)
+
+    def take(self):
+        """Return the entries recorded so far as a list of (check, variable,
+        calls, seconds, bytes read, peak), and forget them; for handing them to
+        another process, which add()s them to its own"""
+        self.lock.acquire()
+        try:
+            entries = [key + tuple(value) for (key, value) in self.entries.items()]
+            self.entries = {}
+            return entries
+        finally:
+            self.lock.release()
+
+    def add(self, entries):
+        """Add entries, as returned by take()"""
+        self.lock.acquire()
+        try:
+            for entry in entries:
+                self.record(*entry)
+        finally:
+            self.lock.release()
+
+    #-----------------------------------
+    # Reporting
+    #-----------------------------------
+    def totals(self, by):
+        """The entries summed by check (by=0) or by variable (by=1), as a list
+        of (name, calls, seconds, bytes read, peak) by decreasing time"""
+        totals = {}
+        for (key, (calls, seconds, bytesRead, peak)) in self.entries.items():
+            total = totals.setdefault(key[by], [0, 0.0, 0, 0])
+            total[0] = total[0] + calls
+            total[1] = total[1] + seconds
+            total[2] = total[2] + bytesRead
+            total[3] = max(total[3], peak)
+        rows = [(name,) + tuple(total) for (name, total) in totals.items()]
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return rows
+
+    def rows(self):
+        """Every entry, as (check, variable, calls, seconds, bytes read, peak),
+        by decreasing time"""
+        rows = [key + tuple(value) for (key, value) in self.entries.items()]
+        rows.sort(key=lambda row: (-row[3], row[0], row[1]))
+        return rows
+
+    def printReport(self, stream=None):
+        """Write the time, reads and memory of the checks as tables sorted by
+        time: by check, by variable and by both, the last two cut at TOP rows"""
+        if stream is None:
+            stream = sys.stderr
+        byCheck = self.totals(0)
+        seconds = 0.0
+        bytesRead = 0
+        for row in byCheck:
+            seconds = seconds + row[2]
+            bytesRead = bytesRead + row[3]
+
+        lines = ["", "PROFILE", "======="]
+        lines.append("Time in checks: %.3f s, variable data read: %s" % (seconds, _size(bytesRead)))
+        if self.tracemalloc is None:
+            lines.append("(peak memory is not recorded: the tracemalloc module is not available)")
+        self.table(lines, "By check", ("check",), byCheck)
+        byVariable = [(_variable(row[0]),) + row[1:] for row in self.totals(1)]
+        self.table(lines, "By variable", ("variable",), byVariable[:TOP])
+        both = [(row[0], _variable(row[1])) + row[2:] for row in self.rows()]
+        self.table(lines, "By check and variable", ("check", "variable"), both[:TOP])
+        stream.write("\n".join(lines) + "\n")
+
+    def table(self, lines, title, names, rows):
+        widths = [max([len(names[i])] + [len(row[i]) for row in rows]) for i in range(len(names))]
+        lines.append("")
+        lines.append(title + ":")
+        heading = "  ".join([names[i].ljust(widths[i]) for i in range(len(names))])
+        lines.append("  " + heading + "  %7s  %10s  %11s  %11s" % ("calls", "time (s)", "data read", "peak memory"))
+        for row in rows:
+            n = len(names)
+            (calls, seconds, bytesRead, peak) = row[n:]
+            if self.tracemalloc is None:
+                peak = "-"
+            else:
+                peak = _size(peak)
+            label = "  ".join([row[i].ljust(widths[i]) for i in range(n)])
+            lines.append("  " + label + "  %7d  %10.4f  %11s  %11s" % (calls, seconds, _size(bytesRead), peak))
+
+    def writeJSON(self, path):
+        """Write the entries to the file path as JSON, sorted by time"""
+        import json
+        entries = []
+        for (check, variable, calls, seconds, bytesRead, peak) in self.rows():
+            entry = {'check': check, 'variable': variable, 'calls': calls,
+                     'seconds': seconds, 'bytesRead': bytesRead}
+            if self.tracemalloc is not None:
+                entry['peakMemory'] = peak
+            entries.append(entry)
+        f = open(path, 'w')
+        try:
+            json.dump({'memoryTraced': self.tracemalloc is not None, 'entries': entries},
+                      f, indent=1, sort_keys=True)
+            f.write("\n")
+        finally:
+            f.close()
+
+
+def _variable(name):
+    if name is None:
+        return "(file)"
+    return name
+
+
+def _size(nbytes):
+    for unit in ('B', 'KiB', 'MiB'):
+        if nbytes < 1024:
+            if unit == 'B':
+                return "%d B" % nbytes
+            return "%.1f %s" % (nbytes, unit)
+        nbytes = nbytes / 1024.0
+    return "%.1f GiB" % nbytes
@@ -0,0 +1,159 @@
+#-------------------------------------------------------------
+# Name: reporters.py
+#
+# Writing the records of a check (see findings.py) as a report.
+#
+#   text   the checker's traditional report
+#   jsonl  one JSON object per finding, and one per file
+#          summarising it (and whether its check was stopped at
+#          the maximum number of errors)
+#   junit  JUnit XML: a testsuite per file, a testcase per
+#          variable plus one for the file as a whole; each
+#          ERROR is a failure
+#
+# Records reach a reporter in batches and each batch is written
+# with a single write, so a report does not cost a system call
+# per line.  A reporter may be shared by several threads; the
+# batches of a file all come from the thread checking it.
+#-------------------------------------------------------------
+
+import sys, threading
+
+from cfchecker.findings import ERROR
+
+TEXT = 'text'
+JSONL = 'jsonl'
+JUNIT = 'junit'
+FORMATS = (TEXT, JSONL, JUNIT)
+
+
+class Reporter:
+    """Base class: render() turns a record into text to write.
+
+    header and footer are written once, around the reports of all the
+    files checked in a run, by whoever drives the run (see batch.py)."""
+    header = ""
+    footer = ""
+
+    def __init__(self, stream=None):
+        self.stream = stream           # None means sys.stdout at the time of writing
+        self.lock = threading.Lock()
+
+    def write(self, records):
+        chunks = []
+        for record in records:
+            self.render(record, chunks)
+        if not chunks:
+            return
+        self.lock.acquire()
+        try:
+            (self.stream or sys.stdout).write("".join(chunks))
+        finally:
+            self.lock.release()
+
+    def render(self, record, chunks):
+        raise NotImplementedError
+
+
+class TextReporter(Reporter):
+    def render(self, record, chunks):
+        if record.kind == 'text':
+            chunks.append(record.text)
+            chunks.append("\n")
+        elif record.kind == 'finding':
+            chunks.append(record.text())
+            chunks.append("\n")
+
+
+class JsonLinesReporter(Reporter):
+    def render(self, record, chunks):
+        import json
+        if record.kind == 'finding':
+            chunks.append(json.dumps({'record': 'finding',
+                                      'file': record.file,
+                                      'variable': record.variable,
+                                      'severity': record.severity,
+                                      'section': record.section,
+                                      'message': record.message}, sort_keys=True))
+            chunks.append("\n")
+        elif record.kind == 'fileEnd':
+            chunks.append(json.dumps({'record': 'summary',
+                                      'file': record.file,
+                                      'errors': record.err,
+                                      'warnings': record.warn,
+                                      'information': record.info,
+                                      'completed': bool(record.completed),
+                                      'stopped': bool(record.stopped)}, sort_keys=True))
+            chunks.append("\n")
+
+
+class JUnitReporter(Reporter):
+    """Keeps the records of a file until its FileEnd, then writes its
+    testsuite"""
+    header = '<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n'
+    footer = '</testsuites>\n'
+
+    GLOBAL = '(global attributes)'     # Name of the testcase for the file as a whole
+
+    def __init__(self, stream=None):
+        Reporter.__init__(self, stream)
+        self.local = threading.local()   # The file being checked by each thread
+
+    def render(self, record, chunks):
+        if record.kind == 'fileStart':
+            self.local.order = [self.GLOBAL]
+            self.local.cases = {self.GLOBAL: []}
+        elif record.kind == 'variableStart':
+            self.testcase(record.variable)
+        elif record.kind == 'finding':
+            self.testcase(record.variable or self.GLOBAL).append(record)
+        elif record.kind == 'fileEnd':
+            self.renderSuite(record, chunks)
+            self.local.order = None
+            self.local.cases = None
+
+    def testcase(self, name):
+        """The findings of testcase name of the current file"""
+        if not self.local.cases.has_key(name):
+            self.local.order.append(name)
+            self.local.cases[name] = []
+        return self.local.cases[name]
+
+    def renderSuite(self, end, chunks):
+        # Imported here as it pulls in urllib, which the other formats do not need
+        from xml.sax.saxutils import escape, quoteattr
+        failures = 0
+        for name in self.local.order:
+            for finding in self.local.cases[name]:
+                if finding.severity == ERROR:
+                    failures = failures + 1
+        incomplete = not end.completed
+        chunks.append('  <testsuite name=%s tests="%d" failures="%d" errors="%d">\n'
+                      % (quoteattr(end.file), len(self.local.order) + incomplete, failures, incomplete))
+        for name in self.local.order:
+            chunks.append('    <testcase classname=%s name=%s>\n' % (quoteattr(end.file), quoteattr(name)))
+            other = []
+            for finding in self.local.cases[name]:
+                if finding.severity == ERROR:
+                    chunks.append('      <failure type=%s message=%s/>\n'
+                                  % (quoteattr(finding.label()), quoteattr(finding.message)))
+                else:
+                    other.append(finding.text())
+            if other:
+                chunks.append('      <system-out>%s</system-out>\n' % escape("\n".join(other)))
+            chunks.append('    </testcase>\n')
+        if incomplete:
+            chunks.append('    <testcase classname=%s name="(check)">\n' % quoteattr(end.file))
+            chunks.append('      <error message="The check of this file did not complete"/>\n')
+            chunks.append('    </testcase>\n')
+        chunks.append('  </testsuite>\n')
+
+
+REPORTERS = {TEXT: TextReporter, JSONL: JsonLinesReporter, JUNIT: JUnitReporter}
+
+def getReporter(format, stream=None):
+    """Return a new reporter for format, one of FORMATS"""
+    try:
+        return REPORTERS[format](stream)
+    except KeyError:
+        raise ValueError("Unknown report format: %s (choose from %s)" % (format, ", ".join(FORMATS)))
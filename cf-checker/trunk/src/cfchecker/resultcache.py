@@ -0,0 +1,153 @@
+#-------------------------------------------------------------
+# Name: resultcache.py
+#
+# On-disk store of the reports of files already checked, so
+# that re-checking an archive in which little has changed only
+# checks the files that have.
+#
+# The store is an SQLite database with one row per file, keyed
+# by its absolute path.  A row is reused when the file still
+# has the same size, modification time and header digest, and
+# the check would be made the same way: same checker version,
+# CF version, standard name table version and options.  The row
+# holds the records of the report (see findings.py), which are
+# replayed through the reporter of the run, so a cached report
+# can be written in any format.
+#
+# Each file is committed as soon as it has been checked, so a
+# run that is interrupted resumes where it stopped.  Several
+# processes can share a store; SQLite serialises their writes.
+#-------------------------------------------------------------
+
+import os, threading, hashlib, sqlite3
+import cPickle as pickle
+
+from cfchecker import netcdf3
+
+# Bump when the rows or the records they hold change shape
+SCHEMA_VERSION = 1
+
+# Leading bytes digested for files that are not in a classic netCDF format
+HEADER_BYTES = 65536
+
+# Seconds to wait for another process to finish writing
+TIMEOUT = 60
+
+
+def headerDigest(path):
+    """sha1 of the header of the netCDF file path.  For the classic formats
+    that is exactly the header (which includes the number of records); for
+    others it is the first HEADER_BYTES bytes, size and modification time
+    standing guard over the rest."""
+    if netcdf3.formatVersion(path):
+        try:
+            dataset = netcdf3.Dataset(path)
+        except ValueError:
+            pass
+        else:
+            try:
+                return hashlib.sha1(dataset.mm[:dataset.headerSize]).hexdigest()
+            finally:
+                dataset.close()
+    f = open(path, 'rb')
+    try:
+        return hashlib.sha1(f.read(HEADER_BYTES)).hexdigest()
+    finally:
+        f.close()
+
+
+class CachedResult:
+    """The report of a file as stored: its return code, counts and records"""
+    def __init__(self, rc, err, warn, info, records):
+        self.rc = rc
+        self.err = err
+        self.warn = warn
+        self.info = info
+        self.records = records
+
+
+class FileKey:
+    """The state of a file as it is about to be checked, so that a report
+    is stored against the file as it was when its check began"""
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.abspath(name)
+        st = os.stat(self.path)
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.digest = headerDigest(self.path)
+
+
+class ResultCache:
+    """The store in the SQLite database path.  Each thread gets its own
+    connection, so a checker checking files on several threads can share one
+    ResultCache."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        db = self.connection()
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            db.execute("DROP TABLE IF EXISTS results")
+            db.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+        db.execute("""CREATE TABLE IF NOT EXISTS results (
+                          path TEXT PRIMARY KEY,
+                          name TEXT, size INTEGER, mtime REAL, digest TEXT,
+                          checker TEXT, cfVersion TEXT, tables TEXT, options TEXT,
+                          rc INTEGER, err INTEGER, warn INTEGER, info INTEGER,
+                          records BLOB)""")
+        db.commit()
+
+    def connection(self):
+        try:
+            return self.local.db
+        except AttributeError:
+            db = sqlite3.connect(self.path, timeout=TIMEOUT)
+            db.text_factory = str
+            try:
+                # Readers need not wait for a writer
+                db.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.Error:
+                pass
+            self.local.db = db
+            return db
+
+    def close(self):
+        """Close the connection of the calling thread"""
+        db = getattr(self.local, 'db', None)
+        if db is not None:
+            db.close()
+            del self.local.db
+
+    def key(self, name):
+        """The FileKey of file name, or None if it cannot be read"""
+        try:
+            return FileKey(name)
+        except (IOError, OSError):
+            return None
+
+    def get(self, key, settings):
+        """The CachedResult stored for the file of key (a FileKey), or None if
+        there is none or the file has changed since.  settings is a (checker
+        version, CF version, table versions, options) tuple of strings
+        describing how the file would be checked."""
+        row = self.connection().execute(
+            """SELECT name, size, mtime, digest, checker, cfVersion, tables, options,
+                      rc, err, warn, info, records FROM results WHERE path = ?""",
+            (key.path,)).fetchone()
+        if row is None or tuple(row[0:4]) != (key.name, key.size, key.mtime, key.digest) or \
+           tuple(row[4:8]) != tuple(settings):
+            return None
+        return CachedResult(row[8], row[9], row[10], row[11], pickle.loads(str(row[12])))
+
+    def put(self, key, settings, result):
+        """Store result (a CachedResult) for the file of key; see get()"""
+        db = self.connection()
+        db.execute("INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                   (key.path, key.name, key.size, key.mtime, key.digest) + tuple(settings) +
+                   (result.rc, result.err, result.warn, result.info,
+                    sqlite3.Binary(pickle.dumps(result.records, pickle.HIGHEST_PROTOCOL))))
+        db.commit()
@@ -0,0 +1,123 @@
+#-------------------------------------------------------------
+# Name: rules.py
+#
+# Registry of the per-variable checks.
+#
+# Most checks only have something to say about a variable that
+# carries a particular attribute (cell_methods, compress,
+# flag_meanings, ...).  Each check is registered as a Rule naming
+# the attributes that trigger it, the roles a variable must play
+# for it to apply and the CF versions it belongs to.  A Plan is
+# built once per CF version and, for each variable, gives the
+# rules the variable can trigger, in registration order, so a
+# file with many variables does not call every check on every
+# variable only for most of them to return straight away.
+#-------------------------------------------------------------
+
+# Variable roles
+AXIS = 'axis'                  # Named after one of the file's dimensions
+NON_AXIS = 'nonAxis'           # Not named after a dimension
+COORDINATE = 'coordinate'      # Coordinate variable
+GRID_MAPPING = 'gridMapping'   # Named by a grid_mapping attribute
+
+
+class Rule:
+    """A per-variable check, run as checker.method(varName, *args).
+
+    triggers     attributes any one of which makes the rule apply, or
+                 None if it applies whatever the attributes
+    roles        roles any one of which the variable must play, or None
+    minVersion   first CF version the rule applies to
+    maxVersion   CF version from which the rule no longer applies, or None
+    args         names of checker attributes passed after varName
+    perAttribute if set the rule is run once for each attribute of the
+                 variable, as checker.method(attribute, varName, *args)
+    readsData    set if the check reads variable data; it is then run
+                 through checker.dataCheck(), which may skip it or put it
+                 off until the header checks are done"""
+    def __init__(self, method, triggers=None, roles=None, minVersion=1.0, maxVersion=None,
+                 args=(), perAttribute=0, readsData=0):
+        self.method = method
+        if triggers is not None:
+            triggers = frozenset(triggers)
+        self.triggers = triggers
+        if roles is not None:
+            roles = frozenset(roles)
+        self.roles = roles
+        self.minVersion = minVersion
+        self.maxVersion = maxVersion
+        self.args = args
+        self.perAttribute = perAttribute
+        self.readsData = readsData
+
+    def __repr__(self):
+        return "<Rule %s>" % self.method
+
+    def appliesToVersion(self, version):
+        if version < self.minVersion:
+            return 0
+        return self.maxVersion is None or version < self.maxVersion
+
+    def run(self, checker, varName, attributes):
+        """Run the rule on varName (whose attribute names are attributes);
+        return 0 if any call reported a failure"""
+        args = [getattr(checker, name) for name in self.args]
+        if self.readsData:
+            return checker.dataCheck(self.method, varName, *args)
+        method = getattr(checker, self.method)
+        rc = 1
+        if self.perAttribute:
+            for attribute in attributes:
+                if not method(attribute, varName, *args): rc = 0
+        elif not method(varName, *args):
+            rc = 0
+        return rc
+
+
+class Plan:
+    """The rules of a registry that apply to one CF version.
+
+    The rules a variable triggers depend only on which trigger
+    attributes it has and on its roles, so the selection is
+    remembered for each such combination."""
+    def __init__(self, rules, version):
+        self.version = version
+        self.rules = [rule for rule in rules if rule.appliesToVersion(version)]
+        self.triggers = frozenset()
+        for rule in self.rules:
+            if rule.triggers is not None:
+                self.triggers = self.triggers | rule.triggers
+        self.selections = {}
+
+    def select(self, attributes, roles):
+        """The rules triggered by a variable with the given attribute names
+        and roles (a frozenset), in registration order"""
+        key = (self.triggers.intersection(attributes), roles)
+        try:
+            return self.selections[key]
+        except KeyError:
+            pass
+        (present, roles) = key
+        selection = [rule for rule in self.rules
+                     if (rule.triggers is None or rule.triggers & present) and
+                     (rule.roles is None or rule.roles & roles)]
+        self.selections[key] = selection
+        return selection
+
+
+class Registry:
+    """An ordered collection of Rules and the Plan built for each CF version"""
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self.plans = {}
+
+    def register(self, rule):
+        self.rules.append(rule)
+        self.plans = {}
+
+    def plan(self, version):
+        try:
+            return self.plans[version]
+        except KeyError:
+            self.plans[version] = Plan(self.rules, version)
+            return self.plans[version]
@@ -0,0 +1,279 @@
+#-------------------------------------------------------------
+# Name: tablecache.py
+#
+# Compiled, memory-mapped copies of the CF standard name and
+# area type tables.
+#
+# The xml tables are parsed once and written to a binary index
+# whose entries are sorted by name.  Subsequent runs simply mmap
+# the index, so loading costs a stat() and an mmap() rather than
+# a full SAX parse, and every process using the same index shares
+# a single read-only copy in the page cache.
+#
+# Index layout (all integers little-endian, unsigned 32 bit):
+#
+#   header   magic, sha1 of the source xml, number of entries,
+#            length of the metadata block
+#   metadata version_number '\0' last_modified
+#   records  one (key offset, key length, value offset, value length)
+#            tuple per entry, sorted by key
+#   blob     the key and value strings (utf-8) the records point into
+#-------------------------------------------------------------
+
+import os, re, mmap, struct, errno
+import hashlib
+
+from cfchecker import httpcache
+
+MAGIC = 'CFTBL001'
+HEADER = struct.Struct('<8s20sII')
+RECORD = struct.Struct('<IIII')
+
+CACHEDIRKEY = 'CF_CHECKER_CACHE'
+
+
+def defaultCacheDir():
+    """Directory holding compiled tables; $CF_CHECKER_CACHE or ~/.cfchecker/cache"""
+    if os.environ.has_key(CACHEDIRKEY):
+        return os.environ[CACHEDIRKEY]
+    return os.path.join(os.path.expanduser('~'), '.cfchecker', 'cache')
+
+
+def _utf8(s):
+    if isinstance(s, unicode):
+        return s.encode('utf-8')
+    return s
+
+
+class CompiledTable:
+    """Read-only view of a compiled table.
+
+       Behaves like the dictionary built by ConstructDict (and the list
+       built by ConstructList): membership tests and lookups are a binary
+       search over the mmap'd records, no entries are decoded up front.
+    """
+    def __init__(self, path):
+        self.path = path
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        if len(self.mm) < HEADER.size:
+            raise ValueError("Truncated table index: %s" % path)
+        (magic, self.sha1, self.count, metaLen) = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled CF table: %s" % path)
+
+        meta = self.mm[HEADER.size:HEADER.size+metaLen]
+        (self.version_number, self.last_modified) = meta.split('\0')
+        self.recordsOffset = HEADER.size + metaLen
+        self.blobOffset = self.recordsOffset + self.count*RECORD.size
+
+        # Compatibility with ConstructDict.dict / ConstructList.list
+        self.dict = self
+        self.list = self
+
+    def close(self):
+        self.mm.close()
+
+    def _record(self, i):
+        return RECORD.unpack_from(self.mm, self.recordsOffset + i*RECORD.size)
+
+    def _key(self, i):
+        (keyOff, keyLen, valOff, valLen) = self._record(i)
+        start = self.blobOffset + keyOff
+        return self.mm[start:start+keyLen]
+
+    def _value(self, i):
+        (keyOff, keyLen, valOff, valLen) = self._record(i)
+        start = self.blobOffset + valOff
+        return self.mm[start:start+valLen]
+
+    def _find(self, name):
+        """Binary search for name; return its record index or -1"""
+        name = _utf8(name)
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo+hi)//2
+            key = self._key(mid)
+            if key < name:
+                lo = mid+1
+            elif key > name:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return self._find(name) != -1
+
+    has_key = __contains__
+
+    def __getitem__(self, name):
+        i = self._find(name)
+        if i == -1:
+            raise KeyError(name)
+        return self._value(i)
+
+    def get(self, name, default=None):
+        i = self._find(name)
+        if i == -1:
+            return default
+        return self._value(i)
+
+    def __iter__(self):
+        for i in xrange(self.count):
+            yield self._key(i)
+
+    def keys(self):
+        return list(self)
+
+
+def writeTable(path, entries, version_number, last_modified, sha1):
+    """Write entries, a sequence of (name, value) pairs, to a compiled index at path.
+
+       The index is written to a temporary file and renamed into place so that
+       concurrent readers never see a partially written table.
+    """
+    entries = [(_utf8(k), _utf8(v)) for (k, v) in entries]
+    entries.sort()
+
+    blob = []
+    blobLen = 0
+    values = {}            # Canonical units are heavily repeated; store each once
+    records = []
+    for (key, value) in entries:
+        keyOff = blobLen
+        blob.append(key)
+        blobLen = blobLen + len(key)
+        if values.has_key(value):
+            valOff = values[value]
+        else:
+            valOff = blobLen
+            values[value] = valOff
+            blob.append(value)
+            blobLen = blobLen + len(value)
+        records.append(RECORD.pack(keyOff, len(key), valOff, len(value)))
+
+    meta = _utf8(version_number) + '\0' + _utf8(last_modified)
+
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    out = open(tmp, 'wb')
+    try:
+        out.write(HEADER.pack(MAGIC, sha1, len(entries), len(meta)))
+        out.write(meta)
+        out.write(''.join(records))
+        out.write(''.join(blob))
+    finally:
+        out.close()
+    os.rename(tmp, path)
+
+
+def _statKey(source):
+    # The full precision mtime and the inode, so that a table rewritten in
+    # place within the same second, or replaced by a rename, is recompiled
+    st = os.stat(source)
+    return hashlib.sha1('%s\0%d\0%d\0%d\0%r' % (os.path.abspath(source), st.st_dev, st.st_ino,
+                                                 st.st_size, st.st_mtime)).hexdigest()
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError, e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def loadTable(source, handlerClass, kind, cacheDir=None):
+    """Return the table held in the xml file source.
+
+       handlerClass is the SAX ContentHandler used to parse the xml (ConstructDict
+       or ConstructList) and kind names the table in the cache ('standard-name' or
+       'area-type').  Local files are compiled once into cacheDir, keyed by the
+       sha1 and version_number of the xml, and mmap'd thereafter.  A URL is first
+       fetched into the http cache (see httpcache.py).  Anything that cannot be
+       cached (an unwritable cache directory) is parsed directly, a URL from
+       the copy downloaded, and the ContentHandler returned as before.
+    """
+    if cacheDir is None:
+        cacheDir = defaultCacheDir()
+
+    if httpcache.isURL(source):
+        (local, data) = httpcache.fetch(source, cacheDir)
+        if local is None:
+            from cStringIO import StringIO
+            return parseTable(StringIO(data), handlerClass)
+        source = local
+
+    if not os.path.isfile(source):
+        return parseTable(source, handlerClass)
+
+    # Fast path: the source has not changed since it was last compiled, so the
+    # reference file written alongside the index still names it.
+    ref = os.path.join(cacheDir, '%s-%s.ref' % (kind, _statKey(source)))
+    try:
+        path = os.path.join(cacheDir, open(ref).read().strip())
+        return CompiledTable(path)
+    except (IOError, OSError, ValueError):
+        pass
+
+    data = open(source, 'rb').read()
+    sha1 = hashlib.sha1(data)
+    m = re.search(r'<version_number>\s*(\S+?)\s*</version_number>', data[:4096])
+    if m:
+        version = m.group(1)
+    else:
+        version = 'unknown'
+    name = '%s-v%s-%s.idx' % (kind, version, sha1.hexdigest())
+    path = os.path.join(cacheDir, name)
+
+    try:
+        table = CompiledTable(path)
+        if table.sha1 != sha1.digest():
+            table.close()
+            raise ValueError("Stale table index: %s" % path)
+    except (IOError, OSError, ValueError):
+        handler = parseTable(source, handlerClass)
+        if hasattr(handler, 'dict'):
+            entries = handler.dict.items()
+        else:
+            entries = [(id, '') for id in handler.list]
+        try:
+            _makedirs(cacheDir)
+            # A table without version_number or last_modified elements gets empty ones
+            writeTable(path, entries, getattr(handler, 'version_number', ''),
+                       getattr(handler, 'last_modified', ''), sha1.digest())
+            table = CompiledTable(path)
+        except (IOError, OSError):
+            # Can't write to the cache; carry on with the parsed table
+            return handler
+
+    try:
+        tmp = '%s.%d.tmp' % (ref, os.getpid())
+        open(tmp, 'w').write(name)
+        os.rename(tmp, ref)
+    except (IOError, OSError):
+        pass
+
+    return table
+
+
+def parseTable(source, handlerClass):
+    """Parse the xml table source (a path, URL or file object) with a new
+    handlerClass instance"""
+    from xml.sax import make_parser
+    from xml.sax.handler import feature_namespaces
+
+    parser = make_parser()
+    parser.setFeature(feature_namespaces, 0)
+    handler = handlerClass()
+    parser.setContentHandler(handler)
+    parser.parse(source)
+    return handler
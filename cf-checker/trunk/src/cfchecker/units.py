@@ -0,0 +1,158 @@
+#-------------------------------------------------------------
+# Name: units.py
+#
+# Access to the UDUNITS-2 library through ctypes.
+#
+# Every function used is declared with its argument and result
+# types, so unit and system pointers are never truncated to a C
+# int on 64-bit platforms.  A UnitSystem parses each distinct
+# unit string once and remembers which pairs of units are
+# convertible; the parsed units are freed when the system is
+# closed.
+#
+# The udunits2 parser is not reentrant, so a UnitSystem makes
+# its calls into the library one at a time and may be shared by
+# several threads.
+#-------------------------------------------------------------
+
+import threading
+from ctypes import CDLL, CFUNCTYPE, c_void_p, c_char_p, c_int
+
+# The udunits2 library needs to be in a standard path o/w export LD_LIBRARY_PATH.
+# Change this if the library has a different name on your platform.
+LIBRARY = "libudunits2.so"
+
+# ut_encoding
+UT_ASCII = 0
+
+_udunits = None
+
+def library():
+    """Return the udunits2 library, loading it and declaring the functions
+    used on first call"""
+    global _udunits
+    if _udunits is None:
+        lib = CDLL(LIBRARY)
+
+        lib.ut_read_xml.restype = c_void_p
+        lib.ut_read_xml.argtypes = [c_char_p]
+        lib.ut_free_system.restype = None
+        lib.ut_free_system.argtypes = [c_void_p]
+        lib.ut_parse.restype = c_void_p
+        lib.ut_parse.argtypes = [c_void_p, c_char_p, c_int]
+        lib.ut_free.restype = None
+        lib.ut_free.argtypes = [c_void_p]
+        lib.ut_multiply.restype = c_void_p
+        lib.ut_multiply.argtypes = [c_void_p, c_void_p]
+        lib.ut_are_convertible.restype = c_int
+        lib.ut_are_convertible.argtypes = [c_void_p, c_void_p]
+
+        _udunits = lib
+    return _udunits
+
+
+class UnitSystem:
+    """A UDUNITS-2 unit system read from xmlPath (the library default if None).
+
+    Units are given as strings throughout; invalid units are never
+    convertible to anything."""
+    def __init__(self, xmlPath=None):
+        lib = library()
+
+        # Temporarily ignore messages to std error stream to prevent "Definition override"
+        # warnings being dislayed see Trac #50.  ut_error_message_handler (uemh) is declared
+        # through ctypes callback functions (solution supplied by ctypes-mailing-list. 19.01.10)
+        uemh = CFUNCTYPE(c_int, c_char_p)
+        setHandler = CFUNCTYPE(uemh, uemh)(("ut_set_error_message_handler", lib))
+        self._ignore = uemh(("ut_ignore", lib))
+        self._toStderr = uemh(("ut_write_to_stderr", lib))
+
+        setHandler(self._ignore)
+        self.system = lib.ut_read_xml(xmlPath)
+        setHandler(self._toStderr)
+        if not self.system:
+            raise IOError("Could not read the UDUNITS2 xml database from: %s" % xmlPath)
+
+        self.lib = lib
+        self.lock = threading.Lock()   # Held while calling the library
+        self.units = {}            # unit string -> ut_unit pointer, or None if invalid
+        self.squares = {}          # unit string -> pointer to the unit squared
+        self.convertible = {}      # (units1, units2, squared) -> 0/1
+
+    def parse(self, units):
+        """Return the parsed units (a pointer), or None if invalid"""
+        try:
+            return self.units[units]
+        except KeyError:
+            pass
+        self.lock.acquire()
+        try:
+            # Another thread may have parsed units while this one waited
+            if not self.units.has_key(units):
+                try:
+                    if isinstance(units, unicode):
+                        units = units.encode('ascii')
+                    unit = self.lib.ut_parse(self.system, units, UT_ASCII)
+                except (UnicodeError, TypeError):
+                    unit = None
+                self.units[units] = unit or None
+            return self.units[units]
+        finally:
+            self.lock.release()
+
+    def _square(self, units):
+        try:
+            return self.squares[units]
+        except KeyError:
+            pass
+        unit = self.parse(units)
+        self.lock.acquire()
+        try:
+            if not self.squares.has_key(units):
+                if unit is not None:
+                    unit = self.lib.ut_multiply(unit, unit) or None
+                self.squares[units] = unit
+            return self.squares[units]
+        finally:
+            self.lock.release()
+
+    def isValid(self, units):
+        """Return 1 if udunits can parse units"""
+        return self.parse(units) is not None
+
+    def areConvertible(self, units1, units2, squared=0):
+        """Return 1 if values in units1 can be converted to units2 (or to
+        units2 squared if squared is set)"""
+        key = (units1, units2, squared)
+        try:
+            return self.convertible[key]
+        except KeyError:
+            pass
+        unit1 = self.parse(units1)
+        if squared:
+            unit2 = self._square(units2)
+        else:
+            unit2 = self.parse(units2)
+        if unit1 is None or unit2 is None:
+            result = 0
+        else:
+            self.lock.acquire()
+            try:
+                result = self.lib.ut_are_convertible(unit1, unit2) and 1 or 0
+            finally:
+                self.lock.release()
+        self.convertible[key] = result
+        return result
+
+    def close(self):
+        """Free every unit parsed and the unit system itself"""
+        if self.system is None:
+            return
+        for unit in self.units.values() + self.squares.values():
+            if unit is not None:
+                self.lib.ut_free(unit)
+        self.units = {}
+        self.squares = {}
+        self.convertible = {}
+        self.lib.ut_free_system(self.system)
+        self.system = None
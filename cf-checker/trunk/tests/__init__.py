@@ -0,0 +1,16 @@
+#-------------------------------------------------------------
+# Name: tests
+#
+# Tests of the CF checker, run from the directory above with
+#
+#   python -m unittest discover -s tests -t .
+#
+# Each module puts src on sys.path, so the checker is tested
+# from the tree rather than from an installed copy.
+#-------------------------------------------------------------
+
+import os, sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
@@ -0,0 +1,145 @@
+#-------------------------------------------------------------
+# Name: test_cellmethods.py
+#
+# Tests of the parser of the cell_methods attribute
+# (cellmethods.py).
+#-------------------------------------------------------------
+
+import unittest
+
+import tests
+from cfchecker import cellmethods
+
+
+def entries(value):
+    """The entries of value as tuples, for comparing"""
+    return [(entry.names, entry.method, entry.where, entry.over, entry.climatology,
+             entry.comment, entry.intervals, entry.remark)
+            for entry in cellmethods.parse(value).entries]
+
+
+def snapshot(cellMethods):
+    """Everything a check can see of cellMethods"""
+    return (cellMethods.value, cellMethods.error,
+            [(entry.names, entry.method, entry.where, entry.over, entry.climatology,
+              entry.comment, entry.intervals, entry.remark) for entry in cellMethods.entries])
+
+
+class CellMethodsTest(unittest.TestCase):
+    def valid(self, value):
+        cellMethods = cellmethods.parse(value)
+        self.assertEqual(cellMethods.error, None)
+        return cellMethods
+
+    def testNames(self):
+        self.valid("lat: lon: sum time: point")
+        self.assertEqual(entries("lat: lon: sum time: point"),
+                         [(('lat', 'lon'), 'sum', None, None, None, None, (), None),
+                          (('time',), 'point', None, None, None, None, (), None)])
+        self.assertEqual(cellmethods.parse("lat: lon: sum time: point").methods(), ['sum', 'point'])
+
+    def testWhereOver(self):
+        self.valid("area: mean where sea_ice over sea")
+        self.assertEqual(entries("area: mean where sea_ice over sea"),
+                         [(('area',), 'mean', 'sea_ice', 'sea', None, None, (), None)])
+        self.assertEqual(entries("area: mean where land"),
+                         [(('area',), 'mean', 'land', None, None, None, (), None)])
+
+    def testClimatology(self):
+        for (within, over) in (('days', 'years'), ('years', 'years'), ('days', 'days')):
+            value = "time: minimum within %s time: mean over %s" % (within, over)
+            self.valid(value)
+            self.assertEqual([entry.climatology for entry in cellmethods.parse(value).entries],
+                             [('within', within), ('over', over)])
+        # over after where is type2, even when followed by days or years
+        self.assertEqual(entries("area: mean where land over years"),
+                         [(('area',), 'mean', 'land', 'years', None, None, (), None)])
+        self.assertEqual(entries("area: mean where land over sea over years"),
+                         [(('area',), 'mean', 'land', 'sea', ('over', 'years'), None, (), None)])
+        # within or over is a climatology only when followed by days or years
+        self.failIf(cellmethods.parse("time: mean within months").error is None)
+
+    def testIntervals(self):
+        value = "lat: lon: mean (interval: 0.1 degree interval: 2.5e-1 degree comment: area weighted)"
+        self.valid(value)
+        self.assertEqual(entries(value),
+                         [(('lat', 'lon'), 'mean', None, None, None,
+                           "interval: 0.1 degree interval: 2.5e-1 degree comment: area weighted",
+                           (('0.1', 'degree'), ('2.5e-1', 'degree')), 'area weighted')])
+        self.assertEqual(entries("time: maximum (interval: 1 hr)")[0][6:], ((('1', 'hr'),), None))
+
+    def testComment(self):
+        self.assertEqual(entries("time: mean (comment: daily means)")[0][5:],
+                         ("comment: daily means", (), "daily means"))
+        # A comment that is not standardized is all remark
+        self.assertEqual(entries("time: mean (from 6-hourly values)")[0][5:],
+                         ("from 6-hourly values", (), "from 6-hourly values"))
+        # Text after the intervals without comment: is the remark
+        self.assertEqual(entries("time: mean (interval: 1 hr unweighted)")[0][6:],
+                         ((('1', 'hr'),), "unweighted"))
+        self.assertEqual(entries("time: mean within years (interval: 1 day) time: mean over years")[0][4:7],
+                         (('within', 'years'), "interval: 1 day", (('1', 'day'),)))
+
+    def testMissingMethod(self):
+        for value in ("time:", "time: lat:", "time: (interval: 1 hr)", "mean", ""):
+            cellMethods = cellmethods.parse(value)
+            self.assertEqual(cellMethods.entries, [])
+            self.failIf(cellMethods.error is None, value)
+        # The method must be lower case
+        self.assertEqual(cellmethods.parse("time: Mean").error, "Mean")
+
+    def testStrayColon(self):
+        cellMethods = cellmethods.parse(": mean")
+        self.assertEqual(cellMethods.error, ": mean")
+        self.assertEqual(cellMethods.entries, [])
+        cellMethods = cellmethods.parse("time: : mean lat: point")
+        self.assertEqual(cellMethods.error, ": mean lat: point")
+        self.assertEqual(cellMethods.methods(), ['point'])
+        # A blank before the colon is allowed, so this is one entry of
+        # three names
+        cellMethods = cellmethods.parse("time: mean : lat: point")
+        self.assertEqual(cellMethods.error, None)
+        self.assertEqual(entries("time: mean : lat: point"),
+                         [(('time', 'mean', 'lat'), 'point', None, None, None, None, (), None)])
+
+    def testStrayParenthesis(self):
+        cellMethods = cellmethods.parse("time: mean )")
+        self.assertEqual(cellMethods.error, ")")
+        self.assertEqual(cellMethods.methods(), ['mean'])
+        cellMethods = cellmethods.parse("time: mean (interval: 1 hr")
+        self.assertEqual(cellMethods.error, "(interval: 1 hr")
+
+    def testAfterError(self):
+        # The entries from the next name on are still found
+        cellMethods = cellmethods.parse("time: Mean lat: point")
+        self.assertEqual(cellMethods.error, "Mean lat: point")
+        self.assertEqual(entries("time: Mean lat: point"),
+                         [(('lat',), 'point', None, None, None, None, (), None)])
+
+    def testShared(self):
+        value = "time: mean within days (interval: 1 hr) time: maximum over days"
+        first = cellmethods.parse(value)
+        before = snapshot(first)
+        for other in ("time: mean", "time: mean within days", value + " lat: point"):
+            cellmethods.parse(other)
+        second = cellmethods.parse(value)
+        self.failUnless(second is first)
+        self.assertEqual(snapshot(second), before)
+
+    def testCacheLimit(self):
+        value = "time: point"
+        first = cellmethods.parse(value)
+        before = snapshot(first)
+        for i in range(cellmethods.MAX_PARSED + 1):
+            cellmethods.parse("time: mean (interval: %d s)" % i)
+        self.failUnless(len(cellmethods._parsed) <= cellmethods.MAX_PARSED)
+        # Parsed afresh once dropped, and the same as before; the old parse,
+        # which a check may still hold, is left as it was
+        second = cellmethods.parse(value)
+        self.failIf(second is first)
+        self.assertEqual(snapshot(second), before)
+        self.assertEqual(snapshot(first), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+#-------------------------------------------------------------
+# Name: test_chunks.py
+#
+# Tests of the checks that read variable data a chunk at a time:
+# the monotonicity of coordinates (chkValuesMonotonic) and the
+# analysis of boundary variables (bounds.py).
+#
+# The chunks are made a few values long and the problems put
+# either side of the boundaries between them, where the values
+# carried over from one chunk to the next must be used.  The
+# report of bounds.analyse() for every chunk size is checked
+# against its report for the whole array.
+#
+# chkValuesMonotonic is tested through the checker, with
+# cfchecks.CHUNK_SIZE made small, so these tests are skipped if
+# the udunits2 library cannot be loaded.  UDUNITS, if set, is the
+# path to its xml database.
+#-------------------------------------------------------------
+
+import os, shutil, tempfile, unittest
+import numpy
+
+import tests
+from cfchecker import bounds, cfchecks
+from cfchecker.reporters import Reporter
+from cfchecker.units import UnitSystem
+from benchmarks.ncwriter import Writer
+
+NAN = float('nan')
+
+
+class Findings(Reporter):
+    """Keeps the findings of a check instead of writing them"""
+    def __init__(self):
+        Reporter.__init__(self)
+        self.findings = []
+
+    def write(self, records):
+        self.findings.extend([record for record in records if record.kind == 'finding'])
+
+
+def reader(values):
+    """A reader of rows start:stop of values, as analyse() takes"""
+    def read(start, stop):
+        return values[start:stop]
+    return read
+
+
+def cells(edges):
+    """The bounds, low to high, of the cells between edges"""
+    edges = numpy.asarray(edges, 'd')
+    return numpy.column_stack((edges[:-1], edges[1:]))
+
+
+def grid(nj, ni):
+    """Points and bounds of 2-D latitudes and longitudes on a regular grid of
+    unit cells, the vertices anticlockwise from the lower left"""
+    (j, i) = numpy.mgrid[0:nj, 0:ni].astype('d')
+    lat = numpy.empty((nj, ni, 4))
+    lon = numpy.empty((nj, ni, 4))
+    lat[..., 0] = lat[..., 1] = j
+    lat[..., 2] = lat[..., 3] = j + 1
+    lon[..., 0] = lon[..., 3] = i
+    lon[..., 1] = lon[..., 2] = i + 1
+    return (j + 0.5, lat, i + 0.5, lon)
+
+
+class BoundsTest(unittest.TestCase):
+    def analyse(self, points, bnds, chunkSize):
+        return bounds.analyse(reader(points), reader(bnds), points.shape, bnds.shape[-1], chunkSize)
+
+    def report(self, points, bnds, chunkSizes):
+        """The report of analyse() with each of chunkSizes, which must be the
+        same as for the whole array; returns it as a tuple"""
+        whole = self.analyse(points, bnds, points.size * bnds.shape[-1])
+        expected = (whole.outside, whole.gap, whole.overlap, whole.order, whole.noncontiguous)
+        for chunkSize in chunkSizes:
+            report = self.analyse(points, bnds, chunkSize)
+            self.assertEqual((report.outside, report.gap, report.overlap, report.order, report.noncontiguous),
+                             expected, "chunk size %d" % chunkSize)
+        return expected
+
+    def testContiguous(self):
+        edges = numpy.arange(13.0)
+        points = edges[:-1] + 0.5
+        self.assertEqual(self.report(points, cells(edges), range(1, 13)), (None,) * 5)
+        # Decreasing
+        self.assertEqual(self.report(points[::-1].copy(), cells(edges)[::-1].copy(), range(1, 13)),
+                         (None,) * 5)
+
+    def testGap(self):
+        # Between cells 3 and 4, the boundary between chunks of 4
+        edges = numpy.arange(13.0)
+        bnds = cells(edges)
+        bnds[4:] = bnds[4:] + 0.5
+        points = bnds.mean(axis=-1)
+        self.assertEqual(self.report(points, bnds, (1, 2, 3, 4, 5)), (None, 3, None, None, None))
+
+        # Decreasing, so the gap comes after the cell at index 7
+        self.assertEqual(self.report(points[::-1].copy(), bnds[::-1].copy(), (1, 2, 3, 4, 8)),
+                         (None, 7, None, None, None))
+
+    def testOverlap(self):
+        edges = numpy.arange(13.0)
+        bnds = cells(edges)
+        bnds[4, 0] = 3.5
+        points = edges[:-1] + 0.5
+        self.assertEqual(self.report(points, bnds, (1, 2, 3, 4, 5)), (None, None, 3, None, None))
+        # The overlap is also the first in a chunk of 4 starting at 4
+        bnds = cells(edges)
+        bnds[8, 0] = 7.5
+        self.assertEqual(self.report(points, bnds, (4, 8)), (None, None, 7, None, None))
+
+    def testOrder(self):
+        edges = numpy.arange(13.0)
+        bnds = cells(edges)
+        bnds[4] = bnds[4, ::-1]
+        points = edges[:-1] + 0.5
+        self.assertEqual(self.report(points, bnds, (1, 2, 3, 4, 5)), (None, None, None, 4, None))
+        # The order is set by the first cell of non-zero width, which is in
+        # the second chunk
+        bnds = cells(edges)
+        bnds[:4] = 0.0
+        bnds[5] = bnds[5, ::-1]
+        self.assertEqual(self.report(points, bnds, (4,))[3], 5)
+
+    def testOutside(self):
+        edges = numpy.arange(13.0)
+        points = edges[:-1] + 0.5
+        points[4] = 3.9
+        self.assertEqual(self.report(points, cells(edges), (1, 2, 3, 4, 5))[0], 4)
+
+    def testNaN(self):
+        # A NaN is never taken for a problem
+        edges = numpy.arange(13.0)
+        points = edges[:-1] + 0.5
+        points[4] = NAN
+        bnds = cells(edges)
+        bnds[3, 1] = NAN
+        self.assertEqual(self.report(points, bnds, (1, 2, 3, 4, 5)), (None,) * 5)
+
+    def testGridNaN(self):
+        (lat, latBounds, lon, lonBounds) = grid(6, 3)
+        lat[2, 1] = NAN
+        latBounds[2, 1, 1] = NAN
+        latBounds[3, 2, 0] = NAN
+        self.assertEqual(self.report(lat, latBounds, (12, 24, 36)), (None,) * 5)
+
+    def testGrid(self):
+        (lat, latBounds, lon, lonBounds) = grid(6, 3)
+        # 3 cells of 4 vertices to a row
+        for chunkSize in (12, 24, 36, 72):
+            self.assertEqual(self.analyse(lat, latBounds, chunkSize).noncontiguous, None)
+            self.assertEqual(self.analyse(lon, lonBounds, chunkSize).noncontiguous, None)
+
+    def testGridRows(self):
+        # Row r does not start where row r-1 ends, so cell (r-1, 0) is the
+        # first not to share its vertices with a neighbour.  With chunks of
+        # 2 rows, every other r is at a boundary.
+        for r in range(1, 6):
+            (lat, latBounds, lon, lonBounds) = grid(6, 3)
+            latBounds[r, :, 0:2] = latBounds[r, :, 0:2] + 0.25
+            self.assertEqual(self.report(lat, latBounds, (12, 24, 36, 48)), (None, None, None, None, (r-1, 0)))
+
+    def testGridColumns(self):
+        # Cell (3, 1), in the second of chunks of 2 rows, does not end
+        # where (3, 2) starts
+        (lat, latBounds, lon, lonBounds) = grid(6, 3)
+        lonBounds[3, 1, 1:3] = 1.75
+        lon[3, 1] = 1.4
+        self.assertEqual(self.report(lon, lonBounds, (12, 24, 36))[4], (3, 1))
+
+
+class MonotonicTest(unittest.TestCase):
+    """chkValuesMonotonic, with chunks of CHUNK_SIZE values"""
+    CHUNK_SIZE = 4
+
+    def setUp(self):
+        try:
+            UnitSystem(os.environ.get('UDUNITS')).close()
+        except (OSError, IOError), e:
+            self.skipTest("udunits2 is not available: %s" % e)
+        self.dir = tempfile.mkdtemp()
+        self.chunkSize = cfchecks.CHUNK_SIZE
+        cfchecks.CHUNK_SIZE = self.CHUNK_SIZE
+        self.checker = cfchecks.CFChecker(udunitsDat=os.environ.get('UDUNITS'),
+                                          cacheDir=os.path.join(self.dir, 'cache'))
+
+    def tearDown(self):
+        cfchecks.CHUNK_SIZE = self.chunkSize
+        self.checker.close()
+        shutil.rmtree(self.dir)
+
+    def check(self, values, bnds=None):
+        """Check a file with the coordinate x holding values, and bnds as its
+        bounds if given; return the messages about x and its bounds"""
+        writer = Writer()
+        writer.addDimension('x', len(values))
+        writer.addDimension('nv', 2)
+        writer.addAttribute('Conventions', 'CF-1.6')
+        attributes = [('units', 'm'), ('standard_name', 'projection_x_coordinate'), ('axis', 'X')]
+        if bnds is not None:
+            attributes.append(('bounds', 'x_bnds'))
+        writer.addVariable('x', 'f8', ['x'], attributes, numpy.array(values, 'd'))
+        if bnds is not None:
+            writer.addVariable('x_bnds', 'f8', ['x', 'nv'], [], bnds)
+        path = os.path.join(self.dir, 'x.nc')
+        writer.write(path)
+
+        reporter = Findings()
+        self.checker.checker(path, reporter=reporter)
+        return [finding.text() for finding in reporter.findings
+                if "'x'" in finding.message or 'x_bnds' in finding.message]
+
+    def testMonotonic(self):
+        self.assertEqual(self.check(range(12)), [])
+        self.assertEqual(self.check(range(12, 0, -1)), [])
+        self.assertEqual(self.check(range(5)), [])
+
+    def testDuplicate(self):
+        # At the start of the second chunk, equal to the end of the first
+        self.assertEqual(self.check([0, 1, 2, 3, 3, 5, 6, 7, 8]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (duplicate value at index 4)"])
+        # The only value of the second chunk
+        self.assertEqual(self.check([0, 1, 2, 3, 3]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (duplicate value at index 4)"])
+        # The direction is not known until the first two values differ
+        self.assertEqual(self.check([5, 5, 4, 3, 2]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (duplicate value at index 1)"])
+
+    def testViolation(self):
+        self.assertEqual(self.check([0, 1, 2, 3, 2.5, 5, 6, 7]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (first violation at index 4)"])
+        # Decreasing, at the start of the third chunk
+        self.assertEqual(self.check([11, 10, 9, 8, 7, 6, 5, 4, 4.5, 2, 1]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (first violation at index 8)"])
+        # At the end of the first chunk
+        self.assertEqual(self.check([0, 1, 2, 1, 4, 5]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (first violation at index 3)"])
+
+    def testNaN(self):
+        self.assertEqual(self.check([0, 1, 2, 3, NAN, 5, 6]),
+                         ["ERROR (5): co-ordinate variable 'x' contains NaN values (first at index 4)"])
+        self.assertEqual(self.check([0, 1, 2, NAN, 4, 5, 6]),
+                         ["ERROR (5): co-ordinate variable 'x' contains NaN values (first at index 3)"])
+        self.assertEqual(self.check([NAN, 1, 2]),
+                         ["ERROR (5): co-ordinate variable 'x' contains NaN values (first at index 0)"])
+
+    def testNaNAndViolation(self):
+        # Whichever comes first is reported
+        self.assertEqual(self.check([0, 1, 2, 3, NAN, 5, 4, 7]),
+                         ["ERROR (5): co-ordinate variable 'x' contains NaN values (first at index 4)"])
+        self.assertEqual(self.check([0, 1, 2, 3, 2, NAN, 6, 7]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (first violation at index 4)"])
+        # The violation is against the last value of the previous chunk
+        self.assertEqual(self.check([0, 1, 2, 3, 3, 5, NAN, 7]),
+                         ["ERROR (5): co-ordinate variable 'x' not monotonic (duplicate value at index 4)"])
+        self.assertEqual(self.check([6, 5, 4, 3, NAN, 1, 0]),
+                         ["ERROR (5): co-ordinate variable 'x' contains NaN values (first at index 4)"])
+
+    def testBounds(self):
+        # The checker passes CHUNK_SIZE on to bounds.analyse()
+        bnds = cells(numpy.arange(9.0))
+        bnds[4, 0] = 3.5
+        self.assertEqual(self.check(numpy.arange(8) + 0.5, bnds),
+                         ["WARNING (7.1): Cells of boundary variable x_bnds overlap (cells 3 and 4)"])
+
+
+if __name__ == '__main__':
+    unittest.main()
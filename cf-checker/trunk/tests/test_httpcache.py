@@ -0,0 +1,156 @@
+#-------------------------------------------------------------
+# Name: test_httpcache.py
+#
+# Tests of the cache of tables given as URLs (httpcache.py and
+# loadTable), against a stand-in HTTP server on localhost.
+#-------------------------------------------------------------
+
+import os, sys, shutil, tempfile, threading, unittest
+import BaseHTTPServer
+from cStringIO import StringIO
+
+import tests
+from cfchecker import httpcache
+from cfchecker.tablecache import loadTable
+from cfchecker.cfchecks import ConstructDict
+
+TABLE = """<?xml version="1.0"?>
+<standard_name_table>
+<version_number>99</version_number>
+<last_modified>2013-02-12T13:35:31Z</last_modified>
+<entry id="air_temperature"><canonical_units>K</canonical_units></entry>
+<entry id="air_pressure"><canonical_units>Pa</canonical_units></entry>
+</standard_name_table>
+"""
+
+ETAG = '"table-99"'
+LAST_MODIFIED = 'Tue, 12 Feb 2013 13:35:31 GMT'
+
+
+class TableHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves TABLE, answering conditional requests with 304 Not Modified.
+    The validators it sends, and the requests it gets, are kept on the
+    server."""
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers.items()))
+        if server.etag and self.headers.get('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if server.lastModified and self.headers.get('If-Modified-Since') == server.lastModified:
+            self.send_response(304)
+            self.end_headers()
+            return
+        server.downloads = server.downloads + 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(TABLE)))
+        if server.etag:
+            self.send_header('ETag', server.etag)
+        if server.lastModified:
+            self.send_header('Last-Modified', server.lastModified)
+        self.end_headers()
+        self.wfile.write(TABLE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), TableHandler)
+        self.server.etag = ETAG
+        self.server.lastModified = LAST_MODIFIED
+        self.server.requests = []
+        self.server.downloads = 0
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(1)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d/cf-standard-name-table.xml' % self.server.server_port
+        self.cacheDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.stopServer()
+        shutil.rmtree(self.cacheDir)
+
+    def stopServer(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+
+    def testDownload(self):
+        (path, data) = httpcache.fetch(self.url, self.cacheDir)
+        self.assertEqual(data, None)
+        self.assertEqual(open(path).read(), TABLE)
+        self.assertEqual(self.server.downloads, 1)
+        self.failIf(self.server.requests[0].has_key('if-none-match'))
+
+    def testRevalidateETag(self):
+        self.server.lastModified = None
+        (first, data) = httpcache.fetch(self.url, self.cacheDir)
+        (second, data) = httpcache.fetch(self.url, self.cacheDir)
+        self.assertEqual(second, first)
+        self.assertEqual(self.server.requests[1].get('if-none-match'), ETAG)
+        self.assertEqual(self.server.downloads, 1)
+
+    def testRevalidateLastModified(self):
+        self.server.etag = None
+        (first, data) = httpcache.fetch(self.url, self.cacheDir)
+        (second, data) = httpcache.fetch(self.url, self.cacheDir)
+        self.assertEqual(second, first)
+        self.assertEqual(self.server.requests[1].get('if-modified-since'), LAST_MODIFIED)
+        self.failIf(self.server.requests[1].has_key('if-none-match'))
+        self.assertEqual(self.server.downloads, 1)
+
+    def testChanged(self):
+        (first, data) = httpcache.fetch(self.url, self.cacheDir)
+        self.server.etag = '"table-100"'
+        self.server.lastModified = None
+        httpcache.fetch(self.url, self.cacheDir)
+        self.assertEqual(self.server.downloads, 2)
+
+    def testOffline(self):
+        (first, data) = httpcache.fetch(self.url, self.cacheDir)
+        self.stopServer()
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            (second, data) = httpcache.fetch(self.url, self.cacheDir, timeout=5)
+            warning = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(second, first)
+        self.assertEqual(open(second).read(), TABLE)
+        self.failUnless(warning.startswith("WARNING: Could not retrieve"))
+
+    def testOfflineNoCopy(self):
+        self.stopServer()
+        self.assertRaises(IOError, httpcache.fetch, self.url, self.cacheDir, 5)
+
+    def testUnwritableCache(self):
+        # A directory below a plain file cannot be created, even by root
+        blocker = os.path.join(self.cacheDir, 'file')
+        open(blocker, 'w').close()
+        cacheDir = os.path.join(blocker, 'cache')
+        (path, data) = httpcache.fetch(self.url, cacheDir)
+        self.assertEqual(path, None)
+        self.assertEqual(data, TABLE)
+
+        table = loadTable(self.url, ConstructDict, 'standard-name', cacheDir)
+        self.assertEqual(table.dict['air_temperature'], 'K')
+        self.assertEqual(self.server.downloads, 2)
+
+    def testLoadTable(self):
+        table = loadTable(self.url, ConstructDict, 'standard-name', self.cacheDir)
+        self.assertEqual(table.version_number, '99')
+        self.assertEqual(table.dict['air_pressure'], 'Pa')
+        table = loadTable(self.url, ConstructDict, 'standard-name', self.cacheDir)
+        self.assertEqual(table.dict['air_temperature'], 'K')
+        self.assertEqual(self.server.downloads, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
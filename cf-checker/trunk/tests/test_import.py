@@ -0,0 +1,96 @@
+#-------------------------------------------------------------
+# Name: test_import.py
+#
+# The time it takes to start the checker.
+#
+# Importing cfchecker.cfchecks, and running cfchecks --help, must
+# stay within a budget and must not load numpy, cdms2 or the
+# udunits library, which are only needed once a file is checked.
+# Each measurement is made in a new interpreter, after a first
+# run that writes the .pyc files, and the best of REPEAT is kept.
+#-------------------------------------------------------------
+
+import os, sys, subprocess, unittest
+import json
+
+import tests
+
+# Seconds
+IMPORT_BUDGET = 0.2
+HELP_BUDGET = 0.25
+
+REPEAT = 3
+
+# Modules that must not be loaded by the import
+HEAVY_MODULES = ('numpy', 'cdms2', 'cfchecker.netcdf3', 'cfchecker.metadata')
+
+# Run in the new interpreter: the time taken by STATEMENT, the heavy modules
+# loaded, and whether the udunits library is mapped into the process
+PROBE = """
+import os, sys, time
+import json
+start = time.time()
+%s
+seconds = time.time() - start
+udunits = None
+if os.path.exists('/proc/self/maps'):
+    udunits = 'libudunits2' in open('/proc/self/maps').read()
+from cfchecker import units
+sys.__stdout__.write(json.dumps({'seconds': seconds,
+                                 'modules': [m for m in %r if m in sys.modules],
+                                 'udunits': udunits,
+                                 'udunitsLoaded': units._udunits is not None}) + "\\n")
+"""
+
+IMPORT = "import cfchecker.cfchecks"
+
+HELP = """
+sys.stdout = open(os.devnull, 'w')
+sys.argv = ['cfchecks', '--help']
+from cfchecker import cfchecks_main
+try:
+    cfchecks_main()
+except SystemExit:
+    pass
+"""
+
+
+def probe(statement):
+    """Run statement in a new interpreter REPEAT times; return the result of
+    the fastest run"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = tests.SRC
+    # The .pyc files are wanted, as an installed checker has them
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    code = PROBE % (statement, HEAVY_MODULES)
+    results = []
+    for i in range(REPEAT + 1):
+        process = subprocess.Popen([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE)
+        output = process.communicate()[0]
+        if process.returncode != 0:
+            raise AssertionError("Probe exited with %d" % process.returncode)
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    # The first run wrote the .pyc files
+    results = results[1:]
+    results.sort(key=lambda result: result['seconds'])
+    return results[0]
+
+
+class ImportTest(unittest.TestCase):
+    def check(self, result, budget):
+        self.assertEqual(result['modules'], [])
+        self.failIf(result['udunitsLoaded'])
+        if result['udunits'] is not None:
+            self.failIf(result['udunits'])
+        self.failUnless(result['seconds'] <= budget,
+                        "%.3f s is over the budget of %.3f s" % (result['seconds'], budget))
+
+    def testImport(self):
+        self.check(probe(IMPORT), IMPORT_BUDGET)
+
+    def testHelp(self):
+        self.check(probe(HELP), HELP_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+#-------------------------------------------------------------
+# Name: test_netcdf3.py
+#
+# Tests of the reader of classic format netCDF files (netcdf3.py).
+#
+# The files with fixed size variables are written by the
+# benchmarks' writer (benchmarks/ncwriter.py), which does not
+# share code with the reader.  That writer has no record
+# dimension, so the files with record variables are put together
+# here, a byte at a time.
+#-------------------------------------------------------------
+
+import os, shutil, struct, tempfile, unittest
+import numpy
+
+import tests
+from cfchecker import netcdf3
+from benchmarks.ncwriter import Writer, CLASSIC, OFFSET64, DATA64
+
+
+def _pad(s):
+    return s + '\0' * (-len(s) % 4)
+
+
+def _name(name):
+    return struct.pack('>i', len(name)) + _pad(name)
+
+
+def recordFile(path, numrecs, fixed, records):
+    """Write a classic format file with the dimensions x (3) and time
+    (unlimited) and no attributes.  fixed are the (name, values) of variables
+    of x, records the (name, dimensions, values) of variables of time; the
+    values are big-endian arrays.  The number of records written in the
+    header is numrecs, which may be -1 (streaming)."""
+    dims = [('x', 3), ('time', 0)]
+    index = {'x': 0, 'time': 1}
+    variables = [(name, ('x',), values) for (name, values) in fixed] + list(records)
+    types = {'>i2': 3, '>i4': 4, '>f8': 6}
+
+    # The size of each variable, or of one record of it
+    sizes = []
+    for (name, dimensions, values) in variables:
+        size = values.dtype.itemsize
+        if dimensions[0] == 'time':
+            size = size * int(numpy.prod(values.shape[1:]))
+        else:
+            size = size * values.size
+        sizes.append(size)
+    unpadded = len(records) == 1
+
+    def header(begins):
+        entries = []
+        for i in range(len(variables)):
+            (name, dimensions, values) = variables[i]
+            vsize = sizes[i]
+            if not (unpadded and dimensions[0] == 'time'):
+                vsize = (vsize + 3) & ~3
+            entries.append(_name(name) + struct.pack('>i', len(dimensions)) +
+                           ''.join([struct.pack('>i', index[d]) for d in dimensions]) +
+                           struct.pack('>ii', 0, 0) +
+                           struct.pack('>iii', types[values.dtype.str], vsize, begins[i]))
+        return ('CDF\x01' + struct.pack('>i', numrecs) +
+                struct.pack('>ii', netcdf3.NC_DIMENSION, len(dims)) +
+                ''.join([_name(name) + struct.pack('>i', length) for (name, length) in dims]) +
+                struct.pack('>ii', 0, 0) +
+                struct.pack('>ii', netcdf3.NC_VARIABLE, len(variables)) + ''.join(entries))
+
+    # Fixed size variables first, then the records, one after the other
+    begins = []
+    position = len(header([0] * len(variables)))
+    for i in range(len(fixed)):
+        begins.append(position)
+        position = position + ((sizes[i] + 3) & ~3)
+    recsize = 0
+    for i in range(len(fixed), len(variables)):
+        begins.append(position + recsize)
+        if unpadded:
+            recsize = recsize + sizes[i]
+        else:
+            recsize = recsize + ((sizes[i] + 3) & ~3)
+
+    data = header(begins)
+    for (name, values) in fixed:
+        data = data + _pad(values.tostring())
+    nrecs = max([len(values) for (name, dimensions, values) in records])
+    for r in range(nrecs):
+        for (name, dimensions, values) in records:
+            slab = values[r:r+1].tostring()
+            if not unpadded:
+                slab = _pad(slab)
+            data = data + slab
+    f = open(path, 'wb')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+
+class NetCDF3Test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.nc')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, format=OFFSET64):
+        writer = Writer(format)
+        writer.addDimension('y', 2)
+        writer.addDimension('x', 3)
+        writer.addAttribute('Conventions', 'CF-1.6')
+        writer.addVariable('x', 'f8', ['x'], [('units', 'm')], numpy.array([1.5, 2.5, 3.5]))
+        writer.addVariable('flag', 'i1', ['x'], [], numpy.array([1, -2, 3]))
+        writer.addVariable('t', 'i2', ['y', 'x'], [('valid_range', numpy.array([0, 9], 'i2'))],
+                           numpy.arange(6).reshape(2, 3))
+        writer.write(self.path)
+
+    def testFormats(self):
+        for (format, name) in ((CLASSIC, 'classic'), (OFFSET64, '64bit_offset'), (DATA64, 'cdf5')):
+            self.write(format)
+            self.assertEqual(netcdf3.formatVersion(self.path), format)
+            dataset = netcdf3.Dataset(self.path)
+            self.assertEqual(dataset.version, format)
+            self.assertEqual(dataset.format, name)
+            self.assertEqual(dataset.dimensionNames, ['y', 'x'])
+            self.assertEqual(dataset.dimensions, {'y': 2, 'x': 3})
+            self.assertEqual(dataset.unlimited, None)
+            self.assertEqual(dataset.attributes, {'Conventions': 'CF-1.6'})
+            self.assertEqual(dataset.variableNames, ['x', 'flag', 't'])
+
+            x = dataset.variables['x']
+            self.assertEqual(x.dimensions, ('x',))
+            self.assertEqual(x.shape, (3,))
+            self.assertEqual(x.typecode(), 'd')
+            self.assertEqual(x.attributes, {'units': 'm'})
+            self.assertEqual(x.data().tolist(), [1.5, 2.5, 3.5])
+            # The 3 bytes of flag are padded to 4 before t
+            self.assertEqual(dataset.variables['flag'].data().tolist(), [1, -2, 3])
+            t = dataset.variables['t']
+            self.assertEqual(t.shape, (2, 3))
+            self.failIf(t.isRecord)
+            self.assertEqual(t.data().tolist(), [[0, 1, 2], [3, 4, 5]])
+            dataset.close()
+
+    def testAttributes(self):
+        writer = Writer(CLASSIC)
+        writer.addDimension('x', 1)
+        # Each value but the last leaves the next attribute to be found
+        # after padding
+        attributes = [('byte', numpy.array([-7], 'i1')),
+                      ('short', numpy.array([1, -2, 3], 'i2')),
+                      ('int', numpy.array([70000], 'i4')),
+                      ('float', numpy.array([0.5, -1.25], 'f4')),
+                      ('double', numpy.array([1e300], 'f8')),
+                      ('odd', 'abcde'),
+                      ('empty', ''),
+                      ('last', 'end')]
+        writer.addVariable('v', 'i4', ['x'], attributes, numpy.array([42]))
+        for (name, value) in attributes:
+            writer.addAttribute(name, value)
+        writer.write(self.path)
+
+        dataset = netcdf3.Dataset(self.path)
+        for found in (dataset.attributes, dataset.variables['v'].attributes):
+            self.assertEqual(sorted(found.keys()), sorted([name for (name, value) in attributes]))
+            for (name, value) in attributes:
+                if isinstance(value, str):
+                    self.assertEqual(found[name], value)
+                else:
+                    self.assertEqual(found[name].tolist(), value.tolist())
+                    self.assertEqual(found[name].dtype, value.dtype)
+                    self.failUnless(found[name].dtype.isnative)
+        self.assertEqual(dataset.variables['v'].data().tolist(), [42])
+
+    def testTrailingNul(self):
+        # Trailing NULs of a character attribute are taken as padding
+        writer = Writer(CLASSIC)
+        writer.addAttribute('title', 'abc\0')
+        writer.write(self.path)
+        self.assertEqual(netcdf3.Dataset(self.path).attributes['title'], 'abc')
+
+    def testRecords(self):
+        time = numpy.array([0.0, 6.0, 12.0], '>f8')
+        t = numpy.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]], '>i2')
+        recordFile(self.path, 3, [('x', numpy.array([10, 20, 30], '>i4'))],
+                   [('time', ('time',), time), ('t', ('time', 'x'), t)])
+        dataset = netcdf3.Dataset(self.path)
+        self.assertEqual(dataset.unlimited, 'time')
+        self.assertEqual(dataset.dimensions, {'x': 3, 'time': 3})
+        # The 6 bytes of each record of t are padded to 8
+        self.assertEqual(dataset.recsize, 16)
+        self.failUnless(dataset.variables['t'].isRecord)
+        self.failIf(dataset.variables['x'].isRecord)
+        self.assertEqual(dataset.variables['t'].shape, (3, 3))
+        self.assertEqual(dataset.variables['x'].data().tolist(), [10, 20, 30])
+        self.assertEqual(dataset.variables['time'].data().tolist(), time.tolist())
+        self.assertEqual(dataset.variables['t'].data().tolist(), t.tolist())
+
+    def testSingleRecordVariable(self):
+        # The records of the only record variable are not padded
+        t = numpy.array([[1, 2, 3], [4, 5, 6]], '>i2')
+        recordFile(self.path, 2, [], [('t', ('time', 'x'), t)])
+        dataset = netcdf3.Dataset(self.path)
+        self.assertEqual(dataset.recsize, 6)
+        self.assertEqual(dataset.variables['t'].data().tolist(), t.tolist())
+
+    def testStreaming(self):
+        # The number of records is worked out from the size of the file
+        time = numpy.array([0.0, 1.0, 2.0, 3.0], '>f8')
+        t = numpy.arange(12).reshape(4, 3).astype('>i4')
+        recordFile(self.path, -1, [], [('time', ('time',), time), ('t', ('time', 'x'), t)])
+        dataset = netcdf3.Dataset(self.path)
+        self.assertEqual(dataset.dimensions['time'], 4)
+        self.assertEqual(dataset.variables['t'].shape, (4, 3))
+        self.assertEqual(dataset.variables['t'].data().tolist(), t.tolist())
+
+    def testNoRecords(self):
+        recordFile(self.path, 0, [], [('time', ('time',), numpy.zeros(0, '>f8'))])
+        dataset = netcdf3.Dataset(self.path)
+        self.assertEqual(dataset.dimensions['time'], 0)
+        self.assertEqual(dataset.variables['time'].data().shape, (0,))
+
+    def testNotNetCDF(self):
+        for data in ('', 'CDF', 'plain text, not a netCDF file\n',
+                     '\x89HDF\r\n\x1a\n' + '\0' * 100, 'CDF\x03' + '\0' * 100):
+            f = open(self.path, 'wb')
+            f.write(data)
+            f.close()
+            self.assertEqual(netcdf3.formatVersion(self.path), None)
+            self.assertRaises(ValueError, netcdf3.Dataset, self.path)
+
+    def testTruncatedHeader(self):
+        for format in (CLASSIC, OFFSET64, DATA64):
+            self.write(format)
+            data = open(self.path, 'rb').read()
+            dataset = netcdf3.Dataset(self.path)
+            headerSize = dataset.headerSize
+            dataset.close()
+            for size in range(8, headerSize, 5):
+                f = open(self.path, 'wb')
+                f.write(data[:size])
+                f.close()
+                self.assertRaises(ValueError, netcdf3.Dataset, self.path)
+
+    def testTruncatedData(self):
+        # The header is read, but the data of t are cut short
+        self.write(CLASSIC)
+        data = open(self.path, 'rb').read()
+        f = open(self.path, 'wb')
+        f.write(data[:-4])
+        f.close()
+        dataset = netcdf3.Dataset(self.path)
+        self.assertEqual(dataset.variables['x'].data().tolist(), [1.5, 2.5, 3.5])
+        self.assertRaises(ValueError, dataset.variables['t'].data)
+
+    def testCorruptTag(self):
+        self.write(CLASSIC)
+        data = open(self.path, 'rb').read()
+        # The tag of the dimension list follows the magic and numrecs
+        f = open(self.path, 'wb')
+        f.write(data[:8] + struct.pack('>i', netcdf3.NC_VARIABLE) + data[12:])
+        f.close()
+        self.assertRaises(ValueError, netcdf3.Dataset, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()